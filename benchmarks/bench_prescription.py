@@ -0,0 +1,144 @@
+"""
+Benchmarks for reading Zemax prescription exports.
+
+Builds larger UTF-16 exports from tests/large_presc_data.txt and compares
+ - the previous whole-file reader with the current reader, repeating the
+   sections before the vertex block
+ - parsing the vertex block one surface at a time with parsing it as a
+   single block, repeating the surfaces of the vertex block
+
+Run from the repository root:
+    python benchmarks/bench_prescription.py
+"""
+
+import os
+import tempfile
+import timeit
+
+import zemax_to_cad
+from zemax_to_cad import prescription
+
+SOURCE = "tests/large_presc_data.txt"
+
+
+def legacy_load(txt_file):
+    """The reader before BOM sniffing: try UTF-8, then decode everything"""
+    try:
+        with open(txt_file, encoding="utf-8") as f:
+            f_contents = f.readlines()
+    except UnicodeDecodeError:
+        with open(txt_file, "rb") as f:
+            f_contents = f.read(-1).decode("utf-16").split("\n")
+
+    for i, line in enumerate(f_contents):
+        if prescription.VERTEX_SECTION in line:
+            n_header_rows = i + 8
+    array_contents = f_contents[n_header_rows:]
+
+    surfs = []
+    row = 0
+    while row < len(array_contents):
+        if (
+            array_contents[row].strip() == ""
+            and array_contents[row - 1].strip() == ""
+        ):
+            break
+        surfs.append(
+            prescription._surface_from_rows(array_contents[row : row + 3])
+        )
+        row += 4
+    return surfs
+
+
+def current_load(txt_file):
+    return list(zemax_to_cad.iter_surfaces(txt_file))
+
+
+def per_surface_parse(txt_file):
+    return zemax_to_cad.SurfaceTable.from_surfaces(
+        zemax_to_cad.iter_surfaces(txt_file)
+    )
+
+
+def block_parse(txt_file):
+    return zemax_to_cad.read_vertex_table(txt_file)
+
+
+def make_export(directory, n_repeats):
+    """Write a UTF-16 export with the leading sections repeated"""
+    with open(SOURCE, "rb") as f:
+        text = f.read().decode("utf-16")
+
+    split = text.index(prescription.VERTEX_SECTION)
+    head, tail = text[:split], text[split:]
+    fname = os.path.join(directory, f"export_x{n_repeats}.txt")
+    with open(fname, "wb") as f:
+        f.write((head * n_repeats + tail).encode("utf-16"))
+    return fname
+
+
+def make_large_block(directory, n_repeats):
+    """Write a UTF-16 export with the surfaces of the vertex block repeated"""
+    with open(SOURCE, "rb") as f:
+        lines = f.read().decode("utf-16").split("\n")
+
+    start = next(
+        i
+        for i, line in enumerate(lines)
+        if prescription.VERTEX_SECTION in line
+    )
+    first = start + 8
+    end = first
+    while lines[end].strip() or lines[end + 1].strip():
+        end += 1
+
+    # keep the blank line after each group of rows with the block
+    block = lines[first : end + 1]
+    lines = lines[:first] + block * n_repeats + lines[end + 1 :]
+    fname = os.path.join(directory, f"block_x{n_repeats}.txt")
+    with open(fname, "wb") as f:
+        f.write("\n".join(lines).encode("utf-16"))
+    return fname
+
+
+def time_per_call(fn, txt_file, number):
+    return min(timeit.repeat(lambda: fn(txt_file), number=number, repeat=5))
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as directory:
+        print(
+            f"{'file size':>12} {'legacy':>12} {'current':>12} {'saving':>8}"
+        )
+        for n_repeats in [1, 10, 100]:
+            fname = make_export(directory, n_repeats)
+            assert len(legacy_load(fname)) == len(current_load(fname))
+
+            number = max(1, 20 // n_repeats)
+            legacy = time_per_call(legacy_load, fname, number) / number
+            current = time_per_call(current_load, fname, number) / number
+
+            size = os.path.getsize(fname) / 1e6
+            print(
+                f"{size:>10.1f}MB {legacy * 1e3:>10.2f}ms "
+                f"{current * 1e3:>10.2f}ms {legacy / current:>7.1f}x"
+            )
+
+        print()
+        print(
+            f"{'surfaces':>12} {'per surface':>12} {'block':>12} {'saving':>8}"
+        )
+        for n_repeats in [1, 10, 100]:
+            fname = make_large_block(directory, n_repeats)
+            n_surfs = len(block_parse(fname))
+            assert n_surfs == len(per_surface_parse(fname))
+
+            number = max(1, 20 // n_repeats)
+            per_surface = time_per_call(per_surface_parse, fname, number)
+            block = time_per_call(block_parse, fname, number)
+
+            print(
+                f"{n_surfs:>12} {per_surface / number * 1e3:>10.2f}ms "
+                f"{block / number * 1e3:>10.2f}ms "
+                f"{per_surface / block:>7.1f}x"
+            )
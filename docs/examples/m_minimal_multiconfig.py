@@ -5,12 +5,15 @@ system = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
     [f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 5)],
 )
 
+# record the transforms below and apply them all at once when writing
+system.deferred = True
+
 # have to manually change OAPs to use the center of the optic (and not the centre of the vertex)
 system.transform(
-    T=-np.array([0, -44.8, 0.736]), filter_fn=lambda x: x.name == "OAP 1"
+    T=-np.array([0, -44.8, 0.736]), filter_fn=zemax_to_cad.Names("OAP 1")
 )
 system.transform(
-    T=-np.array([67, 29.6, -9]), filter_fn=lambda x: x.name == "OAP 2"
+    T=-np.array([67, 29.6, -9]), filter_fn=zemax_to_cad.Names("OAP 2")
 )
 # TODO: do the above using coord transform locations in zemax for the surface before or after
 
@@ -44,6 +47,9 @@ coords_of_interest = [
 with open("output.txt", "w", encoding="utf-8") as f:
     system.file_write(
         f,
-        include_filter=lambda x: x.name in surfs_of_interest,
-        format_filter_function=lambda x: coords_of_interest,  # include only the coordinates of interest
+        include_filter=zemax_to_cad.Names(*surfs_of_interest),
+        # include only the coordinates of interest
+        format_filter_function=zemax_to_cad.Components(
+            {}, default=coords_of_interest
+        ),
     )
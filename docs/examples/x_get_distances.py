@@ -17,25 +17,14 @@ for surf in config.surfaces:
 # the focus mirror:
 f = 2000  # mm focal length
 
-start_idx = config.get_surface_index("Focusing mirror")
-
-# march along the surfaces to find where the focus is
-for surf_index in range(start_idx, len(config.surfaces)):
-    proposed_end_surface = config.surfaces[surf_index]
-
-    # get the distance between the surfaces
-    d = config.distance_between_surfaces(
-        "Focusing mirror", proposed_end_surface
-    )
-
-    # The focus isn't on a surface, it's in the middle of the distance between the surfaces
-    if d > f:
-        # we've found the focus
-        last_surface = config.surfaces[surf_index - 1]
-        d = config.distance_between_surfaces("Focusing mirror", last_surface)
-        print(f"Focus is at {f-d} mm after the {last_surface.name}")
-        extra_distance = f - d
-        break
+# find where the focus is along the path of the beam
+focus = config.point_at_distance("Focusing mirror", f)
+
+# The focus isn't on a surface, it's in the middle of the distance between the surfaces
+last_surface = focus.before
+extra_distance = focus.residual
+print(f"Focus is at {extra_distance} mm after the {last_surface.name}")
+print(f"Focus position: {focus.point}")
 
 
 # %%
@@ -0,0 +1,138 @@
+import os
+import shutil
+
+import numpy as np
+
+import zemax_to_cad
+
+
+def copy_data(tmp_path, source="tests/test_data.txt", name="data.txt"):
+    txt_file = str(tmp_path / name)
+    shutil.copy(source, txt_file)
+    return txt_file
+
+
+class TestParseCache:
+    def test_hit_after_miss(self, tmp_path):
+        txt_file = copy_data(tmp_path)
+        cache = zemax_to_cad.ParseCache(str(tmp_path / "cache"))
+
+        first = cache.load(txt_file, zemax_to_cad.read_vertex_table)
+        second = cache.load(txt_file, zemax_to_cad.read_vertex_table)
+
+        assert (cache.hits, cache.misses) == (1, 1)
+        assert list(second.names) == list(first.names)
+        assert list(second.indices) == list(first.indices)
+        assert np.allclose(second.coords, first.coords)
+        assert np.allclose(second.rotations, first.rotations)
+        assert np.allclose(second.tilts, first.tilts)
+
+    def test_reopened_cache_hits(self, tmp_path):
+        txt_file = copy_data(tmp_path, "tests/large_presc_data.txt")
+        directory = str(tmp_path / "cache")
+        zemax_to_cad.ParseCache(directory).load(
+            txt_file, zemax_to_cad.read_vertex_table
+        )
+
+        cache = zemax_to_cad.ParseCache(directory)
+        table = cache.get(txt_file)
+
+        assert cache.hits == 1
+        assert len(table) == 92
+        assert table[1].name is None
+
+    def test_touched_file_hits_changed_file_misses(self, tmp_path):
+        txt_file = copy_data(tmp_path)
+        cache = zemax_to_cad.ParseCache(str(tmp_path / "cache"))
+        cache.load(txt_file, zemax_to_cad.read_vertex_table)
+
+        stat = os.stat(txt_file)
+        os.utime(txt_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert cache.get(txt_file) is not None
+
+        with open(txt_file, "a", encoding="utf-8") as f:
+            f.write("\n")
+        assert cache.get(txt_file) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+    def test_parser_version_invalidates(self, tmp_path, monkeypatch):
+        txt_file = copy_data(tmp_path)
+        directory = str(tmp_path / "cache")
+        zemax_to_cad.ParseCache(directory).load(
+            txt_file, zemax_to_cad.read_vertex_table
+        )
+
+        monkeypatch.setattr(
+            zemax_to_cad.prescription,
+            "PARSER_VERSION",
+            zemax_to_cad.prescription.PARSER_VERSION + 1,
+        )
+        cache = zemax_to_cad.ParseCache(directory)
+
+        assert cache.size_bytes == 0
+        assert cache.get(txt_file) is None
+
+    def test_evicts_least_recently_used(self, tmp_path):
+        files = [copy_data(tmp_path, name=f"data{i}.txt") for i in range(3)]
+        for i, txt_file in enumerate(files):
+            # different contents, so each file has its own entry
+            with open(txt_file, "a", encoding="utf-8") as f:
+                f.write("\n" * (i + 1))
+
+        cache = zemax_to_cad.ParseCache(str(tmp_path / "cache"))
+        cache.load(files[0], zemax_to_cad.read_vertex_table)
+        entry_size = cache.size_bytes
+        cache.max_bytes = 2 * entry_size
+
+        cache.load(files[1], zemax_to_cad.read_vertex_table)
+        # files[0] was used more recently than files[1]
+        for txt_file, used in [(files[0], 2), (files[1], 1)]:
+            key = zemax_to_cad.ParseCache._hash_file(txt_file)
+            os.utime(cache._entry_file(key), ns=(used * 10**9, used * 10**9))
+        cache.load(files[2], zemax_to_cad.read_vertex_table)
+
+        assert cache.size_bytes <= 2 * entry_size
+        assert cache.get(files[0]) is not None
+        assert cache.get(files[1]) is None
+
+    def test_unrelated_files_survive(self, tmp_path, monkeypatch):
+        txt_file = copy_data(tmp_path)
+        directory = tmp_path / "cache"
+        directory.mkdir()
+        np.savez(directory / "my_results.npz", x=np.arange(3))
+        (directory / "manifest.json").write_text("{}", encoding="utf-8")
+
+        zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            txt_file, cache=str(directory)
+        )
+        cache = zemax_to_cad.ParseCache(str(directory), max_bytes=0)
+        cache.load(txt_file, zemax_to_cad.read_vertex_table)
+        monkeypatch.setattr(
+            zemax_to_cad.prescription,
+            "PARSER_VERSION",
+            zemax_to_cad.prescription.PARSER_VERSION + 1,
+        )
+        cache = zemax_to_cad.ParseCache(str(directory))
+        cache.clear()
+
+        assert cache.size_bytes == 0
+        assert (directory / "my_results.npz").exists()
+        assert (directory / "manifest.json").read_text("utf-8") == "{}"
+
+    def test_multiple_configs_use_cache(self, tmp_path):
+        files = [
+            f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 4)
+        ]
+        cache = zemax_to_cad.ParseCache(str(tmp_path / "cache"))
+
+        first = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            files, cache=cache
+        )
+        second = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            files, config_numbers=[3, 2, 1], cache=cache, workers=2
+        )
+
+        assert (cache.hits, cache.misses) == (3, 3)
+        assert [c.config_number for c in second.configs] == [3, 2, 1]
+        for c1, c2 in zip(first.configs, second.configs):
+            assert np.allclose(c1.surfaces.coords, c2.surfaces.coords)
@@ -0,0 +1,56 @@
+import io
+
+import numpy as np
+
+import zemax_to_cad
+
+
+class TestFormatValues:
+    def test_default_is_shortest_repr(self):
+        values = np.array([0.1, -2.5, 1e-20, 123456.789])
+
+        texts = zemax_to_cad.format_values(values)
+
+        assert texts.tolist() == [str(v) for v in values]
+
+    def test_precision(self):
+        texts = zemax_to_cad.format_values([1.23456, -0.00001, 2.0], 3)
+
+        assert texts.tolist() == ["1.235", "0.000", "2.000"]
+
+
+class TestCadExport:
+    def test_matches_per_surface_strings(self):
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/test_data.txt"
+        )
+
+        def format_filter(surf):
+            if surf.name is None:
+                return [zemax_to_cad.StateSubset.Z]
+            return zemax_to_cad.StateSubset.ALL()
+
+        f = io.StringIO()
+        config.file_write(f, format_filter_function=format_filter)
+
+        expected = "".join(
+            surf.to_cad_string(format_filter(surf), config=1)
+            for surf in config.surfaces
+        )
+        assert f.getvalue() == expected
+
+    def test_written_after_transform(self):
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/test_data.txt"
+        )
+        export = config._cad_export(
+            lambda s: s.index == 1, lambda s: [zemax_to_cad.StateSubset.X]
+        )
+        before = export.values()
+
+        config.transform(T=np.array([1.0, 0.0, 0.0]))
+
+        np.testing.assert_allclose(export.values(), before + 1.0)
+        assert export.text(precision=2) == (
+            f'"{export.names[0]}" = {before[0] + 1.0:.2f}\n'
+        )
@@ -0,0 +1,126 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pytest
+
+import zemax_to_cad
+from zemax_to_cad import cli
+
+EXAMPLES = os.path.abspath("docs/examples/Zemax_txts")
+
+
+def write_spec(tmp_path, jobs):
+    spec_file = str(tmp_path / "jobs.json")
+    with open(spec_file, "w", encoding="utf-8") as f:
+        json.dump({"jobs": jobs}, f)
+    return spec_file
+
+
+def hdllr_job(name, path):
+    return {
+        "name": name,
+        "inputs": [os.path.join(EXAMPLES, "hdllr_c*.txt")],
+        "transforms": [
+            {"T": [0, 44.8, -0.736], "filter": "OAP 1"},
+            {"R": [[0, 0, 1], [0, 1, 0], [-1, 0, 0]], "T": [-510, 200, 150]},
+        ],
+        "outputs": [
+            {
+                "path": path,
+                "include": {"pattern": "^OAP", "exclude": ["OAP 2"]},
+                "components": ["X", "Y", "Z", "TILT_Y"],
+            }
+        ],
+    }
+
+
+class TestCli:
+    @pytest.mark.parametrize("workers", ["1", "2"])
+    def test_main_writes_every_job(self, tmp_path, capsys, workers):
+        spec_file = write_spec(
+            tmp_path, [hdllr_job("a", "a.txt"), hdllr_job("b", "b.txt")]
+        )
+
+        assert cli.main([spec_file, "--workers", workers]) == 0
+
+        system = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            [os.path.join(EXAMPLES, f"hdllr_c{i}.txt") for i in range(1, 5)]
+        )
+        system.transform(
+            T=np.array([0, 44.8, -0.736]),
+            filter_fn=zemax_to_cad.Names("OAP 1"),
+        )
+        system.transform(
+            R=np.array([[0, 0, 1], [0, 1, 0], [-1, 0, 0]]),
+            T=np.array([-510, 200, 150]),
+        )
+        expected = str(tmp_path / "expected.txt")
+        with open(expected, "w", encoding="utf-8") as f:
+            system.file_write(
+                f,
+                include_filter=zemax_to_cad.Names("OAP 1"),
+                format_filter_function=zemax_to_cad.Components(
+                    {},
+                    default=zemax_to_cad.StateSubset.LINEAR()
+                    + [zemax_to_cad.StateSubset.TILT_Y],
+                ),
+            )
+        with open(expected, "r", encoding="utf-8") as f:
+            expected_text = f.read()
+        for name in ["a.txt", "b.txt"]:
+            with open(tmp_path / name, "r", encoding="utf-8") as f:
+                assert f.read() == expected_text
+
+        out = capsys.readouterr().out
+        assert "parse" in out
+        assert "2 jobs" in out
+
+    def test_bad_spec(self, tmp_path, capsys):
+        job = hdllr_job("a", "a.txt")
+        job["outputs"][0]["components"] = ["X", "W"]
+        spec_file = write_spec(tmp_path, [job])
+
+        assert cli.main([spec_file]) == 1
+        assert "Unknown component" in capsys.readouterr().err
+
+    def test_inputs_sorted_by_number(self, tmp_path):
+        for number in [1, 2, 10, 11]:
+            shutil.copy(
+                "tests/test_data.txt", tmp_path / f"inst_c{number}.txt"
+            )
+
+        job = cli.BatchJob(
+            {"inputs": ["inst_c*.txt"], "outputs": [{"path": "out.txt"}]},
+            str(tmp_path),
+        )
+
+        assert [os.path.basename(file) for file in job.txt_files] == [
+            "inst_c1.txt",
+            "inst_c2.txt",
+            "inst_c10.txt",
+            "inst_c11.txt",
+        ]
+        assert job.config_numbers == [1, 2, 3, 4]
+
+    def test_output_without_path(self, tmp_path, capsys):
+        job = hdllr_job("a", "a.txt")
+        del job["outputs"][0]["path"]
+        spec_file = write_spec(tmp_path, [job])
+
+        assert cli.main([spec_file]) == 1
+        assert "no path" in capsys.readouterr().err
+
+    def test_selector_spec(self):
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/large_presc_data.txt"
+        )
+        selector = cli._selector({"range": [10, 20], "kind": "optical"})
+
+        expected = (
+            zemax_to_cad.IndexRange(10, 20) & zemax_to_cad.OpticalSurfaces()
+        )
+        assert np.array_equal(
+            selector.mask(config.surfaces), expected.mask(config.surfaces)
+        )
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+import zemax_to_cad
+
+
+class TestCsvFormat:
+    def test_round_trip_is_exact(self, tmp_path):
+        table = zemax_to_cad.read_vertex_table("tests/large_presc_data.txt")
+        table[3].name = 'Fold, "main" mirror'
+
+        fname = str(tmp_path / "config.csv")
+        zemax_to_cad.write_csv(fname, table, chunk_rows=10)
+        loaded = zemax_to_cad.read_csv(fname)
+
+        assert list(loaded.names) == list(table.names)
+        assert np.array_equal(loaded.indices, table.indices)
+        assert np.array_equal(loaded.coords, table.coords)
+        assert np.array_equal(loaded.tilts, table.tilts)
+
+    def test_header(self, tmp_path):
+        table = zemax_to_cad.read_csv("tests/test_csv.csv")
+
+        fname = str(tmp_path / "config.csv")
+        zemax_to_cad.write_csv(fname, table)
+        with open(fname, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+
+        assert lines[0] == "# zemax_to_cad csv 1"
+        assert lines[1] == "index,x,y,z,tilt_x,tilt_y,tilt_z,name"
+        assert lines[2] == "0,1.0,2.0,3.0,0.1,0.2,0.3,Surface 1"
+
+    def test_reads_legacy_rows(self, tmp_path):
+        fname = str(tmp_path / "legacy.csv")
+        with open(fname, "w", encoding="utf-8") as f:
+            f.write("0,0.1,0.0,-0.4,0.0,45.0,0.0,Fold, mirror\n")
+            f.write("1,0.1,0.0,-0.4,0.0,45.0,0.0\n")
+
+        table = zemax_to_cad.read_csv(fname)
+
+        assert list(table.names) == ["Fold, mirror", None]
+        assert np.allclose(table.tilts[1], [0.0, 45.0, 0.0])
+
+    def test_streams_chunks(self):
+        chunks = list(zemax_to_cad.iter_csv("tests/test_csv.csv", 1))
+
+        assert [len(chunk) for chunk in chunks] == [1, 1]
+        assert chunks[1][0].name == "Dichroic"
+
+    def test_newer_version(self, tmp_path):
+        fname = str(tmp_path / "config.csv")
+        with open(fname, "w", encoding="utf-8") as f:
+            f.write("# zemax_to_cad csv 99\nindex,x,y,z\n")
+
+        with pytest.raises(ValueError):
+            zemax_to_cad.read_csv(fname)
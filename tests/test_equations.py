@@ -0,0 +1,87 @@
+import numpy as np
+
+import zemax_to_cad
+
+
+class TestEquationsFile:
+    def test_update_keeps_other_lines(self, tmp_path):
+        fname = str(tmp_path / "equations.txt")
+        with open(fname, "w", encoding="utf-8", newline="") as f:
+            f.write('"A_X" = 1.0\r\n')
+            f.write('"D1@Distance1" = "A_X" * 2\r\n')
+            f.write('"B_X" = 2.0\r\n')
+
+        changes = zemax_to_cad.EquationsFile.merge(
+            fname, {"A_X": 1.0 + 1e-12, "B_X": 3.0, "C_X": 4.0}, atol=1e-9
+        )
+
+        assert changes.added == ["C_X"]
+        assert changes.updated == ["B_X"]
+        assert changes.unchanged == ["A_X"]
+        with open(fname, "r", encoding="utf-8", newline="") as f:
+            assert f.read() == (
+                '"A_X" = 1.0\r\n'
+                '"D1@Distance1" = "A_X" * 2\r\n'
+                '"B_X" = 3.0\r\n'
+                '"C_X" = 4.0\n'
+            )
+
+    def test_expressions_are_replaced(self):
+        equations = zemax_to_cad.EquationsFile(['"A_X" = "B_X" + 1\n'])
+
+        assert equations.value("A_X") is None
+        changes = equations.update({"A_X": 2.0})
+
+        assert changes.updated == ["A_X"]
+        assert equations.value("A_X") == 2.0
+
+    def test_comments_are_kept(self):
+        equations = zemax_to_cad.EquationsFile(
+            [
+                '"A_X" = 12.5 \'set by hand\n',
+                '"B_X" = 2.0   \'old\r\n',
+                '"C_X" = 12.5 * 2 \'an expression\n',
+            ]
+        )
+
+        assert equations.value("A_X") == 12.5
+        assert equations.value("C_X") is None
+        changes = equations.update({"A_X": 12.5, "B_X": 3.0, "C_X": 25.0})
+
+        assert changes.unchanged == ["A_X"]
+        assert changes.updated == ["B_X", "C_X"]
+        assert equations.lines == [
+            '"A_X" = 12.5 \'set by hand\n',
+            '"B_X" = 3.0   \'old\r\n',
+            '"C_X" = 25.0 \'an expression\n',
+        ]
+
+    def test_system_update(self, tmp_path):
+        instrument = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            ["tests/test_data.txt", "tests/test_datac2.txt"]
+        )
+        fname = str(tmp_path / "equations.txt")
+
+        changes = instrument.update_equations_file(fname)
+        assert len(changes.added) == 24
+
+        with open(fname, "r", encoding="utf-8") as f:
+            merged = f.read()
+        with open(fname, "w", encoding="utf-8") as f:
+            instrument.file_write(f)
+        with open(fname, "r", encoding="utf-8") as f:
+            assert merged == f.read()
+
+        instrument.transform(
+            T=[1.0, 0.0, 0.0], filter_fn=lambda x: x.name == "Dichroic"
+        )
+        changes = instrument.update_equations_file(fname)
+        # a translation leaves the tilts, so only the X equations change
+        assert changes.updated == ["Dichroic_X_1", "Dichroic_X_2"]
+        assert len(changes.unchanged) == 22
+
+        equations = zemax_to_cad.EquationsFile.read(fname)
+        assert np.isclose(
+            equations.value("Dichroic_X_2"),
+            instrument.configs[1].surfaces[1].coords[0],
+        )
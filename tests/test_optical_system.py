@@ -1,6 +1,7 @@
 import zemax_to_cad
 import os
 import numpy as np
+import pytest
 
 
 class TestOpticalConfiguration:
@@ -97,6 +98,73 @@ class TestOpticalConfiguration:
         assert np.allclose(c.surfaces[1].coords, [4.0, 5.0, 6.0])
         assert np.allclose(c.surfaces[1].tilts, [0.4, 0.5, 0.6])
 
+    def test_get_surface_index_policies(self):
+        c = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/large_presc_data.txt"
+        )
+        rows = c.get_surface_index("Untilt window", policy="all")
+
+        assert len(rows) == 2
+        assert c.get_surface_index("Untilt window") == rows[0]
+        assert c.get_surface_index("Untilt window", policy="last") == rows[1]
+        assert c.duplicate_names() == {"Untilt window": rows}
+        with pytest.raises(ValueError):
+            c.get_surface_index("Untilt window", policy="raise")
+
+        assert c.get_surface_index("not a surface") is None
+        assert c.get_surface_index("not a surface", policy="all") == []
+        assert c.get_surface_by_index(101).name == "Rectangular detector"
+        assert c.get_surface_by_index(1000) is None
+
+    def test_distances_between_surfaces(self):
+        c = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/large_presc_data.txt"
+        )
+        coords = c.surfaces.coords
+        expected = np.linalg.norm(np.diff(coords[3:11], axis=0), axis=1).sum()
+
+        assert np.isclose(c.distance_between_surfaces(3, 10), expected)
+        assert c.distance_between_surfaces(10, 3) == 0
+        assert np.allclose(
+            c.distances_between_surfaces(
+                np.array([3, 10]), [10, c.surfaces[3]]
+            ),
+            [expected, 0.0],
+        )
+
+        matrix = c.distance_matrix()
+        assert matrix.shape == (len(c.surfaces), len(c.surfaces))
+        assert np.isclose(matrix[3, 10], expected)
+        assert np.allclose(c.distance_matrix([10, 3]), [[0, 0], [expected, 0]])
+
+    def test_point_at_distance(self):
+        c = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/large_presc_data.txt"
+        )
+        start = c.get_surface_index("Focusing mirror")
+
+        focus = c.point_at_distance("Focusing mirror", 2000.0)
+
+        # the walk along the surfaces that this replaces
+        row = start
+        while c.distance_between_surfaces(start, row + 1) <= 2000.0:
+            row += 1
+        assert focus.before.name == c.surfaces[row].name
+        assert focus.after.index == c.surfaces[row + 1].index
+        assert np.isclose(
+            focus.residual, 2000.0 - c.distance_between_surfaces(start, row)
+        )
+        direction = c.surfaces[row + 1].coords - c.surfaces[row].coords
+        direction /= np.linalg.norm(direction)
+        assert np.allclose(
+            focus.point, c.surfaces[row].coords + focus.residual * direction
+        )
+
+        batch = c.points_at_distances("Focusing mirror", [0.0, 2000.0])
+        assert batch.before[1] == row
+        assert np.allclose(batch.point[1], focus.point)
+        assert np.allclose(batch.point[0], c.surfaces[start].coords)
+
     def test_write_csv(self):
         # test this by reading in a csv, writing it out, and then reading it back in, and checking the values
         data_fname = "tests/test_csv.csv"
@@ -176,6 +244,66 @@ class TestOpticalConfiguration:
 
         os.remove(fname)
 
+    def test_sections_parsed_on_first_use(self, monkeypatch):
+        calls = []
+
+        def reader(txt_file, index):
+            calls.append(txt_file)
+            return zemax_to_cad.read_solves(txt_file, index)
+
+        monkeypatch.setattr(zemax_to_cad.optical_system, "read_solves", reader)
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/large_presc_data.txt"
+        )
+        assert config.txt_file == "tests/large_presc_data.txt"
+        assert calls == []
+
+        solves = config.solves
+        assert config.solves is solves
+        assert len(calls) == 1
+
+        config.drop_cached_sections()
+        assert config.solves is not solves
+        assert len(calls) == 2
+
+    def test_sections_share_one_index(self, monkeypatch):
+        built = []
+        load = zemax_to_cad.PrescriptionIndex.load
+        monkeypatch.setattr(
+            zemax_to_cad.PrescriptionIndex,
+            "load",
+            lambda *args, **kwargs: built.append(args)
+            or load(*args, **kwargs),
+        )
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/large_presc_data.txt"
+        )
+
+        assert config.summary["type"][0] == "COORDBRK"
+        config.solves
+        config.drop_cached_sections()
+        config.surface_details
+        assert config.summary
+        assert len(built) == 1
+
+        index = zemax_to_cad.PrescriptionIndex.build(
+            "tests/large_presc_data.txt"
+        )
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/large_presc_data.txt", index=index
+        )
+        config.summary
+        config.multi_config
+        assert len(built) == 1
+
+    def test_sections_need_a_prescription(self):
+        config = zemax_to_cad.OpticalConfiguration.load_from_csv(
+            "tests/test_csv.csv"
+        )
+
+        with pytest.raises(ValueError):
+            config.surface_details
+
 
 class TestMultiConfigSystem:
     def test_load_from_multiple_configs(self):
@@ -378,6 +506,18 @@ class TestMultiConfigSystem:
             instrument.surfaces[0].coords, instrument_copy.surfaces[0].coords
         )
 
+    def test_points_at_distances(self):
+        instrument = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            [f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 5)]
+        )
+
+        found = instrument.points_at_distances("Focusing mirror", [100, 2000])
+
+        assert found.point.shape == (4, 2, 3)
+        for config, point in zip(instrument.configs, found.point):
+            expected = config.point_at_distance("Focusing mirror", 2000)
+            assert np.allclose(point[1], expected.point)
+
     def test_reading_with_different_headers(self):
         # file reading should be robust to different headers and find the right section
         data_fname = "tests/large_presc_data.txt"
@@ -385,3 +525,196 @@ class TestMultiConfigSystem:
         c = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
             data_fname
         )
+
+    def test_deferred_transform_matches_eager(self):
+        files = [f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in [1, 2]]
+
+        eager = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            files
+        )
+        lazy = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(files)
+        lazy.deferred = True
+
+        R = np.array([[0, 0, 1], [0, 1, 0], [-1, 0, 0]])
+        for system in [eager, lazy]:
+            system.transform(
+                T=[0.0, 44.8, -0.736], filter_fn=lambda x: x.name == "OAP 1"
+            )
+            system.transform(R=R)
+            system.transform(T=[-510.0, 200.0, 150.0])
+
+        # the two whole-system transforms are fused into one
+        pending = lazy.configs[0].pending_transforms
+        assert len(pending) == 2
+        assert np.allclose(pending[1][0][:3, :3], R)
+        assert np.allclose(pending[1][0][:3, 3], [-510.0, 200.0, 150.0])
+
+        for c_eager, c_lazy in zip(eager.configs, lazy.configs):
+            assert np.allclose(c_lazy.surfaces.coords, c_eager.surfaces.coords)
+            assert np.allclose(c_lazy.surfaces.tilts, c_eager.surfaces.tilts)
+            assert len(c_lazy.pending_transforms) == 0
+
+    def test_minimal_example_tilts_match_baseline(self):
+        # the transforms of docs/examples/m_minimal_multiconfig.py
+        system = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            [f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 5)]
+        )
+        system.deferred = True
+        system.transform(
+            T=-np.array([0, -44.8, 0.736]),
+            filter_fn=zemax_to_cad.Names("OAP 1"),
+        )
+        system.transform(
+            T=-np.array([67, 29.6, -9]), filter_fn=zemax_to_cad.Names("OAP 2")
+        )
+        system.transform(
+            R=np.array([[0, 0, 1], [0, 1, 0], [-1, 0, 0]]),
+            T=np.array([-510, 200, 150]),
+        )
+
+        # TILT_Y of each configuration written by the example before tilts
+        # were derived from the rotation matrices, which composed them as
+        # rotation vectors (hence the small differences for surfaces also
+        # tilted about x or z)
+        baseline = {
+            "OAP 1": [90.0, 90.0, 90.0, 90.0],
+            "DM": [90.0, 90.0, 90.0, 90.0],
+            "OAP 2": [98.190, 98.190, 98.190, 98.190],
+            "Focusing mirror": [83.896, 83.558, 82.985, 82.865],
+            "Tip-tilt mirror": [52.772, 61.986, 71.459, 83.489],
+            "Knife-edge mirror": [60.282, 70.507, 80.237, 92.397],
+            "Fold mirror": [90.969, 90.969, 90.965, 90.957],
+            "LB5552-E": [84.769, 84.769, 84.765, 84.757],
+        }
+        for name, tilts_y in baseline.items():
+            for config, tilt_y in zip(system.configs, tilts_y):
+                surf = config.surfaces[config.get_surface_index(name)]
+                assert surf.tilts[1] == pytest.approx(tilt_y, abs=0.3)
+
+    def test_deferred_transform_applied_on_read(self):
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/test_data.txt"
+        )
+        surf = config.surfaces[0]
+        init_position = surf.coords
+
+        config.deferred = True
+        config.transform(T=[1.0, 0.0, 0.0])
+        assert len(config.pending_transforms) == 1
+
+        assert np.allclose(surf.coords, init_position + [1.0, 0.0, 0.0])
+        assert len(config.pending_transforms) == 0
+
+        config.transform(T=[1.0, 0.0, 0.0])
+        config.flush()
+        assert len(config.pending_transforms) == 0
+        assert np.allclose(surf.coords, init_position + [2.0, 0.0, 0.0])
+
+    def test_load_from_multiple_configs_in_parallel(self):
+        files = [
+            f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 5)
+        ]
+
+        serial = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            files
+        )
+        parallel = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            files, config_numbers=[4, 3, 2, 1], workers=2
+        )
+
+        assert [c.config_number for c in parallel.configs] == [4, 3, 2, 1]
+        for c1, c2 in zip(serial.configs, parallel.configs):
+            assert list(c1.surfaces.names) == list(c2.surfaces.names)
+            assert np.allclose(c1.surfaces.coords, c2.surfaces.coords)
+            assert np.allclose(c1.surfaces.tilts, c2.surfaces.tilts)
+
+    def test_duplicate_names_warn_once(self):
+        files = [
+            f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 3)
+        ]
+
+        with pytest.warns(UserWarning) as record:
+            instrument = (
+                zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+                    files, workers=2
+                )
+            )
+
+        assert len(record) == 1
+        assert "'Untilt window'] in configurations [1, 2]" in str(
+            record[0].message
+        )
+        assert "Untilt window" in instrument.configs[0].duplicate_names()
+
+    def test_load_from_multiple_csvs_with_executor(self):
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            instrument = (
+                zemax_to_cad.MultiConfigSystem.load_from_multiple_csvs(
+                    ["tests/test_csv.csv", "tests/test_csv2.csv"],
+                    executor=executor,
+                )
+            )
+
+        assert np.allclose(
+            instrument.configs[1].surfaces[0].coords, [2.0, 2.0, 3.0]
+        )
+
+    def test_load_failures_name_the_files(self):
+        files = ["tests/test_data.txt", "tests/missing.txt", "tests/nope.txt"]
+
+        for workers in [None, 2]:
+            with pytest.raises(ValueError) as err:
+                zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+                    files, workers=workers
+                )
+            assert "tests/missing.txt" in str(err.value)
+            assert "tests/nope.txt" in str(err.value)
+            assert "tests/test_data.txt" not in str(err.value)
+
+    def test_delta_write(self):
+        instrument = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            ["tests/test_data.txt", "tests/test_datac2.txt"]
+        )
+        first, second = instrument.configs
+        second.surfaces[0].coords = first.surfaces[0].coords + 1e-12
+        second.surfaces[1].coords = first.surfaces[1].coords + [1.0, 0, 0]
+        second.surfaces[1].tilts = first.surfaces[1].tilts
+
+        names, values, varying = instrument.cad_variables()
+        assert len(names) == 12
+        assert names[0] == "Surface 1_X"
+        assert values.shape == (2, 12)
+        assert list(np.flatnonzero(varying)) == [6]
+
+        fname = "tests/test.txt"
+        with open(fname, "w", encoding="utf-8") as f:
+            instrument.file_write(f, delta=True)
+        with open(fname, "r", encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        os.remove(fname)
+
+        assert lines[0].startswith('"Surface 1_X" = ')
+        assert not any(line.startswith('"Surface 1_X_') for line in lines)
+        assert lines[-2].startswith('"Dichroic_X_1" = ')
+        assert lines[-1].startswith('"Dichroic_X_2" = ')
+        assert len(lines) == 13
+
+    def test_delta_write_of_identical_configs(self):
+        instrument = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            ["tests/test_data.txt", "tests/test_data.txt"]
+        )
+
+        fname = "tests/test.txt"
+        with open(fname, "w", encoding="utf-8") as f:
+            instrument.file_write(f, delta=True)
+        with open(fname, "r", encoding="utf-8") as f:
+            delta_lines = f.read().splitlines()
+        with open(fname, "w", encoding="utf-8") as f:
+            instrument.configs[0].file_write(f, use_config_number=False)
+        with open(fname, "r", encoding="utf-8") as f:
+            single_lines = f.read().splitlines()
+        os.remove(fname)
+
+        assert delta_lines == single_lines
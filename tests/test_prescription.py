@@ -0,0 +1,218 @@
+import os
+
+import numpy as np
+import pytest
+
+import zemax_to_cad
+
+
+class TestIterSurfaces:
+    def test_small_file(self):
+        surfs = list(zemax_to_cad.iter_surfaces("tests/test_data.txt"))
+
+        assert len(surfs) == 2
+        assert surfs[0].index == 0
+        assert surfs[0].name == "Surface 1"
+        assert surfs[1].name == "Dichroic"
+        assert np.allclose(surfs[1].coords, [307.1846948, 182.78, 1109.643195])
+        assert np.allclose(surfs[1].tilts, [-180.0, -75.00178581, -180.0])
+
+    def test_stops_at_end_of_block(self):
+        # utf-16 export with more sections after the vertex block
+        surfs = list(zemax_to_cad.iter_surfaces("tests/large_presc_data.txt"))
+
+        assert len(surfs) == 92
+        assert surfs[0].name == "Rotate atmos dispersion"
+        assert surfs[1].name is None
+        assert surfs[-1].index == 101
+        assert surfs[-1].name == "Rectangular detector"
+
+    def test_is_lazy(self):
+        surfs = zemax_to_cad.iter_surfaces("tests/large_presc_data.txt")
+        first = next(surfs)
+        surfs.close()
+
+        assert first.index == 1
+
+    def test_encodings(self):
+        with open("tests/test_data.txt", encoding="utf-8") as f:
+            text = f.read()
+        expected = list(zemax_to_cad.iter_surfaces("tests/test_data.txt"))
+
+        fname = "tests/test_encoded.txt"
+        for encoding in ["utf-8-sig", "utf-16", "utf-16-le", "utf-16-be"]:
+            with open(fname, "w", encoding=encoding, newline="\r\n") as f:
+                f.write(text)
+
+            surfs = list(zemax_to_cad.iter_surfaces(fname))
+            assert [s.name for s in surfs] == [s.name for s in expected]
+            for s1, s2 in zip(surfs, expected):
+                assert np.allclose(s1.coords, s2.coords)
+                assert np.allclose(s1.rotation, s2.rotation)
+
+        os.remove(fname)
+
+    def test_missing_section(self):
+        fname = "tests/test_no_vertex.txt"
+        with open(fname, "w", encoding="utf-8") as f:
+            f.write("GENERAL LENS DATA:\n\nSurfaces : 3\n")
+
+        with pytest.raises(ValueError):
+            list(zemax_to_cad.iter_surfaces(fname))
+
+        os.remove(fname)
+
+
+class TestReadVertexTable:
+    def test_matches_iter_surfaces(self):
+        fnames = [
+            "tests/test_data.txt",
+            "tests/test_datac2.txt",
+            "tests/large_presc_data.txt",
+        ] + [f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 5)]
+
+        for fname in fnames:
+            table = zemax_to_cad.read_vertex_table(fname)
+            surfs = list(zemax_to_cad.iter_surfaces(fname))
+
+            assert len(table) == len(surfs)
+            assert list(table.indices) == [s.index for s in surfs]
+            assert list(table.names) == [s.name for s in surfs]
+            assert np.array_equal(table.coords, [s.coords for s in surfs])
+            assert np.array_equal(table.tilts, [s.tilts for s in surfs])
+            assert np.array_equal(table.rotations, [s.rotation for s in surfs])
+
+    def test_malformed_block(self):
+        with open("tests/test_data.txt", encoding="utf-8") as f:
+            text = f.read()
+
+        fname = "tests/test_malformed.txt"
+        with open(fname, "w", encoding="utf-8") as f:
+            f.write(text.replace("1.827800000E+02", "1.8278OOOOOE+02"))
+
+        with pytest.raises(ValueError):
+            zemax_to_cad.read_vertex_table(fname)
+
+        os.remove(fname)
+
+
+class TestPrescriptionIndex:
+    def test_sections(self):
+        index = zemax_to_cad.PrescriptionIndex.build(
+            "tests/large_presc_data.txt"
+        )
+
+        assert index.encoding == "utf-16-le"
+        assert index.section_names[0] == "GENERAL LENS DATA"
+        assert index.section_names[-1] == "FILES USED"
+        assert "CARDINAL POINTS" in index
+        assert index.line_range("GENERAL LENS DATA") == (7, 89)
+
+        lines = index.read_section("MULTI-CONFIGURATION DATA")
+        assert lines[0] == "MULTI-CONFIGURATION DATA:"
+        assert lines[2] == "Configuration   1:"
+
+    def test_same_sections_in_utf8(self):
+        utf16 = zemax_to_cad.PrescriptionIndex.build(
+            "tests/large_presc_data.txt"
+        )
+        utf8 = zemax_to_cad.PrescriptionIndex.build(
+            "docs/examples/Zemax_txts/hdllr_c3.txt"
+        )
+
+        assert utf8.encoding == "utf-8"
+        assert utf8.section_names == utf16.section_names
+        for name in utf8.section_names:
+            assert utf8.line_range(name) == utf16.line_range(name)
+
+    def test_iter_surfaces_with_index(self):
+        fname = "tests/large_presc_data.txt"
+        index = zemax_to_cad.PrescriptionIndex.build(fname)
+
+        scanned = list(zemax_to_cad.iter_surfaces(fname))
+        seeked = list(zemax_to_cad.iter_surfaces(fname, index))
+
+        assert len(scanned) == len(seeked)
+        for s1, s2 in zip(scanned, seeked):
+            assert s1.name == s2.name
+            assert np.allclose(s1.coords, s2.coords)
+
+    def test_saved_index_is_reused(self, monkeypatch):
+        fname = "tests/test_data.txt"
+        index_file = zemax_to_cad.PrescriptionIndex.index_file_for(fname)
+
+        index = zemax_to_cad.PrescriptionIndex.load(fname)
+        assert os.path.exists(index_file)
+
+        def fail(txt_file):
+            raise AssertionError("index was rebuilt")
+
+        monkeypatch.setattr(zemax_to_cad.PrescriptionIndex, "build", fail)
+        reloaded = zemax_to_cad.PrescriptionIndex.load(fname)
+        assert reloaded.sections == index.sections
+
+        os.remove(index_file)
+
+    def test_missing_section(self):
+        index = zemax_to_cad.PrescriptionIndex.build("tests/test_data.txt")
+
+        with pytest.raises(ValueError):
+            index.read_section("CARDINAL POINTS")
+
+
+class TestSectionParsers:
+    def test_surface_summary(self):
+        summary = zemax_to_cad.read_surface_summary(
+            "tests/large_presc_data.txt"
+        )
+
+        assert summary["index"][[0, 4, -1]].tolist() == [0, 4, 101]
+        assert summary["type"][:2].tolist() == ["STANDARD", "COORDBRK"]
+        assert summary["thickness"][0] == np.inf
+        assert np.isnan(summary["radius"][1])
+        assert summary["comment"][14] == "OAP 1"
+
+    def test_surface_details(self):
+        details = zemax_to_cad.read_surface_details(
+            "tests/large_presc_data.txt"
+        )
+
+        assert details[4].type == "PARAXIAL"
+        assert details[10].fields["Decenter X"] == "480"
+        assert details[10].fields["Order"] == "Decenter then tilt"
+
+    def test_multi_config(self):
+        data = zemax_to_cad.read_multi_config("tests/large_presc_data.txt")
+
+        assert data.config_numbers == list(range(1, 9))
+        position = data.operands.index(("Param 1", 10))
+        assert data.values[:4, position].tolist() == [0, 240, 480, 720]
+
+    def test_solves(self):
+        solves = zemax_to_cad.read_solves("tests/large_presc_data.txt")
+
+        pickup = solves[0]
+        assert (pickup.surface, pickup.column) == (3, "Param 5")
+        assert (pickup.source, pickup.scale, pickup.offset) == (1, -1, 0)
+        thickness = [s for s in solves if s.column == "Thickness"][0]
+        assert (thickness.surface, thickness.offset) == (56, 28.2)
+        assert not solves[2].is_pickup
+
+    def test_curvature_centers(self):
+        indices, centers = zemax_to_cad.read_curvature_centers(
+            "tests/large_presc_data.txt"
+        )
+
+        assert len(indices) == len(centers)
+        row = indices.tolist().index(14)
+        assert np.allclose(centers[row], [-480.0, -44.8, 546.88])
+        assert np.isnan(centers[0]).all()
+
+    def test_cardinal_points(self):
+        points = zemax_to_cad.read_cardinal_points(
+            "tests/large_presc_data.txt"
+        )
+
+        focal_length = points[2.05]["Focal Length"]
+        assert focal_length.shape == (2,)
+        assert np.isclose(focal_length[0], 485610.589874)
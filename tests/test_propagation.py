@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+import zemax_to_cad
+
+EXPORTS = "docs/examples/Zemax_txts/hdllr_c{}.txt"
+
+
+class TestFramePropagator:
+    def test_active_config_matches_vertex_table(self):
+        propagator = zemax_to_cad.FramePropagator.from_prescription(
+            "tests/large_presc_data.txt", check=False
+        )
+        vertex_table = zemax_to_cad.read_vertex_table(
+            "tests/large_presc_data.txt"
+        )
+
+        assert propagator.active_config == 3
+        assert propagator.check(vertex_table, atol=1e-5) < 1e-5
+        (table,) = propagator.propagate([3])
+        assert list(table.names) == list(vertex_table.names)
+
+    def test_other_configs(self):
+        propagator = zemax_to_cad.FramePropagator.from_prescription(
+            EXPORTS.format(3)
+        )
+
+        assert propagator.available_configs == [1, 2, 3, 4]
+        for number, table in zip([1, 2, 4], propagator.propagate([1, 2, 4])):
+            vertex_table = zemax_to_cad.read_vertex_table(
+                EXPORTS.format(number)
+            )
+            assert np.array_equal(table.indices, vertex_table.indices)
+            # up to the first surface set by a chief ray solve that differs
+            # between the configurations
+            rows = table.indices < 40
+            np.testing.assert_allclose(
+                table.coords[rows], vertex_table.coords[rows], atol=1e-3
+            )
+
+    def test_missing_surfaces(self):
+        propagator = zemax_to_cad.FramePropagator.from_prescription(
+            EXPORTS.format(3)
+        )
+
+        with pytest.raises(ValueError):
+            propagator.propagate([5])
+
+    def test_system(self):
+        with pytest.warns(UserWarning, match=r"Configurations \[1\]"):
+            system = (
+                zemax_to_cad.MultiConfigSystem.load_from_single_prescription(
+                    EXPORTS.format(3), config_numbers=[3, 1]
+                )
+            )
+
+        assert [config.config_number for config in system.configs] == [3, 1]
+        assert system.configs[0].get_surface_index("OAP 1") == 13
+
+    def test_surfaces_after_ray_solves(self):
+        load = zemax_to_cad.MultiConfigSystem.load_from_single_prescription
+        propagator = zemax_to_cad.FramePropagator.from_prescription(
+            EXPORTS.format(3)
+        )
+        first = propagator.first_ray_solved
+        assert first == 15
+
+        with pytest.raises(ValueError):
+            load(EXPORTS.format(3), config_numbers=[1], ray_solved="raise")
+
+        system = load(EXPORTS.format(3), ray_solved="drop")
+        for config in system.configs:
+            indices = config.surfaces.indices
+            if config.config_number == 3:
+                assert indices.max() > first
+            else:
+                assert indices.max() < first
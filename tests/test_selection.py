@@ -0,0 +1,186 @@
+import io
+
+import numpy as np
+import pytest
+
+import zemax_to_cad
+
+S = zemax_to_cad.StateSubset
+
+
+def make_table():
+    return zemax_to_cad.SurfaceTable(
+        [0, 1, 2, 3, 4],
+        np.arange(15.0).reshape(5, 3),
+        np.zeros((5, 3)),
+        ["OAP 1", None, "OAP 2", "Fold", "OAP 1"],
+    )
+
+
+class TestSelectors:
+    def test_masks(self):
+        table = make_table()
+
+        assert zemax_to_cad.Names("OAP 1").mask(table).tolist() == [
+            True,
+            False,
+            False,
+            False,
+            True,
+        ]
+        assert np.flatnonzero(
+            zemax_to_cad.NamePattern(r"^OAP \d").mask(table)
+        ).tolist() == [0, 2, 4]
+        assert np.flatnonzero(
+            zemax_to_cad.IndexRange(1, 3).mask(table)
+        ).tolist() == [1, 2, 3]
+        assert np.flatnonzero(
+            zemax_to_cad.Indices(0, 3).mask(table)
+        ).tolist() == [0, 3]
+
+    def test_combinations(self):
+        table = make_table()
+        oaps = zemax_to_cad.NamePattern("OAP")
+
+        selector = (oaps & zemax_to_cad.IndexRange(last=2)) | "Fold"
+        assert np.flatnonzero(selector.mask(table)).tolist() == [0, 2, 3]
+        assert np.flatnonzero((~oaps).mask(table)).tolist() == [1, 3]
+
+        surfaces = list(table)
+        assert [selector(surf) for surf in surfaces] == [
+            True,
+            False,
+            True,
+            True,
+            False,
+        ]
+
+    def test_mask_cached_until_names_change(self):
+        table = make_table()
+        selector = zemax_to_cad.Names("Fold")
+
+        mask = selector.mask(table)
+        assert selector.mask(table) is mask
+        assert not mask.flags.writeable
+
+        table[1].name = "Fold"
+        assert np.flatnonzero(selector.mask(table)).tolist() == [1, 3]
+
+    def test_callables_are_not_cached(self):
+        table = make_table()
+        selector = zemax_to_cad.Where(lambda s: bool(s.coords[0] > 5))
+
+        assert np.flatnonzero(selector.mask(table)).tolist() == [2, 3, 4]
+        table.transform(T=np.array([-3.0, 0.0, 0.0]))
+        assert np.flatnonzero(selector.mask(table)).tolist() == [3, 4]
+
+        with pytest.raises(ValueError):
+            zemax_to_cad.Where(lambda s: 1).mask(table)
+
+    def test_selectors_must_compute_masks(self):
+        class Incomplete(zemax_to_cad.Selector):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestComponents:
+    def test_rows_cols(self):
+        table = make_table()
+        components = zemax_to_cad.Components(
+            {"Fold": [S.TILT_X], zemax_to_cad.NamePattern("OAP"): [S.Z, S.X]},
+            default=[],
+        )
+
+        rows, cols = components.rows_cols(table, [0, 1, 3])
+
+        assert rows.tolist() == [0, 0, 3]
+        assert cols.tolist() == [2, 0, 3]
+        assert components(table[4]) == [S.Z, S.X]
+        assert components(table[1]) == []
+
+    def test_file_write_matches_callables(self):
+        config = zemax_to_cad.OpticalConfiguration(make_table(), 1)
+        names = ["OAP 1", "Fold"]
+
+        f = io.StringIO()
+        config.file_write(
+            f,
+            include_filter=lambda s: s.name in names,
+            format_filter_function=lambda s: (
+                [S.Z] if s.name == "Fold" else S.ALL()
+            ),
+        )
+        expected = f.getvalue()
+
+        f = io.StringIO()
+        config.file_write(
+            f,
+            include_filter=zemax_to_cad.Names(*names),
+            format_filter_function=zemax_to_cad.Components({"Fold": [S.Z]}),
+        )
+        assert f.getvalue() == expected
+
+    def test_system_transform(self):
+        system = zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+            ["tests/test_data.txt", "tests/test_datac2.txt"]
+        )
+        before = [config.surfaces.coords.copy() for config in system.configs]
+
+        system.transform(
+            T=np.array([1.0, 0.0, 0.0]),
+            filter_fn=zemax_to_cad.Names("Dichroic"),
+        )
+
+        for config, coords in zip(system.configs, before):
+            row = config.get_surface_index("Dichroic")
+            moved = config.surfaces.coords - coords
+            assert moved[row].tolist() == [1.0, 0.0, 0.0]
+            assert np.count_nonzero(moved) == 1
+
+
+class TestSurfaceTypeSelectors:
+    def test_types(self):
+        table = make_table()
+        table.set_summary(
+            {
+                "index": np.array([0, 1, 2, 3, 4]),
+                "type": np.array(
+                    ["STANDARD", "STANDARD", "COORDBRK", "STANDARD", "ODD"]
+                ),
+                "radius": np.array([np.inf, np.inf, np.nan, np.inf, 10.0]),
+                "glass": np.array(["", "", "", "MIRROR", ""]),
+            }
+        )
+
+        assert np.flatnonzero(
+            zemax_to_cad.CoordinateBreaks().mask(table)
+        ).tolist() == [2]
+        assert np.flatnonzero(
+            zemax_to_cad.DummySurfaces().mask(table)
+        ).tolist() == [1]
+        assert np.flatnonzero(
+            zemax_to_cad.OpticalSurfaces().mask(table)
+        ).tolist() == [0, 3, 4]
+
+    def test_no_summary(self):
+        table = make_table()
+
+        assert not zemax_to_cad.SurfaceTypes("COORDBRK").mask(table).any()
+        assert zemax_to_cad.OpticalSurfaces().mask(table).all()
+
+    def test_prescription_summary(self):
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/large_presc_data.txt"
+        )
+        table = config.surfaces
+
+        breaks = zemax_to_cad.CoordinateBreaks().mask(table)
+        assert [surf.type for surf in table][:3] == [
+            "COORDBRK",
+            "ATMOSPHR",
+            "COORDBRK",
+        ]
+        assert breaks[0] and not breaks[1]
+        assert zemax_to_cad.OpticalSurfaces().mask(table).sum() == 46
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import zemax_to_cad
+
+
+def load_system():
+    files = [f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 5)]
+    return zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(
+        files, config_numbers=[2, 4, 6, 8]
+    )
+
+
+class TestStorage:
+    @pytest.mark.parametrize("mmap", [False, True])
+    def test_system_round_trip_is_exact(self, tmp_path, mmap):
+        system = load_system()
+        R = zemax_to_cad.SurfaceTable.tilts_to_rotations([[1.0, 2.0, 3.0]])[0]
+        system.transform(R=R, T=[0.1, 0.2, 0.3])
+
+        fname = str(tmp_path / "system.zcad")
+        system.save(fname)
+        loaded = zemax_to_cad.MultiConfigSystem.load(fname, mmap=mmap)
+
+        assert [c.config_number for c in loaded.configs] == [2, 4, 6, 8]
+        for c1, c2 in zip(system.configs, loaded.configs):
+            t1, t2 = c1.surfaces, c2.surfaces
+            assert list(t1.names) == list(t2.names)
+            assert np.array_equal(t1.indices, t2.indices)
+            assert np.array_equal(t1.coords, t2.coords)
+            assert np.array_equal(t1.rotations, t2.rotations)
+            assert np.array_equal(t1.tilts, t2.tilts)
+
+    def test_mmap_changes_stay_in_memory(self, tmp_path):
+        fname = str(tmp_path / "config.zcad")
+        config = zemax_to_cad.OpticalConfiguration.load_from_prescription_text(
+            "tests/test_data.txt", config_number=3
+        )
+        config.save(fname)
+
+        loaded = zemax_to_cad.OpticalConfiguration.load(fname, mmap=True)
+        loaded.surfaces[0].tilts = [1.0, 2.0, 3.0]
+        loaded.transform(T=[1.0, 0.0, 0.0])
+
+        reloaded = zemax_to_cad.OpticalConfiguration.load(fname)
+        assert reloaded.config_number == 3
+        assert np.array_equal(reloaded.surfaces.tilts, config.surfaces.tilts)
+        assert np.array_equal(reloaded.surfaces.coords, config.surfaces.coords)
+
+    def test_load_one_configuration(self, tmp_path):
+        fname = str(tmp_path / "system.zcad")
+        system = load_system()
+        system.save(fname)
+
+        config = zemax_to_cad.OpticalConfiguration.load(fname, 6)
+        assert config.config_number == 6
+        assert np.array_equal(
+            config.surfaces.coords, system.configs[2].surfaces.coords
+        )
+
+        with pytest.raises(ValueError):
+            zemax_to_cad.OpticalConfiguration.load(fname)
+        with pytest.raises(ValueError):
+            zemax_to_cad.OpticalConfiguration.load(fname, 5)
+
+    def test_not_a_saved_system(self):
+        with pytest.raises(ValueError):
+            zemax_to_cad.MultiConfigSystem.load("tests/test_csv.csv")
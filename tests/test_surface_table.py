@@ -0,0 +1,344 @@
+import numpy as np
+import pytest
+import scipy.spatial.transform
+
+import zemax_to_cad
+
+
+class TestSurfaceTable:
+    def test_views_read_rows(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0, 1],
+            [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]],
+            [[0.1, 0.2, 0.3], [0.4, 0.5, 0.6]],
+            ["a", None],
+        )
+
+        assert len(table) == 2
+        assert table[1].index == 1
+        assert table[1].name is None
+        assert np.allclose(table[-1].coords, [4.0, 5.0, 6.0])
+        assert [surf.name for surf in table] == ["a", None]
+
+    def test_views_write_rows(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0, 1],
+            np.zeros((2, 3)),
+            np.zeros((2, 3)),
+        )
+
+        surf = table[0]
+        surf.coords = [1.0, 2.0, 3.0]
+        surf.name = "renamed"
+
+        assert np.allclose(table.coords[0], [1.0, 2.0, 3.0])
+        assert np.allclose(table.coords[1], 0.0)
+        assert table.names[0] == "renamed"
+
+    def test_from_surfaces(self):
+        surfs = [
+            zemax_to_cad.Surface(0, np.ones(3), np.zeros(3), name="x"),
+            zemax_to_cad.Surface(3, np.zeros(3), np.ones(3)),
+        ]
+        table = zemax_to_cad.SurfaceTable.from_surfaces(surfs)
+
+        assert list(table.indices) == [0, 3]
+        assert table.coords.shape == (2, 3)
+        assert table[0].name == "x"
+        assert np.allclose(table[1].tilts, 1.0)
+
+    def test_transform_keeps_earlier_reads(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0, 1],
+            [[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]],
+            np.zeros((2, 3)),
+        )
+        before = table[0].coords
+
+        table.transform(T=[1.0, 0.0, 0.0], mask=[True, False])
+
+        assert np.allclose(before, [1.0, 2.0, 3.0])
+        assert np.allclose(table[0].coords, [2.0, 2.0, 3.0])
+        assert np.allclose(table[1].coords, [4.0, 5.0, 6.0])
+
+    def test_transform_many_matches_per_surface(self):
+        rng = np.random.default_rng(0)
+        R = scipy.spatial.transform.Rotation.from_rotvec(
+            [0.3, -0.2, 0.1]
+        ).as_matrix()
+        T = np.array([10.0, -5.0, 2.0])
+
+        tables = [
+            zemax_to_cad.SurfaceTable(
+                np.arange(5),
+                rng.normal(size=(5, 3)) * 100,
+                rng.uniform(-90, 90, size=(5, 3)),
+            )
+            for _ in range(3)
+        ]
+        masks = [rng.random(5) > 0.5 for _ in tables]
+
+        expected = []
+        for table, mask in zip(tables, masks):
+            coords = table.coords.copy()
+            rotations = table.rotations.copy()
+            for row in np.flatnonzero(mask):
+                coords[row] = R @ coords[row] + T
+                rotations[row] = R @ rotations[row]
+            expected.append((coords, rotations))
+
+        zemax_to_cad.SurfaceTable.transform_many(tables, masks, R, T)
+
+        for table, (coords, rotations) in zip(tables, expected):
+            assert np.allclose(table.coords, coords)
+            assert np.allclose(table.rotations, rotations)
+            assert np.allclose(
+                zemax_to_cad.SurfaceTable.tilts_to_rotations(table.tilts),
+                rotations,
+            )
+
+    def test_tilt_conversions(self):
+        tilts = np.array(
+            [
+                [0.0, 0.0, 0.0],
+                [10.0, -20.0, 30.0],
+                [-180.0, -75.0, -180.0],
+                [5.0, 90.0, 0.0],
+            ]
+        )
+        rotations = zemax_to_cad.SurfaceTable.tilts_to_rotations(tilts)
+
+        # zemax applies tilt x, then y, then z
+        expected = scipy.spatial.transform.Rotation.from_euler(
+            "XYZ", tilts[1], degrees=True
+        ).as_matrix()
+        assert np.allclose(rotations[1], expected)
+
+        assert np.allclose(
+            zemax_to_cad.SurfaceTable.tilts_to_rotations(
+                zemax_to_cad.SurfaceTable.rotations_to_tilts(rotations)
+            ),
+            rotations,
+        )
+
+    def test_chained_transforms_do_not_drift(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0], [[1.0, 2.0, 3.0]], [[10.0, -20.0, 30.0]]
+        )
+        R = scipy.spatial.transform.Rotation.from_rotvec(
+            [0.3, -0.2, 0.1]
+        ).as_matrix()
+
+        for _ in range(500):
+            table.transform(R=R)
+            table.transform(R=R.T)
+
+        assert np.allclose(table.tilts, [[10.0, -20.0, 30.0]], atol=1e-9)
+
+    def test_derived_tilts_stay_continuous(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0, 1, 2],
+            np.zeros((3, 3)),
+            [[0.0, 10.0, 0.0], [-180.0, -75.0, -180.0], [0.0, 0.0, 3.0]],
+        )
+        R_y = zemax_to_cad.SurfaceTable.tilts_to_rotations([0.0, 90.0, 0.0])
+
+        table.transform(R=R_y[0])
+
+        # past 90 degrees about y, rather than (180, 80, 180)
+        assert np.allclose(table.tilts[0], [0.0, 100.0, 0.0])
+        assert np.allclose(table.tilts[1], [-180.0, -165.0, -180.0])
+        # rotated onto tilt_y = 90, keeping the previous tilt_z
+        assert np.allclose(table.tilts[2], [0.0, 90.0, 3.0])
+        assert np.allclose(
+            zemax_to_cad.SurfaceTable.tilts_to_rotations(table.tilts),
+            table.rotations,
+        )
+
+        table.transform(R=R_y[0].T)
+        assert np.allclose(table.tilts[0], [0.0, 10.0, 0.0])
+        assert np.allclose(table.tilts[1], [-180.0, -75.0, -180.0])
+
+    def test_gimbal_lock_keeps_previous_split(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0], np.zeros((1, 3)), [[0.0, 80.0, 10.0]]
+        )
+        R_y = zemax_to_cad.SurfaceTable.tilts_to_rotations([0, 10.0, 0])[0]
+
+        table.transform(R=R_y)
+        # only tilt_x + tilt_z is defined at tilt_y = 90
+        assert np.allclose(table.tilts, [[0.0, 90.0, 10.0]])
+
+        table.transform(R=R_y)
+        assert np.allclose(table.tilts, [[0.0, 100.0, 10.0]])
+
+    def test_name_and_index_lookup(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0, 2, 5, 7],
+            np.zeros((4, 3)),
+            np.zeros((4, 3)),
+            ["a", "b", "a", None],
+        )
+
+        assert table.rows_of_name("a") == [0, 2]
+        assert table.rows_of_name(None) == [3]
+        assert table.rows_of_name("c") == []
+        assert table.row_of_index(5) == 2
+        assert table.row_of_index(1) is None
+        assert table.duplicate_names() == {"a": [0, 2]}
+
+        table[2].name = "c"
+        assert table.rows_of_name("a") == [0]
+        assert table.rows_of_name("c") == [2]
+        assert table.duplicate_names() == {}
+
+    def test_name_and_index_columns_are_read_only(self):
+        table = zemax_to_cad.SurfaceTable([0], np.zeros((1, 3)), np.zeros(3))
+
+        with pytest.raises(ValueError):
+            table.names[0] = "a"
+        with pytest.raises(ValueError):
+            table.indices[0] = 1
+
+        table.indices = [4]
+        assert table.row_of_index(4) == 0
+
+    def test_orientation_columns_are_read_only(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0], np.zeros((1, 3)), [[0.0, 0.0, -90.0]]
+        )
+        surf = table[0]
+
+        with pytest.raises(ValueError):
+            surf.tilts[1] = 12.0
+        with pytest.raises(ValueError):
+            surf.rotation[0, 0] = 2.0
+
+        surf.tilts = [0.0, 12.0, -90.0]
+        table.transform(T=[1.0, 0.0, 0.0])
+        assert np.allclose(surf.tilts, [0.0, 12.0, -90.0])
+        assert np.allclose(
+            surf.rotation,
+            zemax_to_cad.SurfaceTable.tilts_to_rotations([0.0, 12.0, -90.0]),
+        )
+
+    def test_path_lengths(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0, 1, 2, 3],
+            [
+                [0.0, 0.0, 0.0],
+                [3.0, 4.0, 0.0],
+                [3.0, 4.0, 2.0],
+                [3.0, 4.0, 0.0],
+            ],
+            np.zeros((4, 3)),
+        )
+
+        assert np.allclose(table.path_lengths, [0.0, 5.0, 7.0, 9.0])
+        assert np.allclose(
+            table.path_distances([0, 1, 3], [2, 3, 1]), [7.0, 4.0, 0.0]
+        )
+        assert np.allclose(table.path_distance_matrix()[1], [0, 0, 2, 4])
+        assert np.allclose(table.path_distance_matrix()[:, 1], [5, 0, 0, 0])
+
+    def test_path_lengths_follow_changes(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0, 1], [[0.0, 0.0, 0.0], [1.0, 0.0, 0.0]], np.zeros((2, 3))
+        )
+        assert np.allclose(table.path_lengths, [0.0, 1.0])
+
+        table.transform(T=[0.0, 2.0, 0.0], mask=[False, True])
+        assert np.allclose(table.path_lengths[1], np.sqrt(5.0))
+
+        table.deferred = True
+        table.transform(T=[0.0, -2.0, 0.0], mask=[False, True])
+        assert np.allclose(table.path_lengths[1], 1.0)
+
+        table[1].coords = [0.0, 0.0, 3.0]
+        assert np.allclose(table.path_lengths[1], 3.0)
+
+        # in place edits would leave the path lengths out of date
+        with pytest.raises(ValueError):
+            table[1].coords[0] += 1000.0
+        with pytest.raises(ValueError):
+            table.coords[1, 0] = 1000.0
+        assert np.allclose(table.path_lengths[1], 3.0)
+
+        coords = table.coords.copy()
+        coords[1, 0] = 4.0
+        table.coords = coords
+        assert np.allclose(table.path_lengths[1], 5.0)
+
+    def test_locate_path_distances(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0, 1, 2, 3],
+            [
+                [0.0, 0.0, 0.0],
+                [3.0, 4.0, 0.0],
+                [3.0, 4.0, 0.0],
+                [3.0, 4.0, 2.0],
+            ],
+            np.zeros((4, 3)),
+        )
+
+        before, after, residual, points = table.locate_path_distances(
+            0, [2.5, 5.0, 6.0, 7.0]
+        )
+
+        assert list(before) == [0, 2, 2, 2]
+        assert list(after) == [1, 3, 3, 3]
+        assert np.allclose(residual, [2.5, 0.0, 1.0, 2.0])
+        assert np.allclose(
+            points,
+            [[1.5, 2.0, 0.0], [3.0, 4.0, 0.0], [3.0, 4.0, 1.0], [3, 4, 2]],
+        )
+
+        with pytest.raises(ValueError):
+            table.locate_path_distances(1, 2.5)
+        with pytest.raises(ValueError):
+            table.locate_path_distances(0, -1.0)
+
+    def test_translation_keeps_tilts(self):
+        table = zemax_to_cad.SurfaceTable(
+            [0], [[1.0, 2.0, 3.0]], [[-180.0, -75.0, -180.0]]
+        )
+
+        table.transform(T=[1.0, 0.0, 0.0])
+
+        assert np.allclose(table.coords, [[2.0, 2.0, 3.0]])
+        assert np.array_equal(table.tilts, [[-180.0, -75.0, -180.0]])
+
+
+class TestSummary:
+    def test_joined_by_index(self):
+        table = zemax_to_cad.SurfaceTable(
+            [3, 1, 7], np.zeros((3, 3)), np.zeros((3, 3))
+        )
+        calls = []
+
+        def read():
+            calls.append(1)
+            return {
+                "index": np.array([1, 2, 3]),
+                "type": np.array(["STANDARD", "COORDBRK", "PARAXIAL"]),
+                "thickness": np.array([1.0, 2.0, 3.0]),
+            }
+
+        table.set_summary(read)
+        assert calls == []
+
+        summary = table.summary
+        assert summary["type"].tolist() == ["PARAXIAL", "STANDARD", ""]
+        np.testing.assert_array_equal(summary["thickness"], [3, 1, np.nan])
+        assert table[0].type == "PARAXIAL"
+        assert table[2].type is None
+
+        table.summary
+        table.copy().summary
+        assert calls == [1]
+
+    def test_no_summary(self):
+        table = zemax_to_cad.SurfaceTable([0], np.zeros((1, 3)), np.zeros(3))
+
+        assert table.summary == {}
+        assert table[0].type is None
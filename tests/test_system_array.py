@@ -0,0 +1,95 @@
+import numpy as np
+import pytest
+
+import zemax_to_cad
+
+
+def load_system():
+    files = [f"docs/examples/Zemax_txts/hdllr_c{i}.txt" for i in range(1, 5)]
+    return zemax_to_cad.MultiConfigSystem.load_from_multiple_configs(files)
+
+
+class TestSystemArray:
+    def test_matches_configurations(self):
+        system = load_system()
+        array = system.as_array()
+
+        assert array.values.shape == (4, len(array), 6)
+        assert list(array.config_numbers) == [1, 2, 3, 4]
+        assert array.keys[0] == system.configs[0].surfaces[0].name
+
+        col = array.position("OAP 2")
+        for c, config in enumerate(system.configs):
+            surf = config.surfaces[config.get_surface_index("OAP 2")]
+            assert np.allclose(array.coords[c, col], surf.coords)
+            assert np.allclose(array.tilts[c, col], surf.tilts)
+
+        assert np.allclose(
+            array.distances("Focusing mirror", "Knife-edge mirror"),
+            [
+                config.distance_between_surfaces(
+                    "Focusing mirror", "Knife-edge mirror"
+                )
+                for config in system.configs
+            ],
+        )
+
+    def test_missing_surfaces_are_masked(self):
+        t1 = zemax_to_cad.SurfaceTable(
+            [0, 1], [[0, 0, 0], [1, 0, 0]], np.zeros((2, 3)), ["a", "b"]
+        )
+        t2 = zemax_to_cad.SurfaceTable(
+            [0, 1], [[0, 0, 0], [0, 2, 0]], np.zeros((2, 3)), ["a", "c"]
+        )
+
+        array = zemax_to_cad.SystemArray.from_tables([t1, t2], [1, 2])
+
+        assert list(array.keys) == ["a", "b", "c"]
+        assert array.mask.tolist() == [
+            [True, True, False],
+            [True, False, True],
+        ]
+        assert np.isnan(array.values[1, 1]).all()
+        assert array.rows[1, 2] == 1
+
+        by_index = zemax_to_cad.SystemArray.from_tables(
+            [t1, t2], [1, 2], match="index"
+        )
+        assert list(by_index.keys) == [0, 1]
+        assert by_index.mask.all()
+
+        with pytest.raises(ValueError):
+            zemax_to_cad.SystemArray.from_tables([t1], [1], match="type")
+
+    def test_array_of_transformed_system(self):
+        system = load_system()
+        before = system.as_array()
+        distances = before.distances("OAP 1", "Focusing mirror")
+
+        # a translation of every surface leaves the distances unchanged
+        system.transform(T=np.array([100.0, 0, 0]))
+        after = system.as_array()
+
+        assert np.allclose(
+            after.coords, before.coords + [100.0, 0, 0], equal_nan=True
+        )
+        assert np.allclose(
+            after.distances("OAP 1", "Focusing mirror"), distances
+        )
+        # the array built before is a snapshot
+        col = before.position("OAP 1")
+        assert not np.allclose(
+            before.coords[:, col], after.coords[:, col], equal_nan=True
+        )
+
+        R = zemax_to_cad.SurfaceTable.tilts_to_rotations([[10.0, 20.0, 30.0]])[
+            0
+        ]
+        system.transform(R, filter_fn=zemax_to_cad.Names("OAP 1", "DM"))
+        assert np.allclose(
+            system.as_array().distances("OAP 1", "OAP 2"),
+            [
+                config.distance_between_surfaces("OAP 1", "OAP 2")
+                for config in system.configs
+            ],
+        )
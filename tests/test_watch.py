@@ -0,0 +1,92 @@
+import shutil
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import zemax_to_cad
+from zemax_to_cad import watch
+
+
+def copy_configs(tmp_path):
+    files = [str(tmp_path / "c1.txt"), str(tmp_path / "c2.txt")]
+    shutil.copy("tests/test_data.txt", files[0])
+    shutil.copy("tests/test_data.txt", files[1])
+    return files
+
+
+class TestEquationsWatcher:
+    def test_update_parses_changed_files(self, tmp_path, monkeypatch):
+        files = copy_configs(tmp_path)
+        equations = str(tmp_path / "equations.txt")
+        watcher = zemax_to_cad.EquationsWatcher(files, equations)
+        watcher.transform(T=np.array([1.0, 0, 0]))
+        watcher.load()
+
+        parsed = []
+        load = zemax_to_cad.OpticalConfiguration.load_from_prescription_text
+        monkeypatch.setattr(
+            zemax_to_cad.OpticalConfiguration,
+            "load_from_prescription_text",
+            lambda file, number: parsed.append(file) or load(file, number),
+        )
+        shutil.copy("tests/test_datac2.txt", files[1])
+        changes = watcher.update([files[1]])
+
+        assert parsed == [files[1]]
+        assert changes.updated
+        assert all(name.endswith("_2") for name in changes.updated)
+
+        # the recorded transform is applied to the new surfaces
+        expected = load("tests/test_datac2.txt")
+        expected.transform(T=np.array([1.0, 0, 0]))
+        assert np.allclose(
+            watcher.system.configs[1].surfaces.coords,
+            expected.surfaces.coords,
+        )
+
+    def test_unparseable_file_is_kept(self, tmp_path):
+        files = copy_configs(tmp_path)
+        watcher = zemax_to_cad.EquationsWatcher(
+            files, str(tmp_path / "equations.txt")
+        )
+        watcher.load()
+        config = watcher.system.configs[0]
+
+        with open(files[0], "w", encoding="utf-8") as f:
+            f.write("half written\n")
+
+        assert watcher.update([files[0]]) is None
+        assert watcher.system.configs[0] is config
+
+    @pytest.mark.parametrize("use_inotify", [False, True])
+    def test_run_debounces_writes(self, tmp_path, use_inotify):
+        if use_inotify and not watch._InotifyEvents.available():
+            pytest.skip("inotify is not available")
+        files = copy_configs(tmp_path)
+        watcher = zemax_to_cad.EquationsWatcher(
+            files,
+            str(tmp_path / "equations.txt"),
+            debounce=0.2,
+            poll_interval=0.05,
+            use_inotify=use_inotify,
+        )
+        watcher.load()
+        updates = []
+        update = watcher.update
+        watcher.update = lambda *args: updates.append(args) or update(*args)
+
+        def write_burst():
+            time.sleep(0.2)
+            for file in files:
+                shutil.copy("tests/test_datac2.txt", file)
+                time.sleep(0.05)
+
+        writer = threading.Thread(target=write_burst)
+        writer.start()
+        watcher.run(max_updates=1)
+        writer.join()
+
+        assert len(updates) == 1
+        assert sorted(updates[0][0]) == sorted(files)
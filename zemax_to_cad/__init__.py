@@ -2,10 +2,49 @@ __version__ = "0.0.1"
 
 # Import as modules
 from . import surface
+from . import surface_table
+from . import prescription
+from . import propagation
+from . import cache
+from . import storage
+from . import csv_format
+from . import system_array
+from . import cad_export
+from . import selection
+from . import equations
 
 from .surface import *
+from .surface_table import *
+from .prescription import *
+from .propagation import *
+from .cache import *
+from .storage import *
+from .csv_format import *
+from .system_array import *
+from .cad_export import *
+from .selection import *
+from .equations import *
 from .optical_system import *
+from . import watch
+from .watch import *
+from . import cli
+from .cli import *
 
-modules = [surface, optical_system]
+modules = [
+    surface,
+    surface_table,
+    prescription,
+    propagation,
+    cache,
+    storage,
+    csv_format,
+    system_array,
+    cad_export,
+    selection,
+    equations,
+    optical_system,
+    watch,
+    cli,
+]
 
 __all__ = [module.__all__ for module in modules]
@@ -0,0 +1,241 @@
+import hashlib
+import json
+import os
+import zipfile
+
+import numpy as np
+
+from zemax_to_cad import prescription
+from zemax_to_cad.surface_table import SurfaceTable
+
+__all__ = ["ParseCache"]
+
+
+class ParseCache:
+    """An on-disk cache of parsed prescription files.
+
+    Each parsed file is stored as an uncompressed .npz of its SurfaceTable
+    columns, named by PREFIX and a hash of the file contents. A manifest maps the path
+    of each file to its size, modification time and content hash, so an
+    unchanged file is found with a single stat rather than by reading it,
+    and a file that was touched but not changed is found again by its hash.
+
+    The entries are limited to max_bytes in total, evicting the least
+    recently used first (the modification time of an entry is updated on
+    each hit). All entries are dropped when prescription.PARSER_VERSION
+    changes. Only files named with PREFIX are ever removed, so the cache
+    can share a directory with other files.
+
+    hits and misses count the lookups made through this object.
+    """
+
+    PREFIX = "zemax_to_cad-"
+    MANIFEST = f"{PREFIX}manifest.json"
+    SUFFIX = ".npz"
+    DEFAULT_MAX_BYTES = 256 * 2**20
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._files = self._load_manifest()
+
+    @staticmethod
+    def from_arg(cache):
+        """The cache for an argument that is either a cache or a directory"""
+        if isinstance(cache, ParseCache):
+            return cache
+        return ParseCache(cache)
+
+    @property
+    def size_bytes(self) -> int:
+        """The total size of the cached entries"""
+        return sum(size for _, size, _ in self._entries())
+
+    def load(self, txt_file: str, parse: callable, *args):
+        """Get the table of a file from the cache, or parse and cache it
+
+        Args:
+            txt_file (str): A location for the prescription file
+            parse (callable): A function (txt_file, *args) -> SurfaceTable,
+                called on a miss, e.g. read_vertex_table
+            *args: Further arguments to parse
+
+        Returns:
+            SurfaceTable: the table of the file
+        """
+        table = self.get(txt_file)
+        if table is None:
+            table = parse(txt_file, *args)
+            self.put(txt_file, table)
+        return table
+
+    def get(self, txt_file: str):
+        """Look up the table of a file
+
+        Args:
+            txt_file (str): A location for the prescription file
+
+        Returns:
+            SurfaceTable: the cached table, or None if the file has changed
+                or was never cached
+        """
+        path, stamp = ParseCache._stamp(txt_file)
+        known = self._files.get(path)
+
+        table = None
+        if known is not None and known[:2] == stamp:
+            table = self._read_entry(known[2])
+
+        if table is None:
+            key = ParseCache._hash_file(txt_file)
+            self._files[path] = stamp + [key]
+            table = self._read_entry(key)
+            if table is not None:
+                self._save_manifest()
+
+        if table is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return table
+
+    def put(self, txt_file: str, table: SurfaceTable):
+        """Store the table parsed from a file, evicting old entries if the
+        cache is over its size limit
+
+        Args:
+            txt_file (str): A location for the prescription file
+            table (SurfaceTable): The table parsed from it
+        """
+        path, stamp = ParseCache._stamp(txt_file)
+        known = self._files.get(path)
+        if known is not None and known[:2] == stamp:
+            key = known[2]
+        else:
+            key = ParseCache._hash_file(txt_file)
+            self._files[path] = stamp + [key]
+
+        names = np.array(
+            ["" if name is None else name for name in table.names], dtype=str
+        )
+        entry_file = self._entry_file(key)
+        tmp_file = f"{entry_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            np.savez(
+                f,
+                indices=table.indices,
+                coords=table.coords,
+                rotations=table.rotations,
+                tilts=table.tilts,
+                names=names,
+                named=np.array([name is not None for name in table.names]),
+            )
+        os.replace(tmp_file, entry_file)
+
+        self._evict()
+        self._save_manifest()
+
+    def clear(self):
+        """Remove every cached entry"""
+        for entry_file, _, _ in self._entries():
+            os.remove(entry_file)
+        self._files = {}
+        self._save_manifest()
+
+    def _read_entry(self, key):
+        """helper to read an entry as a table, None if it is missing"""
+        entry_file = self._entry_file(key)
+        try:
+            with np.load(entry_file, allow_pickle=False) as entry:
+                names = [
+                    str(name) if named else None
+                    for name, named in zip(entry["names"], entry["named"])
+                ]
+                table = SurfaceTable(
+                    entry["indices"],
+                    entry["coords"],
+                    entry["tilts"],
+                    names,
+                    rotations=entry["rotations"],
+                )
+            os.utime(entry_file)  # mark as recently used
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            return None
+        return table
+
+    def _evict(self):
+        """helper to remove the least recently used entries until the cache
+        is within its size limit"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for entry_file, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(entry_file)
+            total -= size
+
+    def _entries(self):
+        """helper to list (file, size, last used) for every entry"""
+        entries = []
+        for fname in os.listdir(self.directory):
+            if fname.startswith(ParseCache.PREFIX) and fname.endswith(
+                ParseCache.SUFFIX
+            ):
+                entry_file = os.path.join(self.directory, fname)
+                stat = os.stat(entry_file)
+                entries.append((entry_file, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def _entry_file(self, key):
+        return os.path.join(
+            self.directory, f"{ParseCache.PREFIX}{key}{ParseCache.SUFFIX}"
+        )
+
+    def _load_manifest(self):
+        """helper to read the manifest, dropping every entry if it was
+        written by a different parser version"""
+        try:
+            with open(
+                os.path.join(self.directory, ParseCache.MANIFEST),
+                encoding="utf-8",
+            ) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        if manifest.get("parser_version") != prescription.PARSER_VERSION:
+            for entry_file, _, _ in self._entries():
+                os.remove(entry_file)
+            return {}
+        return manifest["files"]
+
+    def _save_manifest(self):
+        manifest_file = os.path.join(self.directory, ParseCache.MANIFEST)
+        tmp_file = f"{manifest_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "parser_version": prescription.PARSER_VERSION,
+                    "files": self._files,
+                },
+                f,
+            )
+        os.replace(tmp_file, manifest_file)
+
+    @staticmethod
+    def _stamp(txt_file):
+        """helper to get the absolute path and [size, mtime] of a file"""
+        stat = os.stat(txt_file)
+        return os.path.abspath(txt_file), [stat.st_size, stat.st_mtime_ns]
+
+    @staticmethod
+    def _hash_file(txt_file, chunk_size=1 << 20):
+        digest = hashlib.blake2b(digest_size=16)
+        with open(txt_file, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
@@ -0,0 +1,103 @@
+import numpy as np
+
+from zemax_to_cad.surface import StateSubset
+from zemax_to_cad.surface_table import SurfaceTable
+
+__all__ = ["CadExport", "format_values"]
+
+# the name of each StateSubset, by column of the Nx6 state (coords, tilts)
+SUBSET_NAMES = [subset.name for subset in StateSubset.ALL()]
+
+
+def format_values(values, precision: int = None) -> np.ndarray:
+    """Format an array of numbers as strings, all at once
+
+    Args:
+        values (np.ndarray): The numbers to format
+        precision (int, optional): The number of decimal places to write.
+            Defaults to None, writing the shortest string that reads back as
+            the same float.
+
+    Returns:
+        np.ndarray: the strings, in the shape of values
+    """
+    values = np.asarray(values, dtype=float)
+    if precision is None:
+        return values.astype(str)
+
+    # round first so that values that round to zero are not written as -0.0
+    rounded = np.round(values, precision)
+    rounded[rounded == 0.0] = 0.0
+    return np.char.mod(f"%.{precision}f", rounded)
+
+
+class CadExport:
+    """The CAD variables to write for a table of surfaces.
+
+    Built once from the selected (row, column) pairs, with the name of each
+    variable ("<identifier>_<subset>", where the identifier is the surface
+    name, or its number if unnamed) worked out up front. The values are
+    read from the table when writing, so the same export can be written
+    again after the surfaces move.
+    """
+
+    def __init__(self, table: SurfaceTable, rows, cols):
+        self.table = table
+        self.rows = np.asarray(rows, dtype=int)
+        self.cols = np.asarray(cols, dtype=int)
+
+        identifiers = [
+            str(index) if name is None else str(name)
+            for index, name in zip(table.indices.tolist(), table.names)
+        ]
+        self.names = [
+            f"{identifiers[row]}_{SUBSET_NAMES[col]}"
+            for row, col in zip(self.rows.tolist(), self.cols.tolist())
+        ]
+
+    def __len__(self):
+        return len(self.names)
+
+    def values(self) -> np.ndarray:
+        """The current value of each variable"""
+        table = self.table
+        state = np.hstack([table.coords, table.tilts])
+        return state[self.rows, self.cols]
+
+    def text(self, suffix: str = "", precision: int = None) -> str:
+        """The lines "<name><suffix>" = <value> of every variable
+
+        Args:
+            suffix (str, optional): Added to every name, usually
+                "_<config number>". Defaults to "".
+            precision (int, optional): See format_values.
+
+        Returns:
+            str: the lines, each ending in a newline
+        """
+        return CadExport.format_lines(
+            [f"{name}{suffix}" for name in self.names],
+            self.values(),
+            precision,
+        )
+
+    def write(self, opened_file, suffix: str = "", precision: int = None):
+        """Write every variable to a file in a single call, see text"""
+        opened_file.write(self.text(suffix, precision))
+
+    @staticmethod
+    def format_lines(names, values, precision: int = None) -> str:
+        """The lines "<name>" = <value> for names and values
+
+        Args:
+            names (Sequence[str]): The variable names
+            values (np.ndarray): The value of each variable
+            precision (int, optional): See format_values.
+
+        Returns:
+            str: the lines, each ending in a newline
+        """
+        texts = format_values(values, precision)
+        return "".join(
+            f'"{name}" = {text}\n' for name, text in zip(names, texts)
+        )
@@ -0,0 +1,386 @@
+import argparse
+import glob
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import NamedTuple
+
+import numpy as np
+
+from zemax_to_cad.surface import StateSubset
+from zemax_to_cad.selection import (
+    AllSurfaces,
+    Components,
+    CoordinateBreaks,
+    DummySurfaces,
+    IndexRange,
+    Indices,
+    NamePattern,
+    Names,
+    OpticalSurfaces,
+    SurfaceTypes,
+)
+from zemax_to_cad.optical_system import MultiConfigSystem
+
+__all__ = ["BatchJob", "JobTiming", "load_jobs", "run_jobs", "main"]
+
+# the selectors of the "kind" key of a selector spec
+KINDS = {
+    "all": AllSurfaces,
+    "optical": OpticalSurfaces,
+    "coordinate_breaks": CoordinateBreaks,
+    "dummies": DummySurfaces,
+}
+
+
+class JobTiming(NamedTuple):
+    """The seconds spent on each stage of a BatchJob"""
+
+    name: str
+    files: int
+    parse: float
+    transform: float
+    write: float
+
+
+class BatchJob:
+    """A conversion of the prescriptions of one instrument to CAD equations
+    files, read from a JSON job spec such as
+
+        {
+            "name": "hdllr",
+            "inputs": ["Zemax_txts/hdllr_c*.txt"],
+            "config_numbers": [1, 2, 3, 4],
+            "transforms": [
+                {"T": [0, 44.8, -0.736], "filter": {"names": ["OAP 1"]}},
+                {
+                    "R": [[0, 0, 1], [0, 1, 0], [-1, 0, 0]],
+                    "T": [-510, 200, 150]
+                }
+            ],
+            "outputs": [
+                {
+                    "path": "hdllr_equations.txt",
+                    "include": {"names": ["OAP 1", "DM"]},
+                    "components": ["X", "Y", "Z", "TILT_Y"],
+                    "mode": "update",
+                    "delta": false,
+                    "precision": 6
+                }
+            ]
+        }
+
+    The input globs are expanded in order, each sorted with the numbers in
+    file names compared by value (so c2 comes before c10). The
+    configuration numbers default to 1, 2, ... Each transform is {"R", "T",
+    "filter"}, all optional, as in MultiConfigSystem.transform. Each output
+    writes a file ("mode": "write", the default) or merges into an existing
+    equations file ("mode": "update", see
+    MultiConfigSystem.update_equations_file).
+
+    A selector ("filter" and "include") is a surface name, a list of names,
+    or a dict of any of "names", "pattern" (see NamePattern), "indices",
+    "range" ([first, last], see IndexRange), "types" (see SurfaceTypes) and
+    "kind" ("all", "optical", "coordinate_breaks" or "dummies"), selecting
+    the surfaces that match all of them, and "exclude", a selector of
+    surfaces to leave out. Components are a list of StateSubset names, or
+    {"default": [...], "surfaces": {name: [...]}} to choose them by surface.
+
+    Relative paths are relative to base_dir.
+
+    Args:
+        spec (dict): The job spec
+        base_dir (str, optional): The directory relative paths are relative
+            to. Defaults to the working directory.
+    """
+
+    MODES = ("write", "update")
+
+    def __init__(self, spec: dict, base_dir: str = "."):
+        self.name = spec.get("name", "job")
+        self.base_dir = base_dir
+
+        self.txt_files = []
+        for pattern in spec.get("inputs", []):
+            matches = sorted(glob.glob(self._path(pattern)), key=_natural_key)
+            if not matches:
+                raise ValueError(f"{self.name}: no files match {pattern}")
+            self.txt_files.extend(matches)
+        if not self.txt_files:
+            raise ValueError(f"{self.name}: no inputs given")
+
+        self.config_numbers = spec.get("config_numbers")
+        if self.config_numbers is None:
+            self.config_numbers = list(range(1, 1 + len(self.txt_files)))
+        if len(self.config_numbers) != len(self.txt_files):
+            raise ValueError(
+                f"{self.name}: {len(self.txt_files)} files but "
+                f"{len(self.config_numbers)} configuration numbers"
+            )
+
+        self.transforms = [
+            (
+                np.array(transform.get("R", np.eye(3)), dtype=float),
+                np.array(transform.get("T", np.zeros(3)), dtype=float),
+                _selector(transform.get("filter")),
+            )
+            for transform in spec.get("transforms", [])
+        ]
+
+        self.outputs = []
+        for output in spec.get("outputs", []):
+            if "path" not in output:
+                raise ValueError(f"{self.name}: an output has no path")
+            mode = output.get("mode", "write")
+            if mode not in BatchJob.MODES:
+                raise ValueError(
+                    f"{self.name}: mode must be one of {BatchJob.MODES}, "
+                    f"not {mode}"
+                )
+            self.outputs.append(
+                dict(
+                    path=self._path(output["path"]),
+                    mode=mode,
+                    include_filter=_selector(output.get("include")),
+                    format_filter_function=_components(
+                        output.get("components")
+                    ),
+                    delta=output.get("delta", False),
+                    precision=output.get("precision"),
+                )
+            )
+        if not self.outputs:
+            raise ValueError(f"{self.name}: no outputs given")
+
+    def run(self, executor: Executor = None) -> JobTiming:
+        """Parse, transform and write the job
+
+        Args:
+            executor (Executor, optional): An executor to parse the files
+                on. Defaults to parsing them one after another.
+
+        Returns:
+            JobTiming: the time taken by each stage
+        """
+        start = time.perf_counter()
+        system = MultiConfigSystem.load_from_multiple_configs(
+            self.txt_files, self.config_numbers, executor=executor
+        )
+        parsed = time.perf_counter()
+
+        for R, T, filter_fn in self.transforms:
+            system.transform(R, T, filter_fn)
+        transformed = time.perf_counter()
+
+        for output in self.outputs:
+            output = dict(output)
+            path = output.pop("path")
+            if output.pop("mode") == "update":
+                system.update_equations_file(path, **output)
+            else:
+                with open(path, "w", encoding="utf-8") as f:
+                    system.file_write(f, **output)
+        written = time.perf_counter()
+
+        return JobTiming(
+            self.name,
+            len(self.txt_files),
+            parsed - start,
+            transformed - parsed,
+            written - transformed,
+        )
+
+    def _path(self, path):
+        return os.path.join(self.base_dir, path)
+
+
+def _natural_key(path):
+    """helper to sort file names with the numbers in them compared by
+    value"""
+    parts = re.split(r"(\d+)", path)
+    # the odd parts are the numbers
+    parts[1::2] = [int(part) for part in parts[1::2]]
+    return parts
+
+
+def _selector(spec):
+    """helper to build the selector of a job spec"""
+    if spec is None:
+        return AllSurfaces()
+    if isinstance(spec, str):
+        return Names(spec)
+    if isinstance(spec, list):
+        return Names(*spec)
+
+    unknown = set(spec) - {
+        "names",
+        "pattern",
+        "indices",
+        "range",
+        "types",
+        "kind",
+        "exclude",
+    }
+    if unknown:
+        raise ValueError(f"Unknown selector keys {sorted(unknown)}")
+    if "kind" in spec and spec["kind"] not in KINDS:
+        raise ValueError(
+            f"kind must be one of {list(KINDS)}, not {spec['kind']}"
+        )
+
+    selector = AllSurfaces()
+    if "names" in spec:
+        selector = selector & Names(*spec["names"])
+    if "pattern" in spec:
+        selector = selector & NamePattern(spec["pattern"])
+    if "indices" in spec:
+        selector = selector & Indices(*spec["indices"])
+    if "range" in spec:
+        selector = selector & IndexRange(*spec["range"])
+    if "types" in spec:
+        selector = selector & SurfaceTypes(*spec["types"])
+    if "kind" in spec:
+        selector = selector & KINDS[spec["kind"]]()
+    if "exclude" in spec:
+        selector = selector & ~_selector(spec["exclude"])
+    return selector
+
+
+def _components(spec):
+    """helper to build the components of a job spec"""
+    if spec is None:
+        return Components({})
+    if isinstance(spec, list):
+        return Components({}, default=_subsets(spec))
+    return Components(
+        {
+            Names(name): _subsets(subsets)
+            for name, subsets in spec.get("surfaces", {}).items()
+        },
+        default=None if "default" not in spec else _subsets(spec["default"]),
+    )
+
+
+def _subsets(names):
+    """helper to get the StateSubsets of a list of names"""
+    try:
+        return [StateSubset[name] for name in names]
+    except KeyError as err:
+        raise ValueError(
+            f"Unknown component {err}, "
+            f"expected one of {[sub.name for sub in StateSubset.ALL()]}"
+        ) from None
+
+
+def load_jobs(spec_file: str) -> list:
+    """Read the jobs of a JSON job spec file, either a single job, a list of
+    jobs, or {"jobs": [...]}. See BatchJob for the format of a job, with
+    paths relative to the spec file.
+
+    Args:
+        spec_file (str): The file to read
+
+    Returns:
+        list[BatchJob]: the jobs, in order
+    """
+    with open(spec_file, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    if isinstance(spec, dict):
+        spec = spec.get("jobs", [spec])
+
+    base_dir = os.path.dirname(os.path.abspath(spec_file))
+    return [BatchJob(job, base_dir) for job in spec]
+
+
+def run_jobs(jobs, workers: int = None) -> list:
+    """Run several jobs at once: the files of every job are parsed on one
+    pool of processes, and the jobs are transformed and written on a pool
+    of threads
+
+    Args:
+        jobs (Sequence[BatchJob]): The jobs to run
+        workers (int, optional): The number of processes to parse with.
+            Defaults to the number of CPUs. 1 parses in this process.
+
+    Returns:
+        list[JobTiming]: the time taken by each stage of each job, in order
+    """
+    if not jobs:
+        return []
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers == 1:
+        return [job.run() for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as parse_pool:
+        with ThreadPoolExecutor(max_workers=len(jobs)) as job_pool:
+            futures = [job_pool.submit(job.run, parse_pool) for job in jobs]
+            return [future.result() for future in futures]
+
+
+def main(argv=None) -> int:
+    """The zemax-to-cad command: run the jobs of a job spec file and print
+    the time taken by each stage"""
+    parser = argparse.ArgumentParser(
+        prog="zemax-to-cad",
+        description=(
+            "Convert Zemax prescription text files to CAD equations files, "
+            "as described by a JSON job spec"
+        ),
+    )
+    parser.add_argument("spec", help="the JSON job spec file")
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=None,
+        help="processes to parse with (default: the number of CPUs)",
+    )
+    parser.add_argument(
+        "--only",
+        nargs="+",
+        metavar="NAME",
+        help="run only the jobs with these names",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        jobs = load_jobs(args.spec)
+        if args.only is not None:
+            missing = set(args.only) - {job.name for job in jobs}
+            if missing:
+                raise ValueError(f"No jobs named {sorted(missing)}")
+            jobs = [job for job in jobs if job.name in args.only]
+        loaded = time.perf_counter()
+        timings = run_jobs(jobs, args.workers)
+    except (ValueError, OSError) as err:
+        print(f"zemax-to-cad: error: {err}", file=sys.stderr)
+        return 1
+
+    print(
+        f"{'job':<20} {'files':>5} {'parse':>10} {'transform':>10} "
+        f"{'write':>10}"
+    )
+    for timing in timings:
+        print(
+            f"{timing.name:<20} {timing.files:>5} "
+            f"{1e3 * timing.parse:>8.1f}ms {1e3 * timing.transform:>8.1f}ms "
+            f"{1e3 * timing.write:>8.1f}ms"
+        )
+    print(
+        f"{len(timings)} jobs in {1e3 * (time.perf_counter() - start):.1f} ms "
+        f"(reading the spec {1e3 * (loaded - start):.1f} ms)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,150 @@
+import csv
+import itertools
+from typing import Iterator
+
+import numpy as np
+
+from zemax_to_cad.surface_table import SurfaceTable
+
+__all__ = ["write_csv", "read_csv", "iter_csv"]
+
+VERSION = 1
+VERSION_LINE = f"# zemax_to_cad csv {VERSION}"
+COLUMNS = ["index", "x", "y", "z", "tilt_x", "tilt_y", "tilt_z", "name"]
+
+# the number of numeric columns, before the name
+N_VALUES = len(COLUMNS) - 1
+
+DEFAULT_CHUNK_ROWS = 1 << 16
+
+
+def write_csv(
+    file_name: str, table: SurfaceTable, chunk_rows=DEFAULT_CHUNK_ROWS
+):
+    """Write a table of surfaces to a csv file with a versioned header
+
+    The numbers are formatted a column at a time, to the shortest string
+    that reads back as the same float, and names are quoted where needed
+    (e.g. when they contain commas). Rows are written chunk_rows at a time,
+    so the formatted text of a large table is never held all at once.
+
+    Args:
+        file_name (str): The location to write the file to
+        table (SurfaceTable): The surfaces to write
+        chunk_rows (int, optional): The number of rows to format at once.
+            Defaults to DEFAULT_CHUNK_ROWS.
+    """
+    indices = table.indices
+    values = np.hstack([table.coords, table.tilts])
+    names = ["" if name is None else name for name in table.names]
+
+    with open(file_name, "w", encoding="utf-8", newline="") as f:
+        f.write(f"{VERSION_LINE}\n")
+        writer = csv.writer(f, lineterminator="\n")
+        writer.writerow(COLUMNS)
+        for start in range(0, len(table), chunk_rows):
+            end = start + chunk_rows
+            writer.writerows(
+                zip(
+                    indices[start:end].astype(str),
+                    *values[start:end].astype(str).T,
+                    names[start:end],
+                )
+            )
+
+
+def read_csv(file_name: str) -> SurfaceTable:
+    """Read a table of surfaces from a csv file
+
+    Reads both the files written by write_csv and the older headerless
+    files of Surface.to_csv_line rows.
+
+    Args:
+        file_name (str): A location for the file to be read
+
+    Returns:
+        SurfaceTable: the surfaces of the file, in order
+    """
+    chunks = list(iter_csv(file_name))
+    if not chunks:
+        return SurfaceTable([], np.zeros((0, 3)), np.zeros((0, 3)))
+    if len(chunks) == 1:
+        return chunks[0]
+
+    return SurfaceTable(
+        np.concatenate([chunk.indices for chunk in chunks]),
+        np.concatenate([chunk.coords for chunk in chunks]),
+        np.concatenate([chunk.tilts for chunk in chunks]),
+        [name for chunk in chunks for name in chunk.names],
+    )
+
+
+def iter_csv(
+    file_name: str, chunk_rows=DEFAULT_CHUNK_ROWS
+) -> Iterator[SurfaceTable]:
+    """Stream the surfaces of a csv file as tables of up to chunk_rows rows
+
+    Each chunk's numbers are converted as one array rather than one field at
+    a time.
+
+    Args:
+        file_name (str): A location for the file to be read
+        chunk_rows (int, optional): The largest number of rows in each
+            table. Defaults to DEFAULT_CHUNK_ROWS.
+
+    Yields:
+        SurfaceTable: consecutive chunks of the surfaces of the file
+    """
+    with open(file_name, "r", encoding="utf-8", newline="") as f:
+        first = f.readline()
+        if first.startswith("#"):
+            _check_version(first, file_name)
+            f.readline()  # the column names
+            rows = csv.reader(f)
+            legacy = False
+        else:
+            rows = csv.reader(itertools.chain([first], f))
+            legacy = True
+
+        rows = (row for row in rows if row)
+        while True:
+            chunk = list(itertools.islice(rows, chunk_rows))
+            if not chunk:
+                return
+            yield _parse_rows(chunk, legacy, file_name)
+
+
+def _parse_rows(rows, legacy, file_name):
+    """helper to convert csv rows into a table"""
+    try:
+        values = np.array([row[:N_VALUES] for row in rows], dtype=float)
+    except ValueError as err:
+        raise ValueError(f"Malformed csv row in {file_name}: {err}") from None
+    if values.shape[1:] != (N_VALUES,):
+        raise ValueError(f"Malformed csv row in {file_name}")
+
+    if legacy:
+        # names were written unquoted, so any commas split them up
+        names = [",".join(row[N_VALUES:]) for row in rows]
+    else:
+        names = [row[N_VALUES] if len(row) > N_VALUES else "" for row in rows]
+
+    return SurfaceTable(
+        values[:, 0].astype(int),
+        values[:, 1:4],
+        values[:, 4:7],
+        [name if name != "" else None for name in names],
+    )
+
+
+def _check_version(line, file_name):
+    """helper to check the version line of a csv file"""
+    prefix = VERSION_LINE.rsplit(" ", 1)[0]
+    if not line.startswith(prefix):
+        raise ValueError(f"{file_name} is not a zemax_to_cad csv file")
+    version = int(line[len(prefix) :])
+    if version > VERSION:
+        raise ValueError(
+            f"{file_name} has csv version {version}, "
+            f"but only up to version {VERSION} can be read"
+        )
@@ -0,0 +1,176 @@
+import os
+import re
+from typing import Dict, NamedTuple
+
+from zemax_to_cad.cad_export import format_values
+
+__all__ = ["EquationsFile", "EquationChanges"]
+
+# a line of a CAD equations file such as "OAP 1_X_1" = 12.5 'a comment,
+# where the value is everything up to a comment (outside of quotes)
+EQUATION = re.compile(
+    r'\s*"(?P<name>[^"]*)"\s*=\s*'
+    r'(?P<value>(?:"[^"]*"|[^\'"])*?(?:"[^"]*)?)\s*(?P<comment>\'.*)?'
+)
+
+
+class EquationChanges(NamedTuple):
+    """The variables added, updated and left as they were by
+    EquationsFile.update"""
+
+    added: list
+    updated: list
+    unchanged: list
+
+    @property
+    def changed(self) -> bool:
+        """Whether anything was added or updated"""
+        return bool(self.added or self.updated)
+
+
+class EquationsFile:
+    """The lines of a CAD equations file, with an index of the
+    "name" = value equations in it.
+
+    update() rewrites only the values of the equations that changed (and
+    appends new ones), keeping every other line, e.g. equations that were
+    added in the CAD program, exactly as it was, and the rest of each
+    rewritten line, e.g. a comment added to it in the CAD program.
+    """
+
+    def __init__(self, lines=None):
+        self.lines = [] if lines is None else list(lines)
+        self._index = {}
+        for line_number, line in enumerate(self.lines):
+            match = EQUATION.fullmatch(line.rstrip("\r\n"))
+            if match is not None:
+                self._index.setdefault(match["name"], line_number)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    @property
+    def names(self):
+        """The names of all equations, in the order they appear"""
+        return list(self._index)
+
+    def value(self, name: str):
+        """The value of an equation
+
+        Args:
+            name (str): The name of the variable
+
+        Returns:
+            float: the value, or None if it is not a plain number (e.g. it
+                is an expression)
+        """
+        line = self.lines[self._index[name]].rstrip("\r\n")
+        try:
+            return float(EQUATION.fullmatch(line)["value"])
+        except ValueError:
+            return None
+
+    def update(
+        self,
+        values: Dict[str, float],
+        atol: float = 0.0,
+        precision: int = None,
+    ) -> EquationChanges:
+        """Set the values of equations, only touching the lines of those
+        that change by more than atol
+
+        Args:
+            values (Dict[str, float]): The value of each variable
+            atol (float, optional): The largest change to ignore. Defaults to
+                0.0, updating any changed value.
+            precision (int, optional): The number of decimal places to write,
+                see format_values. Values are compared as written. Defaults
+                to None.
+
+        Returns:
+            EquationChanges: the names of the variables that were added,
+                updated or left unchanged
+        """
+        changes = EquationChanges([], [], [])
+        texts = format_values(list(values.values()), precision)
+        for name, text in zip(values, texts.tolist()):
+            line = f'"{name}" = {text}\n'
+            if name not in self._index:
+                if self.lines and not self.lines[-1].endswith("\n"):
+                    self.lines[-1] += "\n"
+                self._index[name] = len(self.lines)
+                self.lines.append(line)
+                changes.added.append(name)
+                continue
+
+            old = self.value(name)
+            if old is not None and abs(old - float(text)) <= atol:
+                changes.unchanged.append(name)
+            else:
+                # only replace the value, keeping any comment and the line
+                # ending of the file
+                old_line = self.lines[self._index[name]]
+                body = old_line.rstrip("\r\n")
+                match = EQUATION.fullmatch(body)
+                self.lines[self._index[name]] = (
+                    body[: match.start("value")]
+                    + text
+                    + body[match.end("value") :]
+                    + (old_line[len(body) :] or "\n")
+                )
+                changes.updated.append(name)
+        return changes
+
+    def write(self, file_name: str):
+        """Write the equations to a file, replacing it in one step
+
+        Args:
+            file_name (str): The location to write the file to
+        """
+        tmp_file = f"{file_name}.tmp"
+        with open(tmp_file, "w", encoding="utf-8", newline="") as f:
+            f.write("".join(self.lines))
+        os.replace(tmp_file, file_name)
+
+    @staticmethod
+    def read(file_name: str):
+        """Read an equations file, or start an empty one if it is missing
+
+        Args:
+            file_name (str): A location for the file to be read
+
+        Returns:
+            EquationsFile: the lines and equations of the file
+        """
+        try:
+            with open(file_name, "r", encoding="utf-8", newline="") as f:
+                return EquationsFile(f.readlines())
+        except FileNotFoundError:
+            return EquationsFile()
+
+    @staticmethod
+    def merge(
+        file_name: str,
+        values: Dict[str, float],
+        atol: float = 0.0,
+        precision: int = None,
+    ) -> EquationChanges:
+        """Update the equations in a file, see update, only writing the file
+        if anything changed
+
+        Args:
+            file_name (str): The equations file, created if it is missing
+            values (Dict[str, float]): The value of each variable
+            atol (float, optional): The largest change to ignore. Defaults to
+                0.0.
+            precision (int, optional): See update. Defaults to None.
+
+        Returns:
+            EquationChanges: the names of the variables that were added,
+                updated or left unchanged
+        """
+        equations = EquationsFile.read(file_name)
+        changes = equations.update(values, atol, precision)
+        if changes.changed or not os.path.exists(file_name):
+            equations.write(file_name)
+        return changes
@@ -1,39 +1,217 @@
-from typing import Sequence
+import warnings
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import NamedTuple, Sequence, Union
 
 
 # from zemax_to_cad.surface import Surface
 from zemax_to_cad.surface import Surface, StateSubset
-from enum import Enum
+from zemax_to_cad.surface_table import SurfaceTable
+from zemax_to_cad.prescription import (
+    read_vertex_table,
+    read_surface_summary,
+    read_surface_details,
+    read_multi_config,
+    read_solves,
+    read_curvature_centers,
+    read_cardinal_points,
+    PrescriptionIndex,
+    SUMMARY_SECTION,
+)
+from zemax_to_cad.cache import ParseCache
+from zemax_to_cad.storage import write_tables, read_tables
+from zemax_to_cad.csv_format import write_csv, read_csv
+from zemax_to_cad.system_array import SystemArray
+from zemax_to_cad.equations import EquationsFile, EquationChanges
+from zemax_to_cad.cad_export import CadExport
+from zemax_to_cad.selection import Selector, Components
+from zemax_to_cad.propagation import FramePropagator
 import numpy as np
 
-__all__ = ["OpticalConfiguration", "MultiConfigSystem"]
+__all__ = [
+    "OpticalConfiguration",
+    "MultiConfigSystem",
+    "PathPoint",
+    "CadVariables",
+]
 
 
-class PrescCols(Enum):
-    """Column indicies for Zemax prescription data"""
+class PathPoint(NamedTuple):
+    """A point a distance along the path of the beam.
 
-    SURF = 0
-    Rx1 = 1
-    Rx2 = 2
-    Rx3 = 3
-    POS = 4
-    TILT = 5
-    NAME = 6
+    For OpticalConfiguration.point_at_distance, before and after are the
+    Surfaces either side of the point. For the batched versions, each field
+    is an array with a leading entry per distance (and per configuration),
+    and before and after hold surface positions.
+    """
+
+    before: Union[Surface, np.ndarray]
+    after: Union[Surface, np.ndarray]
+    residual: Union[float, np.ndarray]  # the distance past before
+    point: np.ndarray
+
+
+class CadVariables(NamedTuple):
+    """The CAD variables written for a MultiConfigSystem, compared across
+    configurations.
+
+    names holds the V variable names (without the configuration suffix),
+    values the CxV value of each in each configuration (NaN where a
+    configuration does not write it), and varying whether each differs
+    between configurations by more than the tolerance, or is missing from
+    some.
+    """
+
+    names: list
+    values: np.ndarray
+    varying: np.ndarray
 
 
 class OpticalConfiguration:
     """A zemax optical configuration, with a collection of surfaces and
-    their positions"""
+    their positions.
+
+    The surfaces are stored in a SurfaceTable, and `surfaces[i]` gives a
+    Surface view onto row i of that table.
+
+    With `deferred=True`, calls to transform are only recorded (and fused
+    where consecutive calls select the same surfaces), and are applied once
+    when the surface positions are next read or when flush() is called.
+    Filters passed to transform are still evaluated immediately, so in
+    deferred mode they should only depend on the surface names and indices.
+
+    A configuration loaded from a prescription keeps the name of the file
+    (txt_file), and its other sections (surface_details, multi_config,
+    solves, curvature_centers, cardinal_points and the summary of the
+    surfaces) are only parsed when first used, then kept until
+    drop_cached_sections() is called. The sections are found with one
+    index of the file per configuration (see PrescriptionIndex), built
+    when first needed unless one was given when loading.
+    """
 
     DEFAULT_START_NUM = 1
+    NAME_POLICIES = ("first", "last", "all", "raise")
 
     def __init__(
         self,
-        surfaces: Sequence[Surface],
+        surfaces: Union[SurfaceTable, Sequence[Surface]],
         config_number=DEFAULT_START_NUM,
+        deferred=False,
+        txt_file: str = None,
     ):
         self.surfaces = surfaces
         self.config_number = config_number
+        self.deferred = deferred
+        self.txt_file = txt_file
+        self._index = None
+        self._sections = {}
+
+    @property
+    def surfaces(self) -> SurfaceTable:
+        """The table of surfaces, indexable and iterable as Surfaces"""
+        return self._table
+
+    @surfaces.setter
+    def surfaces(self, surfaces: Union[SurfaceTable, Sequence[Surface]]):
+        if not isinstance(surfaces, SurfaceTable):
+            surfaces = SurfaceTable.from_surfaces(surfaces)
+        self._table = surfaces
+
+    @property
+    def deferred(self) -> bool:
+        """Whether transforms are recorded and applied on the next read"""
+        return self._table.deferred
+
+    @deferred.setter
+    def deferred(self, deferred: bool):
+        self._table.deferred = deferred
+
+    @property
+    def pending_transforms(self):
+        """Recorded transforms not yet applied, see
+        SurfaceTable.pending_transforms"""
+        return self._table.pending_transforms
+
+    def flush(self):
+        """Apply any transforms recorded in deferred mode"""
+        self._table.flush()
+
+    @property
+    def summary(self) -> dict:
+        """The SURFACE DATA SUMMARY of the surfaces, see
+        SurfaceTable.summary"""
+        return self._table.summary
+
+    @property
+    def surface_details(self) -> list:
+        """The SURFACE DATA DETAIL of the prescription, see
+        read_surface_details"""
+        return self._cached_section("surface_details", read_surface_details)
+
+    @property
+    def multi_config(self):
+        """The MULTI-CONFIGURATION DATA of the prescription, see
+        read_multi_config"""
+        return self._cached_section("multi_config", read_multi_config)
+
+    @property
+    def solves(self) -> list:
+        """The SOLVE AND VARIABLE DATA of the prescription, see
+        read_solves"""
+        return self._cached_section("solves", read_solves)
+
+    @property
+    def curvature_centers(self) -> tuple:
+        """The GLOBAL SURFACE CENTER OF CURVATURE POINTS of the
+        prescription, see read_curvature_centers"""
+        return self._cached_section(
+            "curvature_centers", read_curvature_centers
+        )
+
+    @property
+    def cardinal_points(self) -> dict:
+        """The CARDINAL POINTS of the prescription, see
+        read_cardinal_points"""
+        return self._cached_section("cardinal_points", read_cardinal_points)
+
+    def drop_cached_sections(self):
+        """Release the sections of the prescription parsed so far. They are
+        parsed again if used again."""
+        self._sections = {}
+        if self.txt_file is not None:
+            self._table.set_summary(self._read_summary)
+
+    def _cached_section(self, key, reader):
+        """helper to parse a section of the prescription with
+        reader(txt_file, index) the first time it is used"""
+        if key not in self._sections:
+            if self.txt_file is None:
+                raise ValueError(
+                    "This configuration was not loaded from a prescription"
+                )
+            self._sections[key] = reader(
+                self.txt_file, self._prescription_index()
+            )
+        return self._sections[key]
+
+    def _prescription_index(self):
+        """helper to get the index of the prescription, shared by every
+        section, reusing a saved index (see PrescriptionIndex.load) and
+        finding it again if the file changed"""
+        if self._index is None or not self._index.is_current():
+            self._index = PrescriptionIndex.load(self.txt_file, save=False)
+        return self._index
+
+    def _read_summary(self):
+        """helper to read the SURFACE DATA SUMMARY of the prescription, or
+        None if it has none"""
+        index = self._prescription_index()
+        if SUMMARY_SECTION not in index:
+            return None
+        return read_surface_summary(self.txt_file, index)
 
     def file_write(
         self,
@@ -41,32 +219,48 @@ class OpticalConfiguration:
         include_filter: callable = lambda x: True,
         format_filter_function: callable = lambda x: StateSubset.ALL(),
         use_config_number=True,
+        precision: int = None,
     ):
         """Write out the surfaces of this object to a CAD readable txt file
 
+        The variables are named and formatted in bulk and written in a
+        single call.
+
         Args:
             opened_file (file): An open file to write to
-            include_filter (callable): A function surface -> boolean that,
-                if True, indicates that the surface should be written.
-                Defaults to writing all surfaces.
-            format_filter_function (callable, optional): A function
-                surface -> list[StateSubset] indicating what components of
-                the position to write out. Defaults to writing all components.
+            include_filter (callable): A Selector, or a function
+                surface -> boolean that, if True, indicates that the surface
+                should be written. Defaults to writing all surfaces.
+            format_filter_function (callable, optional): A Components, or a
+                function surface -> list[StateSubset] indicating what
+                components of the position to write out. Defaults to writing
+                all components.
+            precision (int, optional): The number of decimal places to write,
+                see format_values. Defaults to None, the shortest string that
+                reads back as the same value.
         """
-        kwargs = {}
-        if use_config_number:
-            kwargs["config"] = self.config_number
-
-        for surf in self._get_safe_surface_filter(include_filter, bool):
-            str_to_add = surf.to_cad_string(
-                OpticalConfiguration._safe_call_filter(
-                    format_filter_function, surf, list
-                ),
-                **kwargs,
-            )
+        suffix = f"_{self.config_number}" if use_config_number else ""
+        self._cad_export(include_filter, format_filter_function).write(
+            opened_file, suffix, precision
+        )
 
-            # add string to file
-            opened_file.write(str_to_add)
+    def _cad_export(self, include_filter, format_filter_function):
+        """helper to evaluate the filters once on every surface, giving the
+        CAD variables to write"""
+        table = self._table
+        rows = np.flatnonzero(self._get_surface_mask(include_filter))
+        if isinstance(format_filter_function, Components):
+            rows, cols = format_filter_function.rows_cols(table, rows)
+            return CadExport(table, rows, cols)
+
+        export_rows, cols = [], []
+        for row in rows.tolist():
+            subsets = OpticalConfiguration._safe_call_filter(
+                format_filter_function, table[row], list
+            )
+            export_rows.extend([row] * len(subsets))
+            cols.extend(sub.value for sub in subsets)
+        return CadExport(table, export_rows, cols)
 
     def transform(
         self,
@@ -79,52 +273,135 @@ class OpticalConfiguration:
         Args:
             R (np.ndarray, optional): See Surface.transform.
             T (np.ndarray, optional): See Surface.transform.
-            filter_fn (callable, optional): a function surface -> boolean that
-                indicates if the surface should be transformed or not. Defaults
-                to True for all surface.
+            filter_fn (callable, optional): a Selector, or a function
+                surface -> boolean that indicates if the surface should be
+                transformed or not. Defaults to True for all surface.
         """
-        for surf in self._get_safe_surface_filter(filter_fn, bool):
-            surf.transform(R, T)
+        self._table.transform(R, T, self._get_surface_mask(filter_fn))
+
+    def _get_surface_mask(self, filter_fn):
+        """helper to evaluate filter_fn on every surface as a boolean mask,
+        using (and caching) the mask of a Selector"""
+        if isinstance(filter_fn, Selector):
+            return filter_fn.mask(self._table)
+        return np.fromiter(
+            (
+                OpticalConfiguration._safe_call_filter(filter_fn, s, bool)
+                for s in self._table
+            ),
+            dtype=bool,
+            count=len(self._table),
+        )
 
-    def _get_safe_surface_filter(self, filter_fn, expected_type):
-        """helper to use _safe_call_filter on all surfaces of the object"""
+    def get_surface_index(self, name: str, policy: str = "first"):
+        """Get the index of the surface with the given name
 
-        def fn(s):
-            return OpticalConfiguration._safe_call_filter(
-                filter_fn, s, expected_type
+        Args:
+            name (str): The name of the surface to find
+            policy (str, optional): What to do when several surfaces have
+                the name, one of NAME_POLICIES: "first" or "last" to give
+                that surface, "all" to give a list of every one, or "raise"
+                to raise a ValueError. Defaults to "first".
+
+        Returns:
+            int: The index of the surface with the given name, or None if
+                the surface is not found. A list (empty if not found) when
+                policy is "all".
+        """
+        if policy not in OpticalConfiguration.NAME_POLICIES:
+            raise ValueError(
+                f"Unknown policy {policy}, expected one of "
+                f"{OpticalConfiguration.NAME_POLICIES}"
             )
 
-        return filter(fn, self.surfaces)
+        rows = self._table.rows_of_name(name)
+        if policy == "all":
+            return rows
+        if not rows:
+            return None
+        if policy == "raise" and len(rows) > 1:
+            raise ValueError(f"{len(rows)} surfaces are named {name}")
+        if policy == "last":
+            return rows[-1]
+        return rows[0]
 
-    def get_surface_index(self, name: str):
-        """Get the index of the surface with the given name
+    def get_surface_by_index(self, surf_idx: int):
+        """Get the surface with a Zemax surface number
 
         Args:
-            name (str): The name of the surface to find
+            surf_idx (int): The surface number, as in Zemax
 
         Returns:
-            int: The index of the surface with the given name, or None if
-                the surface is not found.
+            Surface: The surface, or None if there is no such surface
         """
-        for i, surf in enumerate(self.surfaces):
-            if surf.name == name:
-                return i
-        return None
+        row = self._table.row_of_index(surf_idx)
+        if row is None:
+            return None
+        return self._table[row]
+
+    def duplicate_names(self):
+        """The surface names used more than once, see
+        SurfaceTable.duplicate_names
+
+        Returns:
+            dict[str, list[int]]: the indices of each duplicated name
+        """
+        return self._table.duplicate_names()
 
     def write_to_csv(self, file_name: str):
-        """Write out the surfaces of this object to a csv file
+        """Write out the surfaces of this object to a csv file, see
+        csv_format.write_csv
 
         Args:
             file_name (str): The location to write the file to
         """
-        with open(file_name, "w", encoding="utf-8") as f:
-            for surf in self.surfaces:
-                f.write(f"{surf.to_csv_line()}\n")
+        write_csv(file_name, self._table)
+
+    def save(self, file_name: str):
+        """Save this configuration to a binary file, see storage.write_tables
+
+        Unlike write_to_csv, every value is stored exactly.
+
+        Args:
+            file_name (str): The location to write the file to
+        """
+        write_tables(file_name, [self._table], [self.config_number])
+
+    @staticmethod
+    def load(file_name: str, config_number: int = None, mmap=False):
+        """Load a configuration saved with save (or MultiConfigSystem.save)
+
+        Args:
+            file_name (str): A location for the file to be read
+            config_number (int, optional): Which configuration to load, if
+                the file holds several. Defaults to the only one.
+            mmap (bool, optional): Whether to memory map the file rather
+                than reading it, see storage.read_tables. Defaults to False.
+
+        Returns:
+            OpticalConfiguration: the saved configuration
+        """
+        configs = read_tables(file_name, mmap)
+        if config_number is None:
+            if len(configs) != 1:
+                raise ValueError(
+                    f"{file_name} holds {len(configs)} configurations, "
+                    "choose one with config_number"
+                )
+            config_number = configs[0][0]
+
+        for number, table in configs:
+            if number == config_number:
+                return OpticalConfiguration(table, number)
+        raise ValueError(
+            f"No configuration {config_number} found in {file_name}"
+        )
 
     def distance_between_surfaces(self, surf1, surf2):
         """
-        Get the distance between two surfaces. Marches along the surfaces,
-        calculating the distance between each pair of surfaces, and summing.
+        Get the distance between two surfaces along the path of the beam,
+        i.e. the sum of the distances between each pair of surfaces in
+        between, found from the cumulative path lengths of the surfaces.
 
         Parameters
         ----------
@@ -142,26 +419,112 @@ class OpticalConfiguration:
         float
             The distance between the two surfaces, along the path of the beam
         """
-        d = 0
-        if isinstance(surf1, str):
-            surf1 = self.surfaces[self.get_surface_index(surf1)]
-        if isinstance(surf2, str):
-            surf2 = self.surfaces[self.get_surface_index(surf2)]
-
-        if isinstance(surf1, int):
-            surf1 = self.surfaces[surf1]
-        if isinstance(surf2, int):
-            surf2 = self.surfaces[surf2]
-
-        start_idx = self.get_surface_index(surf1.name)
-        end_idx = self.get_surface_index(surf2.name)
-        for surf_index in range(start_idx, end_idx):
-            cur_surf = self.surfaces[surf_index]
-            next_surf = self.surfaces[surf_index + 1]
-
-            # get the distance between the surfaces
-            d += np.linalg.norm(cur_surf.coords - next_surf.coords)
-        return d
+        start_idx = self._surface_row(surf1)
+        end_idx = self._surface_row(surf2)
+        return float(self._table.path_distances(start_idx, end_idx))
+
+    def distances_between_surfaces(self, starts, ends):
+        """Get the distances along the path of the beam between many pairs
+        of surfaces at once
+
+        Args:
+            starts (Sequence): The surfaces to measure from, each given as in
+                distance_between_surfaces, or an array of surface positions
+            ends (Sequence): The surfaces to measure to, in the same way
+
+        Returns:
+            np.ndarray: The distance between each pair, 0 where the end
+                surface is not after the start surface
+        """
+        return self._table.path_distances(
+            self._surface_rows(starts), self._surface_rows(ends)
+        )
+
+    def distance_matrix(self, surfaces=None):
+        """Get the distances along the path of the beam between every pair
+        of surfaces
+
+        Args:
+            surfaces (Sequence, optional): The surfaces to include, each
+                given as in distance_between_surfaces. Defaults to all.
+
+        Returns:
+            np.ndarray: matrix of the distance from each surface (first axis)
+                to each surface (second axis), 0 where the second is not
+                after the first
+        """
+        if surfaces is None:
+            return self._table.path_distance_matrix()
+        rows = self._surface_rows(surfaces)
+        return self._table.path_distances(
+            rows[:, np.newaxis], rows[np.newaxis, :]
+        )
+
+    def point_at_distance(self, start, distance: float) -> PathPoint:
+        """Find the point a distance along the path of the beam from a
+        surface, e.g. a focus, using a binary search of the cumulative path
+        lengths
+
+        Args:
+            start (str or int or Surface): The surface to measure from, as in
+                distance_between_surfaces
+            distance (float): The distance along the path, not negative and
+                not beyond the last surface
+
+        Returns:
+            PathPoint: The surfaces before and after the point, the distance
+                from the surface before to the point, and the 3D point
+        """
+        before, after, residual, point = self._table.locate_path_distances(
+            self._surface_row(start), distance
+        )
+        return PathPoint(
+            self.surfaces[int(before)],
+            self.surfaces[int(after)],
+            float(residual),
+            point,
+        )
+
+    def points_at_distances(self, start, distances) -> PathPoint:
+        """Find the points at many distances along the path of the beam
+
+        Args:
+            start (str or int or Surface): The surface to measure from, as in
+                distance_between_surfaces
+            distances (np.ndarray): The K distances along the path
+
+        Returns:
+            PathPoint: arrays of the K surface positions before and after
+                each point, the K distances past the surface before, and the
+                Kx3 points
+        """
+        return PathPoint(
+            *self._table.locate_path_distances(
+                self._surface_row(start), distances
+            )
+        )
+
+    def _surface_rows(self, surfs):
+        """helper to find the rows of many surfaces, see _surface_row"""
+        if isinstance(surfs, np.ndarray) and surfs.dtype.kind in "iu":
+            return surfs
+        return np.array([self._surface_row(surf) for surf in surfs], dtype=int)
+
+    def _surface_row(self, surf):
+        """helper to find the row of a surface given by name, position or
+        Surface"""
+        if isinstance(surf, Surface):
+            if surf._table is self._table:
+                return surf._row
+            surf = surf.name
+
+        if isinstance(surf, str):
+            row = self.get_surface_index(surf)
+            if row is None:
+                raise ValueError(f"No surface named {surf}")
+            return row
+
+        return self.surfaces[surf]._row
 
     @staticmethod
     def _safe_call_filter(filter_fn, inp, expected_type):
@@ -176,7 +539,8 @@ class OpticalConfiguration:
 
     @staticmethod
     def load_from_csv(file_name: str):
-        """Create a OpticalConfiguration object by reading from a csv file
+        """Create a OpticalConfiguration object by reading from a csv file,
+        either written by write_to_csv or of Surface.to_csv_line rows
 
         Args:
             file_name (str): A location for the file to be read
@@ -185,19 +549,14 @@ class OpticalConfiguration:
             OpticalConfiguration: An object with all surfaces and a
                 corresponding configuration number
         """
-        with open(file_name, "r", encoding="utf-8") as f:
-            f_contents = f.readlines()
-
-        surfs = []
-        for line in f_contents:
-            surfs.append(Surface.from_csv_line(line))
-
-        return OpticalConfiguration(surfs)
+        return OpticalConfiguration(read_csv(file_name))
 
     @staticmethod
     def load_from_prescription_text(
         txt_file: str,
         config_number=DEFAULT_START_NUM,
+        index: PrescriptionIndex = None,
+        cache: Union[ParseCache, str] = None,
     ):
         """Create a OpticalConfiguration object by reading from a text file
 
@@ -205,148 +564,540 @@ class OpticalConfiguration:
             txt_file (str): A location for the file to be read
             config_number (int, optional): The configuration number as in
                 Zemax. Defaults to DEFAULT_START_NUM.
+            index (PrescriptionIndex, optional): An index of the file, used
+                to seek straight to the vertex block. Defaults to scanning
+                the file for it.
+            cache (ParseCache or str, optional): A cache, or the directory
+                of one, to reuse the surfaces of unchanged files from.
+                Defaults to always parsing the file.
 
         Returns:
             OpticalConfiguration: An object with all surfaces and a
-                corresponding configuration number
+                corresponding configuration number. The SURFACE DATA SUMMARY
+                of the file (see SurfaceTable.summary) is only read if used.
+                Warns if surfaces share a name, see duplicate_names.
         """
-        try:
-            with open(txt_file, encoding="utf-8") as f:
-                f_contents = f.readlines()
-        except UnicodeDecodeError:
-            with open(txt_file, "rb") as f:
-                f_contents = f.read(-1).decode("utf-16").split("\n")
-        # trim off top
-        # TODO: write simple code that detects where the start of table is
-
-        for i, line in enumerate(f_contents):
-            if (
-                "GLOBAL VERTEX COORDINATES, ORIENTATIONS, AND ROTATION/OFFSET MATRICES"
-                in line
-            ):
-                N_HEADER_ROWS = i + 8
-
-        array_contents = f_contents[N_HEADER_ROWS:]
-
-        surfs = []
-        row = 0
-        while row < len(array_contents):
-            if (
-                array_contents[row].strip() == ""
-                and array_contents[row - 1].strip() == ""
-            ):
-                break
-            surfs.append(
-                OpticalConfiguration._generate_object(
-                    array_contents[row : row + 3]
-                )
-            )
-            row += 4  # each object is four rows, 3 of data and one blank
-
-        # notify the user if surfs have duplicate names, and what the names are
-        # ignore "None" names
-        names = [surf.name for surf in surfs]
-        names = [name for name in names if name is not None]
-        if len(names) != len(set(names)):
-            print(
-                "Warning: Duplicate surface names detected in prescription file:"
-            )
-            print(list({name for name in names if names.count(name) > 1}))
-
-        return OpticalConfiguration(surfs, config_number)
+        config = OpticalConfiguration._parse_prescription_text(
+            txt_file, config_number, index, cache
+        )
+        _warn_duplicates([config])
+        return config
 
     @staticmethod
-    def _generate_object(rows):
-        """from three rows make an object"""
-        first_row = rows[0].split()
-
-        coords = np.zeros(3)
-        tilts = np.zeros(3)
-
-        surf_idx = first_row[PrescCols.SURF.value]
-        coords[0] = first_row[PrescCols.POS.value]
-        tilts[0] = first_row[PrescCols.TILT.value]
-
-        if len(first_row) == PrescCols.NAME.value:
-            name = None
-        elif len(first_row) > PrescCols.NAME.value:
-            name = " ".join(first_row[PrescCols.NAME.value :])
+    def _parse_prescription_text(txt_file, config_number, index, cache):
+        """helper to load a prescription without warning of duplicate
+        names, so that files parsed in worker processes are reported once,
+        by the process that loaded them"""
+        if cache is None:
+            surfs = read_vertex_table(txt_file, index)
         else:
-            raise ValueError(f"{first_row}")
-
-        # now read other rows
-        for i in range(1, 3):
-            row_split = rows[i].split()
-            row_split.insert(
-                0, ""
-            )  # sneak in extra to account for lack of surf_idx
-
-            coords[i] = row_split[PrescCols.POS.value]
-            tilts[i] = row_split[PrescCols.TILT.value]
+            surfs = ParseCache.from_arg(cache).load(
+                txt_file, read_vertex_table, index
+            )
+        return OpticalConfiguration._from_vertex_table(
+            surfs, config_number, txt_file, index
+        )
 
-        return Surface(surf_idx, coords, tilts, name=name)
+    @staticmethod
+    def _from_vertex_table(surfs, config_number, txt_file=None, index=None):
+        """helper to create the configuration of a parsed vertex table, with
+        the summary of the file it came from to be read when first used"""
+        config = OpticalConfiguration(surfs, config_number, txt_file=txt_file)
+        config._index = index
+        if txt_file is not None:
+            surfs.set_summary(config._read_summary)
+        return config
+
+
+def _warn_duplicates(configs):
+    """helper to warn, once for all configs, of surface names used by more
+    than one surface, ignoring unnamed surfaces. The same report is
+    available from duplicate_names()"""
+    config_numbers = {}
+    for config in configs:
+        duplicates = tuple(config.duplicate_names())
+        if duplicates:
+            config_numbers.setdefault(duplicates, []).append(
+                config.config_number
+            )
+    if config_numbers:
+        warnings.warn(
+            "Duplicate surface names detected: "
+            + "; ".join(
+                f"{list(names)} in configurations {numbers}"
+                for names, numbers in config_numbers.items()
+            ),
+            stacklevel=3,
+        )
 
 
 class MultiConfigSystem:
     """A collection of surface objects, that can be read in from prescription data
     and written out to a txt readabale by CAD"""
 
+    # tolerance for a CAD variable to count as the same in all configurations
+    DEFAULT_ATOL = 1e-9
+    # what load_from_single_prescription does with surfaces after ray solves
+    RAY_SOLVED_POLICIES = ("warn", "drop", "raise")
+
     def __init__(self, configs: Sequence[OpticalConfiguration]):
         self.configs = configs
 
+    @property
+    def deferred(self) -> bool:
+        """Whether all configurations record transforms for later, see
+        OpticalConfiguration"""
+        return all(config.deferred for config in self.configs)
+
+    @deferred.setter
+    def deferred(self, deferred: bool):
+        for config in self.configs:
+            config.deferred = deferred
+
+    def flush(self):
+        """Apply the recorded transforms of all configurations, batching the
+        same transform across configurations"""
+        SurfaceTable.flush_many([config.surfaces for config in self.configs])
+
     def file_write(
         self,
         opened_file,
         include_filter: callable = lambda x: True,
         format_filter_function: callable = lambda x: StateSubset.ALL(),
+        delta=False,
+        atol=DEFAULT_ATOL,
+        precision: int = None,
     ):
         """Write out all configurations to the file.
 
-        See OpticalConfiguration.file_write for argument details
+        See OpticalConfiguration.file_write for argument details. With
+        delta=True, variables that are the same in every configuration
+        (within atol) are written once, without the configuration number,
+        and only the rest are written for each configuration.
+        """
+        if not delta:
+            for config in self.configs:
+                config.file_write(
+                    opened_file,
+                    include_filter,
+                    format_filter_function,
+                    precision=precision,
+                )
+            return
+
+        names, values = self._cad_entries(
+            include_filter, format_filter_function, delta, atol
+        )
+        opened_file.write(CadExport.format_lines(names, values, precision))
+
+    def update_equations_file(
+        self,
+        file_name: str,
+        include_filter: callable = lambda x: True,
+        format_filter_function: callable = lambda x: StateSubset.ALL(),
+        delta=False,
+        atol=DEFAULT_ATOL,
+        precision: int = None,
+    ) -> EquationChanges:
+        """Merge the variables of all configurations into an existing
+        equations file, rather than overwriting it. Only the equations whose
+        values changed by more than atol are rewritten, new ones are added
+        at the end, and any other equations are kept as they are.
+
+        See file_write for argument details. The file is created if it does
+        not exist, and only written if anything changed.
+
+        Returns:
+            EquationChanges: the names of the variables that were added,
+                updated or left unchanged
         """
+        names, values = self._cad_entries(
+            include_filter, format_filter_function, delta, atol
+        )
+        return EquationsFile.merge(
+            file_name, dict(zip(names, values)), atol, precision
+        )
+
+    def _cad_entries(
+        self, include_filter, format_filter_function, delta, atol
+    ):
+        """helper to list the names and values of every CAD variable, in the
+        order file_write writes them"""
+        names, values, varying = self.cad_variables(
+            include_filter, format_filter_function, atol
+        )
+        if not delta:
+            varying = np.ones(len(names), dtype=bool)
+
+        constant = np.flatnonzero(~varying)
+        entry_names = [names[v] for v in constant]
+        entry_values = [values[0, constant]] if len(values) else []
+        for c, config in enumerate(self.configs):
+            written = np.flatnonzero(varying & ~np.isnan(values[c]))
+            entry_names.extend(
+                f"{names[v]}_{config.config_number}" for v in written
+            )
+            entry_values.append(values[c, written])
+        if not entry_values:
+            return entry_names, np.zeros(0)
+        return entry_names, np.concatenate(entry_values)
+
+    def cad_variables(
+        self,
+        include_filter: callable = lambda x: True,
+        format_filter_function: callable = lambda x: StateSubset.ALL(),
+        atol=DEFAULT_ATOL,
+    ) -> CadVariables:
+        """Compare the CAD variables of all configurations at once
+
+        Args:
+            include_filter (callable, optional): See
+                OpticalConfiguration.file_write
+            format_filter_function (callable, optional): See
+                OpticalConfiguration.file_write
+            atol (float, optional): The largest difference between
+                configurations for a variable to count as constant.
+                Defaults to DEFAULT_ATOL.
+
+        Returns:
+            CadVariables: the value of every variable in every configuration,
+                and which of them vary
+        """
+        positions = {}
+        config_values = []
         for config in self.configs:
-            config.file_write(
-                opened_file,
-                include_filter,
-                format_filter_function,
+            export = config._cad_export(include_filter, format_filter_function)
+            # the variable of each value, keeping the first of any repeat
+            variables = {}
+            for i, name in enumerate(export.names):
+                if name not in variables:
+                    variables[name] = i
+            for name in variables:
+                positions.setdefault(name, len(positions))
+
+            config_values.append(
+                (
+                    [positions[name] for name in variables],
+                    export.values()[list(variables.values())],
+                )
             )
 
+        values = np.full((len(self.configs), len(positions)), np.nan)
+        for c, (variables, config_value) in enumerate(config_values):
+            values[c, variables] = config_value
+
+        present = ~np.isnan(values)
+        if len(self.configs) == 0:
+            varying = np.zeros(0, dtype=bool)
+        else:
+            spread = np.nanmax(values, axis=0) - np.nanmin(values, axis=0)
+            varying = ~present.all(axis=0) | (spread > atol)
+        return CadVariables(list(positions), values, varying)
+
     def transform(
         self,
         R: np.ndarray = np.eye(3),
         T: np.ndarray = np.zeros(3),
         filter_fn: callable = lambda x: True,
     ):
-        """transform all surfaces in all configurations
+        """transform all surfaces in all configurations, as one batch
 
         See OpticalConfiguration.transform for argument details
         """
-        for config in self.configs:
-            config.transform(R, T, filter_fn)
+        SurfaceTable.transform_many(
+            [config.surfaces for config in self.configs],
+            [config._get_surface_mask(filter_fn) for config in self.configs],
+            R,
+            T,
+        )
+
+    def save(self, file_name: str):
+        """Save all configurations to a single binary file, see
+        storage.write_tables
+
+        Args:
+            file_name (str): The location to write the file to
+        """
+        write_tables(
+            file_name,
+            [config.surfaces for config in self.configs],
+            [config.config_number for config in self.configs],
+        )
 
     @staticmethod
-    def load_from_multiple_csvs(csv_files: Sequence[str]):
-        configs = []
-        for csv_file in csv_files:
-            config = OpticalConfiguration.load_from_csv(csv_file)
-            configs.append(config)
+    def load(file_name: str, mmap=False):
+        """Load a system saved with save
+
+        Args:
+            file_name (str): A location for the file to be read
+            mmap (bool, optional): Whether to memory map the file rather
+                than reading it, see storage.read_tables. Defaults to False.
+
+        Returns:
+            MultiConfigSystem: the saved configurations, in order
+        """
+        return MultiConfigSystem(
+            [
+                OpticalConfiguration(table, number)
+                for number, table in read_tables(file_name, mmap)
+            ]
+        )
+
+    def as_array(self, match="name", policy="first") -> SystemArray:
+        """Align the surfaces of all configurations into one CxNx6 array
+
+        Args:
+            match (str, optional): "name" or "index", how surfaces are
+                matched across configurations. Defaults to "name".
+            policy (str, optional): Which surface to use for names shared by
+                several surfaces, see SystemArray.from_tables. Defaults to
+                "first".
+
+        Returns:
+            SystemArray: the aligned surfaces of the configurations
+        """
+        return SystemArray.from_tables(
+            [config.surfaces for config in self.configs],
+            [config.config_number for config in self.configs],
+            match,
+            policy,
+        )
+
+    def points_at_distances(self, start, distances) -> PathPoint:
+        """Find the points at distances along the path of the beam in every
+        configuration, see OpticalConfiguration.points_at_distances
+
+        Args:
+            start (str or int or Surface): The surface to measure from in
+                each configuration
+            distances (np.ndarray): The K distances along the path, or a CxK
+                array with the distances for each configuration
+
+        Returns:
+            PathPoint: CxK arrays of the surface positions before and after
+                each point and the distances past the surface before, and the
+                CxKx3 points
+        """
+        distances = np.broadcast_to(
+            distances, (len(self.configs),) + np.shape(distances)[-1:]
+        )
+        found = [
+            config.points_at_distances(start, config_distances)
+            for config, config_distances in zip(self.configs, distances)
+        ]
+        return PathPoint(*(np.stack(field) for field in zip(*found)))
+
+    @staticmethod
+    def load_from_multiple_csvs(
+        csv_files: Sequence[str],
+        workers: int = None,
+        executor: Executor = None,
+    ):
+        """Create a MultiConfigSystem from one csv file per configuration
+
+        Args:
+            csv_files (Sequence[str]): The files to read, in order
+            workers (int, optional): If given, read the files concurrently
+                on a pool of this many threads. Defaults to reading them
+                one after another.
+            executor (Executor, optional): An executor to read the files
+                on instead, which is left running.
+
+        Returns:
+            MultiConfigSystem: The configurations, in the order of csv_files
+        """
+        configs = MultiConfigSystem._load_each(
+            OpticalConfiguration.load_from_csv,
+            [(csv_file,) for csv_file in csv_files],
+            workers,
+            executor,
+            ThreadPoolExecutor,
+        )
         return MultiConfigSystem(configs)
 
     @staticmethod
-    def load_from_multiple_configs(file_list, config_numbers=None):
+    def load_from_multiple_configs(
+        file_list,
+        config_numbers=None,
+        workers: int = None,
+        executor: Executor = None,
+        cache: Union[ParseCache, str] = None,
+    ):
+        """Create a MultiConfigSystem from one prescription text file per
+        configuration
+
+        Args:
+            file_list (Sequence[str]): The files to read, in order
+            config_numbers (Sequence[int], optional): The configuration
+                number of each file. Defaults to 1, 2, ...
+            workers (int, optional): If given, parse the files concurrently
+                on a pool of this many processes. Defaults to parsing them
+                one after another.
+            executor (Executor, optional): An executor to parse the files on
+                instead, which is left running.
+            cache (ParseCache or str, optional): A cache, or the directory
+                of one, to reuse the surfaces of unchanged files from. Only
+                the files missing from the cache are parsed, and they are
+                stored by this process. Defaults to always parsing the files.
+
+        Returns:
+            MultiConfigSystem: The configurations, in the order of file_list.
+                Warns once if surfaces share a name, see duplicate_names.
+        """
         if config_numbers is None:
             config_numbers = list(range(1, 1 + len(file_list)))
+        calls = list(zip(file_list, config_numbers))
 
-        configs = []
-        for i, file in enumerate(file_list):
-            config = OpticalConfiguration.load_from_prescription_text(
-                file, config_numbers[i]
+        if cache is None:
+            to_parse = calls
+            configs = [None] * len(calls)
+        else:
+            cache = ParseCache.from_arg(cache)
+            tables = [cache.get(file) for file in file_list]
+            to_parse = [
+                call for call, table in zip(calls, tables) if table is None
+            ]
+            configs = []
+            for table, number, file in zip(tables, config_numbers, file_list):
+                config = None
+                if table is not None:
+                    config = OpticalConfiguration._from_vertex_table(
+                        table, number, file
+                    )
+                configs.append(config)
+
+        parsed = iter(
+            MultiConfigSystem._load_each(
+                OpticalConfiguration._parse_prescription_text,
+                [(file, number, None, None) for file, number in to_parse],
+                workers,
+                executor,
+                ProcessPoolExecutor,
             )
+        )
+        for i, (file, _) in enumerate(calls):
+            if configs[i] is None:
+                configs[i] = next(parsed)
+                if cache is not None:
+                    cache.put(file, configs[i].surfaces)
+        _warn_duplicates(configs)
+        return MultiConfigSystem(configs)
+
+    @staticmethod
+    def load_from_single_prescription(
+        txt_file: str,
+        config_numbers: Sequence[int] = None,
+        index: PrescriptionIndex = None,
+        ray_solved: str = "warn",
+    ):
+        """Create a MultiConfigSystem from a single prescription text file,
+        rebuilding the surfaces of every configuration from its surface
+        details and multi-configuration data (see FramePropagator) rather
+        than needing an export of each configuration
 
-            configs.append(config)
+        Solves that need a ray trace (e.g. chief ray following) keep the
+        values of the exported configuration, so in the other
+        configurations the surfaces from FramePropagator.first_ray_solved
+        on may be in the wrong place.
+
+        Args:
+            txt_file (str): The file to read
+            config_numbers (Sequence[int], optional): The configurations to
+                rebuild. Defaults to all that can be, see
+                FramePropagator.available_configs.
+            index (PrescriptionIndex, optional): An index of the file.
+                Defaults to building one.
+            ray_solved (str, optional): What to do if other configurations
+                have surfaces after a ray solve: "warn" to keep them with a
+                warning, "drop" to leave them out of those configurations,
+                or "raise" to raise a ValueError. Defaults to "warn".
+
+        Returns:
+            MultiConfigSystem: The configurations, in the order of
+                config_numbers
+        """
+        if ray_solved not in MultiConfigSystem.RAY_SOLVED_POLICIES:
+            raise ValueError(
+                f"Unknown ray_solved {ray_solved}, expected one of "
+                f"{MultiConfigSystem.RAY_SOLVED_POLICIES}"
+            )
 
+        propagator = FramePropagator.from_prescription(txt_file, index)
+        if config_numbers is None:
+            config_numbers = propagator.available_configs
+
+        first = propagator.first_ray_solved
+        affected = [
+            number
+            for number in config_numbers
+            if number != propagator.active_config
+        ]
+        if first is not None and affected and ray_solved != "drop":
+            names = [
+                name
+                for index, name in zip(propagator.indices, propagator.names)
+                if index >= first and name is not None
+            ]
+            message = (
+                f"Configurations {affected} of {txt_file} keep the ray "
+                "solves (e.g. chief ray following) of configuration "
+                f"{propagator.active_config}, so surfaces {first} onwards "
+                f"({names}) may differ from exports of those configurations"
+            )
+            if ray_solved == "raise":
+                raise ValueError(message)
+            warnings.warn(message, stacklevel=2)
+
+        tables = propagator.propagate(
+            config_numbers, drop_ray_solved=ray_solved == "drop"
+        )
+        configs = [
+            OpticalConfiguration._from_vertex_table(table, number)
+            for table, number in zip(tables, config_numbers)
+        ]
+        _warn_duplicates(configs)
         return MultiConfigSystem(configs)
 
+    @staticmethod
+    def _load_each(loader, calls, workers, executor, pool_type):
+        """helper to call loader(file, ...) for each tuple in calls, keeping
+        their order, and report every file that failed together"""
+        if workers is not None and executor is not None:
+            raise ValueError("Give at most one of workers and executor")
+
+        if workers is not None:
+            with pool_type(max_workers=workers) as pool:
+                return MultiConfigSystem._load_each(
+                    loader, calls, None, pool, pool_type
+                )
+
+        if executor is None:
+            outcomes = [
+                MultiConfigSystem._call(loader, *args) for args in calls
+            ]
+        else:
+            futures = [executor.submit(loader, *args) for args in calls]
+            # result() re-raises any error from the worker
+            outcomes = [MultiConfigSystem._call(f.result) for f in futures]
+
+        failures = [
+            (args[0], err) for args, (err, _) in zip(calls, outcomes) if err
+        ]
+        if failures:
+            raise ValueError(
+                "Failed to load "
+                + "; ".join(f"{file}: {err!r}" for file, err in failures)
+            ) from failures[0][1]
+        return [result for _, result in outcomes]
+
+    @staticmethod
+    def _call(fn, *args):
+        """helper to call fn(*args), returning (error, result)"""
+        try:
+            return None, fn(*args)
+        except Exception as err:
+            return err, None
+
 
 if __name__ == "__main__":
     # c = OpticalConfiguration.load_from_prescription_text(
@@ -0,0 +1,910 @@
+import codecs
+import contextlib
+import io
+import json
+import mmap
+import os
+import re
+import warnings
+from enum import Enum
+from typing import Iterator, NamedTuple
+
+import numpy as np
+
+from zemax_to_cad.surface import Surface
+from zemax_to_cad.surface_table import SurfaceTable
+
+__all__ = [
+    "iter_surfaces",
+    "read_vertex_table",
+    "read_surface_summary",
+    "read_surface_details",
+    "read_multi_config",
+    "read_solves",
+    "read_header_config",
+    "read_curvature_centers",
+    "read_cardinal_points",
+    "SurfaceDetail",
+    "MultiConfigData",
+    "Solve",
+    "PrescriptionIndex",
+]
+
+# bump when a change to the parser changes the tables it gives, so that
+# tables stored by a ParseCache are parsed again
+PARSER_VERSION = 1
+
+VERTEX_SECTION = (
+    "GLOBAL VERTEX COORDINATES, ORIENTATIONS, AND ROTATION/OFFSET MATRICES"
+)
+
+GENERAL_SECTION = "GENERAL LENS DATA"
+SUMMARY_SECTION = "SURFACE DATA SUMMARY"
+DETAIL_SECTION = "SURFACE DATA DETAIL"
+MULTI_CONFIG_SECTION = "MULTI-CONFIGURATION DATA"
+SOLVE_SECTION = "SOLVE AND VARIABLE DATA"
+CURVATURE_SECTION = "GLOBAL SURFACE CENTER OF CURVATURE POINTS"
+CARDINAL_SECTION = "CARDINAL POINTS"
+
+# e.g. "Surface  14 EVENASPH OAP 1" or "Surface STO PARAXIAL 'M1'"
+DETAIL_HEADER = re.compile(r"Surface\s+(\S+)\s+(\S+)\s?(.*)")
+
+# e.g. "  2 Param 1    10 :             0 "
+MULTI_CONFIG_OPERAND = re.compile(
+    r"\s*\d+\s+(?P<operand>.*?)\s+(?P<surface>\d+)\s*:\s*(?P<value>\S*)"
+)
+
+# e.g. " Parameter  5 Surf   3  : Solve, Pickup from surface 1 scaled by -1,
+# offset by 0" or " Thickness of  56       : Solve, ..."
+PARAMETER_SOLVE = re.compile(
+    r"\s*Parameter\s+(?P<param>\d+)\s+Surf\s+(?P<surface>\d+)\s*:\s*"
+    r"Solve, (?P<solve>.*?)\s*"
+)
+THICKNESS_SOLVE = re.compile(
+    r"\s*Thickness of\s+(?P<surface>\d+)\s*:\s*Solve, (?P<solve>.*?)\s*"
+)
+PICKUP = re.compile(
+    r"Pickup from surface (?P<source>\d+) scaled by (?P<scale>\S+), "
+    r"offset by (?P<offset>[^,\s]+)"
+)
+
+# top level section headers are capitalised and end in a colon, e.g.
+# "GENERAL LENS DATA:" or "SURFACE DATA SUMMARY:"
+SECTION_HEADER = re.compile(r"[A-Z][A-Z0-9 ,/()'&.-]*:\s*")
+
+# numpy types of one character of each supported encoding
+_CHAR_TYPES = {"utf-8": "u1", "utf-16-le": "<u2", "utf-16-be": ">u2"}
+
+
+class SurfaceDetail(NamedTuple):
+    """The SURFACE DATA DETAIL entry of one surface"""
+
+    index: int
+    type: str
+    comment: str
+    # label -> value, e.g. "Decenter X" -> "0"
+    fields: dict
+
+
+class MultiConfigData(NamedTuple):
+    """The MULTI-CONFIGURATION DATA of a prescription"""
+
+    config_numbers: list
+    # (operand, surface) of each operand, e.g. ("Param 1", 10)
+    operands: list
+    # CxO values of each operand in each configuration, NaN if not a number
+    values: np.ndarray
+
+
+class Solve(NamedTuple):
+    """A thickness or parameter solve of the SOLVE AND VARIABLE DATA"""
+
+    surface: int
+    # "Thickness" or "Param <n>", as in the MULTI-CONFIGURATION DATA
+    column: str
+    description: str
+    # for pickups, the value is scale * (the source surface's) + offset
+    source: int = None
+    scale: float = 1.0
+    offset: float = 0.0
+
+    @property
+    def is_pickup(self) -> bool:
+        return self.source is not None
+
+
+class PrescCols(Enum):
+    """Column indicies for Zemax prescription data"""
+
+    SURF = 0
+    Rx1 = 1
+    Rx2 = 2
+    Rx3 = 3
+    POS = 4
+    TILT = 5
+    NAME = 6
+
+
+class PrescriptionIndex:
+    """Byte offsets and line ranges of the top-level sections of a Zemax
+    prescription export, found in a single pass over the (memory-mapped)
+    file.
+
+    Sections are keyed by their header without the trailing colon, e.g.
+    "SURFACE DATA SUMMARY". Each maps to (start byte, end byte, start line,
+    end line), where the start is the header line and the end is exclusive,
+    so any section can be read without scanning the rest of the file.
+
+    The index can be saved next to the file, and load() reuses a saved index
+    for as long as the file size and modification time are unchanged.
+    """
+
+    VERSION = 1
+    SUFFIX = ".zindex"
+
+    def __init__(self, txt_file, encoding, sections, size, mtime_ns):
+        self.txt_file = txt_file
+        self.encoding = encoding
+        self.sections = sections
+        self.size = size
+        self.mtime_ns = mtime_ns
+
+    def __contains__(self, section):
+        return section in self.sections
+
+    @property
+    def section_names(self):
+        """The section names, in the order they appear in the file"""
+        return list(self.sections)
+
+    def line_range(self, section: str):
+        """The (first, last + 1) line numbers of a section, counted from 0"""
+        return tuple(self._section(section)[2:])
+
+    def read_section(self, section: str):
+        """The lines of a section, starting with its header
+
+        Args:
+            section (str): The section name, e.g. "SURFACE DATA SUMMARY"
+
+        Returns:
+            list[str]: The decoded lines, without line endings
+        """
+        start, end = self._section(section)[:2]
+        with open(self.txt_file, "rb") as f:
+            f.seek(start)
+            data = f.read(end - start)
+        return data.decode(self.encoding).splitlines()
+
+    def open_section(self, section: str):
+        """Open the file as text, positioned at the header line of a section
+
+        Args:
+            section (str): The section name, e.g. "SURFACE DATA SUMMARY"
+
+        Returns:
+            file: A text file object, to be closed by the caller
+        """
+        start = self._section(section)[0]
+        f = open(self.txt_file, "rb")
+        f.seek(start)
+        return io.TextIOWrapper(f, encoding=self.encoding)
+
+    def is_current(self):
+        """Whether the file is unchanged since the index was built"""
+        try:
+            stat = os.stat(self.txt_file)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+    def save(self, index_file: str = None):
+        """Save the index, by default next to the file it indexes
+
+        Args:
+            index_file (str, optional): Where to save the index. Defaults to
+                the prescription file name with SUFFIX appended.
+        """
+        if index_file is None:
+            index_file = PrescriptionIndex.index_file_for(self.txt_file)
+
+        with open(index_file, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": PrescriptionIndex.VERSION,
+                    "encoding": self.encoding,
+                    "size": self.size,
+                    "mtime_ns": self.mtime_ns,
+                    "sections": self.sections,
+                },
+                f,
+            )
+
+    def _section(self, section):
+        """helper to look up a section, with a useful error if missing"""
+        try:
+            return self.sections[section]
+        except KeyError:
+            raise ValueError(
+                f"No {section} section found in {self.txt_file}"
+            ) from None
+
+    @staticmethod
+    def index_file_for(txt_file: str):
+        """The default location of the saved index for a file"""
+        return f"{txt_file}{PrescriptionIndex.SUFFIX}"
+
+    @staticmethod
+    def load(txt_file: str, save=True):
+        """Get the index of a file, reusing the saved index if it is current
+
+        Args:
+            txt_file (str): A location for the prescription file
+            save (bool, optional): Whether to save a newly built index next
+                to the file. Defaults to True.
+
+        Returns:
+            PrescriptionIndex: the index of the file
+        """
+        index_file = PrescriptionIndex.index_file_for(txt_file)
+        try:
+            with open(index_file, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            saved = None
+
+        if saved is not None and saved.get("version") == (
+            PrescriptionIndex.VERSION
+        ):
+            index = PrescriptionIndex(
+                txt_file,
+                saved["encoding"],
+                {k: tuple(v) for k, v in saved["sections"].items()},
+                saved["size"],
+                saved["mtime_ns"],
+            )
+            if index.is_current():
+                return index
+
+        index = PrescriptionIndex.build(txt_file)
+        if save:
+            try:
+                index.save(index_file)
+            except OSError:
+                pass  # e.g. a read-only directory, the index still works
+        return index
+
+    @staticmethod
+    def build(txt_file: str):
+        """Index a file with a single pass over its bytes
+
+        Args:
+            txt_file (str): A location for the prescription file
+
+        Returns:
+            PrescriptionIndex: the index of the file
+        """
+        stat = os.stat(txt_file)
+        with _map_file(txt_file) as data:
+            encoding, start = _detect_encoding(data[:4096])
+            sections = PrescriptionIndex._scan(data, encoding, start)
+
+        return PrescriptionIndex(
+            txt_file, encoding, sections, stat.st_size, stat.st_mtime_ns
+        )
+
+    @staticmethod
+    def _scan(data, encoding, start):
+        """helper to find the section headers in the raw bytes, working on a
+        uint8 or uint16 view of the buffer so that only the lines starting
+        with a capital letter are ever decoded"""
+        dtype = np.dtype(_CHAR_TYPES[encoding])
+        n_chars = (len(data) - start) // dtype.itemsize
+        if n_chars <= 0:
+            return {}
+
+        chars = np.frombuffer(data, dtype=dtype, count=n_chars, offset=start)
+        newlines = np.flatnonzero(chars == ord("\n"))
+        line_starts = np.concatenate([[0], newlines + 1])
+        line_ends = np.append(newlines, n_chars)
+        if line_starts[-1] == n_chars:
+            # the file ends in a newline, so there is no last partial line
+            line_starts = line_starts[:-1]
+            line_ends = line_ends[:-1]
+
+        first_chars = chars[line_starts]
+        candidates = np.flatnonzero(
+            (first_chars >= ord("A")) & (first_chars <= ord("Z"))
+        )
+        del chars, first_chars  # release the view of the buffer
+
+        offsets = start + dtype.itemsize * line_starts
+        ends = start + dtype.itemsize * line_ends
+        headers = []
+        for line_number in candidates:
+            offset = int(offsets[line_number])
+            line = data[offset : int(ends[line_number])].decode(encoding)
+            if SECTION_HEADER.fullmatch(line.rstrip("\r")):
+                headers.append(
+                    (line.strip().rstrip(":"), offset, int(line_number))
+                )
+
+        sections = {}
+        section_ends = [(offset, line) for _, offset, line in headers[1:]]
+        section_ends.append((len(data), len(line_starts)))
+        for (name, offset, line), (end, end_line) in zip(
+            headers, section_ends
+        ):
+            sections.setdefault(name, (offset, end, line, end_line))
+        return sections
+
+
+def iter_surfaces(
+    txt_file: str, index: PrescriptionIndex = None
+) -> Iterator[Surface]:
+    """Stream the surfaces of the GLOBAL VERTEX section of a prescription
+
+    The file is memory mapped and the section header is found in the raw
+    bytes, so only the rows of the vertex block are ever decoded and memory
+    use does not depend on the size of the rest of the export.
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file, used to
+            seek straight to the vertex block instead of scanning for it.
+
+    Yields:
+        Surface: each surface in the vertex block, in order
+    """
+    for rows in _iter_vertex_block(txt_file, index):
+        yield _surface_from_rows(rows)
+
+
+def read_vertex_table(
+    txt_file: str, index: PrescriptionIndex = None
+) -> SurfaceTable:
+    """Parse the whole GLOBAL VERTEX section of a prescription into a table
+
+    All numeric fields of the block are converted in a single pass into an
+    Nx3x5 array (for each of the three rows of a surface: R_i1, R_i2, R_i3,
+    position and tilt), with the surface names kept separately.
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file, used to
+            seek straight to the vertex block instead of scanning for it.
+
+    Returns:
+        SurfaceTable: the surfaces of the vertex block, in order
+    """
+    indices, values, names = _parse_vertex_records(
+        _iter_vertex_block(txt_file, index), txt_file
+    )
+    rotations = values[:, :, PrescCols.Rx1.value - 1 : PrescCols.POS.value - 1]
+    return SurfaceTable(
+        indices,
+        values[:, :, PrescCols.POS.value - 1],
+        values[:, :, PrescCols.TILT.value - 1],
+        names,
+        rotations=rotations,
+    )
+
+
+def read_surface_summary(
+    txt_file: str, index: PrescriptionIndex = None
+) -> dict:
+    """Parse the SURFACE DATA SUMMARY section of a prescription into columns
+
+    Column names are the lower case headers with underscores, e.g. "type",
+    "thickness", "clear_diam" or "comment", and "index" for the surface
+    number (with OBJ, STO and IMA given their numbers). Columns of numbers
+    are float arrays, with "-" and blank entries NaN and "Infinity" inf,
+    and the rest are arrays of stripped strings.
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file. Defaults
+            to building one.
+
+    Returns:
+        dict[str, np.ndarray]: each column, with a row for each surface
+    """
+    index = _get_index(txt_file, index)
+    labels = _surface_labels(index)
+
+    rows = [
+        [field.strip() for field in line.split("\t")]
+        for line in index.read_section(SUMMARY_SECTION)[1:]
+        if "\t" in line
+    ]
+    if not rows:
+        raise ValueError(f"No surface summary found in {txt_file}")
+    header, rows = rows[0], rows[1:]
+
+    columns = {}
+    for i, name in enumerate(header):
+        name = "index" if name == "Surf" else name.lower().replace(" ", "_")
+        column = [row[i] if i < len(row) else "" for row in rows]
+        if name == "index":
+            columns[name] = np.array(
+                [_surface_number(label, labels) for label in column]
+            )
+        else:
+            columns[name] = _typed_column(column)
+    return columns
+
+
+def read_surface_details(
+    txt_file: str, index: PrescriptionIndex = None
+) -> dict:
+    """Parse the SURFACE DATA DETAIL section of a prescription
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file. Defaults
+            to building one.
+
+    Returns:
+        dict[int, SurfaceDetail]: the details of each surface, by number
+    """
+    index = _get_index(txt_file, index)
+    labels = _surface_labels(index)
+
+    details = {}
+    detail = None
+    for line in index.read_section(DETAIL_SECTION)[1:]:
+        header = DETAIL_HEADER.fullmatch(line.rstrip())
+        if header is not None:
+            label, surface_type, comment = header.groups()
+            detail = SurfaceDetail(
+                _surface_number(label, labels),
+                surface_type,
+                comment.strip(),
+                {},
+            )
+            details[detail.index] = detail
+        elif detail is not None and ":" in line:
+            label, value = line.split(":", 1)
+            detail.fields.setdefault(label.strip(), value.strip())
+    return details
+
+
+def read_multi_config(
+    txt_file: str, index: PrescriptionIndex = None
+) -> MultiConfigData:
+    """Parse the MULTI-CONFIGURATION DATA section of a prescription
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file. Defaults
+            to building one.
+
+    Returns:
+        MultiConfigData: every operand and its value in every configuration
+    """
+    index = _get_index(txt_file, index)
+
+    config_numbers = []
+    operands = {}
+    config_values = []
+    for line in index.read_section(MULTI_CONFIG_SECTION)[1:]:
+        if line.startswith("Configuration"):
+            config_numbers.append(int(line.split()[1].rstrip(":")))
+            config_values.append({})
+            continue
+
+        match = MULTI_CONFIG_OPERAND.match(line)
+        if match is None or not config_values:
+            continue
+        operand = (" ".join(match["operand"].split()), int(match["surface"]))
+        position = operands.setdefault(operand, len(operands))
+        try:
+            config_values[-1][position] = float(match["value"])
+        except ValueError:
+            pass  # e.g. a glass name
+
+    values = np.full((len(config_numbers), len(operands)), np.nan)
+    for c, config_value in enumerate(config_values):
+        values[c, list(config_value)] = list(config_value.values())
+    return MultiConfigData(config_numbers, list(operands), values)
+
+
+def read_solves(txt_file: str, index: PrescriptionIndex = None) -> list:
+    """Parse the thickness and parameter solves of the SOLVE AND VARIABLE
+    DATA section of a prescription
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file. Defaults
+            to building one.
+
+    Returns:
+        list[Solve]: the solves, in the order they are listed
+    """
+    index = _get_index(txt_file, index)
+
+    solves = []
+    for line in index.read_section(SOLVE_SECTION)[1:]:
+        match = PARAMETER_SOLVE.fullmatch(line)
+        if match is not None:
+            column = f"Param {match['param']}"
+        else:
+            match = THICKNESS_SOLVE.fullmatch(line)
+            if match is None:
+                continue
+            column = "Thickness"
+
+        solve = Solve(int(match["surface"]), column, match["solve"])
+        pickup = PICKUP.match(match["solve"])
+        if pickup is not None:
+            solve = solve._replace(
+                source=int(pickup["source"]),
+                scale=float(pickup["scale"]),
+                offset=float(pickup["offset"]),
+            )
+        solves.append(solve)
+    return solves
+
+
+def read_curvature_centers(
+    txt_file: str, index: PrescriptionIndex = None
+) -> tuple:
+    """Parse the GLOBAL SURFACE CENTER OF CURVATURE POINTS section of a
+    prescription
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file. Defaults
+            to building one.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: the N surface numbers and the Nx3
+            global centres of curvature, NaN for flat surfaces
+    """
+    index = _get_index(txt_file, index)
+
+    indices = []
+    centers = []
+    for line in index.read_section(CURVATURE_SECTION)[1:]:
+        fields = line.split("\t")
+        if len(fields) < 4 or not fields[0].strip().isdigit():
+            continue
+        indices.append(int(fields[0]))
+        centers.append(
+            [np.nan if f.strip() == "-" else float(f) for f in fields[1:4]]
+        )
+    return np.array(indices, dtype=int), np.array(centers).reshape(-1, 3)
+
+
+def read_cardinal_points(
+    txt_file: str, index: PrescriptionIndex = None
+) -> dict:
+    """Parse the CARDINAL POINTS section of a prescription
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file. Defaults
+            to building one.
+
+    Returns:
+        dict[float, dict[str, np.ndarray]]: for each wavelength, the object
+            and image space values of each quantity, e.g. "Focal Length"
+    """
+    index = _get_index(txt_file, index)
+
+    points = {}
+    wavelength_points = None
+    for line in index.read_section(CARDINAL_SECTION)[1:]:
+        if line.startswith("W ="):
+            wavelength = float(line.split("=", 1)[1].split()[0])
+            wavelength_points = points.setdefault(wavelength, {})
+        elif wavelength_points is not None and ":" in line:
+            label, values = line.split(":", 1)
+            wavelength_points.setdefault(
+                label.strip(), np.array(values.split(), dtype=float)
+            )
+    return points
+
+
+def read_header_config(txt_file: str, index: PrescriptionIndex = None):
+    """The active configuration of a prescription, from the "Configuration
+    3 of 8" line before the first section
+
+    Args:
+        txt_file (str): A location for the file to be read
+        index (PrescriptionIndex, optional): An index of the file. Defaults
+            to building one.
+
+    Returns:
+        int: the configuration number, or None if there is no such line
+    """
+    index = _get_index(txt_file, index)
+    end = min((section[0] for section in index.sections.values()), default=0)
+    with open(txt_file, "rb") as f:
+        head = f.read(end).decode(index.encoding, errors="replace")
+    match = re.search(r"Configuration\s+(\d+)\s+of\s+\d+", head)
+    return None if match is None else int(match[1])
+
+
+def _get_index(txt_file, index):
+    """helper to build an index of a file if none is given"""
+    if index is None:
+        return PrescriptionIndex.build(txt_file)
+    return index
+
+
+def _read_fields(lines):
+    """helper to read the "label : value" lines of a section"""
+    fields = {}
+    for line in lines:
+        if ":" in line:
+            label, value = line.split(":", 1)
+            fields.setdefault(label.strip(), value.strip())
+    return fields
+
+
+def _surface_labels(index):
+    """helper giving the numbers of the OBJ, STO and IMA surfaces, from the
+    GENERAL LENS DATA section"""
+    labels = {"OBJ": 0}
+    if GENERAL_SECTION in index:
+        general = _read_fields(index.read_section(GENERAL_SECTION))
+        for label, field in (("STO", "Stop"), ("IMA", "Surfaces")):
+            with contextlib.suppress(KeyError, ValueError):
+                labels[label] = int(general[field])
+    return labels
+
+
+def _surface_number(label, labels):
+    """helper to turn a surface label (a number, OBJ, STO or IMA) into its
+    number"""
+    if label in labels:
+        return labels[label]
+    try:
+        return int(label)
+    except ValueError:
+        raise ValueError(f"Unknown surface {label}") from None
+
+
+def _typed_column(column):
+    """helper to convert a column of strings to floats, if they are all
+    numbers (or "-", blank or "Infinity")"""
+    values = []
+    for field in column:
+        if field in ("", "-"):
+            values.append(np.nan)
+        elif field == "Infinity":
+            values.append(np.inf)
+        elif field == "-Infinity":
+            values.append(-np.inf)
+        else:
+            try:
+                values.append(float(field))
+            except ValueError:
+                return np.array(column, dtype=str)
+    return np.array(values, dtype=float)
+
+
+def _iter_vertex_block(txt_file, index):
+    """helper to yield the three rows of each surface in the vertex block"""
+    with _map_file(txt_file) as data:
+        encoding, bom = _detect_encoding(data[:4096])
+        if index is None:
+            start = _find_section(data, VERTEX_SECTION, encoding, bom)
+            if start is None:
+                raise ValueError(
+                    f"No {VERTEX_SECTION} section found in {txt_file}"
+                )
+        else:
+            start = index._section(VERTEX_SECTION)[0]
+
+        lines = _iter_raw_lines(data, encoding, start)
+        next(lines)  # the section header
+        _skip_to_table(lines, txt_file)
+        yield from _iter_vertex_records(lines)
+
+
+def _parse_vertex_records(records, txt_file):
+    """helper to parse vertex records into surface indices, an Nx3x5 array of
+    numbers and the surface names, converting all numbers at once"""
+    indices = []
+    names = []
+    numeric_rows = []
+    for first, second, third in records:
+        fields = first.split(None, PrescCols.NAME.value)
+        if len(fields) < PrescCols.NAME.value:
+            raise ValueError(f"{fields}")
+
+        indices.append(fields[PrescCols.SURF.value])
+        if len(fields) > PrescCols.NAME.value:
+            names.append(" ".join(fields[PrescCols.NAME.value].split()))
+        else:
+            names.append(None)
+
+        numeric_rows.append(
+            " ".join(fields[PrescCols.Rx1.value : PrescCols.NAME.value])
+        )
+        numeric_rows.append(second)
+        numeric_rows.append(third)
+
+    with warnings.catch_warnings():
+        # a malformed number stops the parse early, caught by the size check
+        warnings.simplefilter("ignore", DeprecationWarning)
+        values = np.fromstring(" ".join(numeric_rows), sep=" ")
+
+    n_values = 3 * (PrescCols.NAME.value - 1)
+    if values.size != n_values * len(indices):
+        raise ValueError(f"Malformed vertex block in {txt_file}")
+
+    return np.array(indices, dtype=int), values.reshape(-1, 3, 5), names
+
+
+@contextlib.contextmanager
+def _map_file(txt_file):
+    """helper to memory-map a file read only, falling back to reading it
+    (e.g. for an empty file, which can't be mapped)"""
+    with open(txt_file, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            yield f.read()
+            return
+
+        try:
+            yield data
+        finally:
+            data.close()
+
+
+def _detect_encoding(head):
+    """helper returning the codec and BOM length for the start of a file.
+
+    Zemax writes UTF-16 with a BOM, while copied and pasted files are
+    usually UTF-8. Without a BOM, mostly-ASCII UTF-16 is recognised by the
+    zero bytes in every other position.
+    """
+    boms = [
+        (codecs.BOM_UTF8, "utf-8"),
+        (codecs.BOM_UTF16_LE, "utf-16-le"),
+        (codecs.BOM_UTF16_BE, "utf-16-be"),
+    ]
+    for bom, encoding in boms:
+        if head.startswith(bom):
+            return encoding, len(bom)
+
+    if head[1::2].count(0) > len(head) // 4:
+        return "utf-16-le", 0
+    if head[0::2].count(0) > len(head) // 4:
+        return "utf-16-be", 0
+    return "utf-8", 0
+
+
+def _find_section(data, section, encoding, start, window=1 << 20):
+    """helper to find the byte offset of a section header line in the raw
+    bytes, without decoding anything before it. Candidate lines (a newline
+    followed by the first character of the header) are found in a
+    uint8/uint16 view of the buffer, a window at a time. None if not found"""
+    dtype = np.dtype(_CHAR_TYPES[encoding])
+    char_size = dtype.itemsize
+    marker = section.encode(encoding)
+    n_chars = (len(data) - start) // char_size
+
+    if data[start : start + len(marker)] == marker:
+        return start
+
+    # windows overlap by one character, so a newline ending one window is
+    # still seen before a header starting the next
+    for first in range(0, max(n_chars - 1, 0), window):
+        count = min(window + 1, n_chars - first)
+        chars = np.frombuffer(
+            data, dtype=dtype, count=count, offset=start + first * char_size
+        )
+        hits = np.flatnonzero(
+            (chars[:-1] == ord("\n")) & (chars[1:] == ord(section[0]))
+        )
+        del chars  # release the view of the buffer
+
+        for hit in hits:
+            offset = start + (first + int(hit) + 1) * char_size
+            if data[offset : offset + len(marker)] == marker:
+                return offset
+    return None
+
+
+def _iter_raw_lines(data, encoding, start, window=1 << 16):
+    """helper to yield the decoded lines of the raw bytes from a given
+    offset. Line ends are found in a uint8/uint16 view of the buffer, a
+    window at a time, so only the lines actually consumed are decoded"""
+    dtype = np.dtype(_CHAR_TYPES[encoding])
+    char_size = dtype.itemsize
+    pos = start
+    while len(data) - pos >= char_size:
+        count = min(window, (len(data) - pos) // char_size)
+        chars = np.frombuffer(data, dtype=dtype, count=count, offset=pos)
+        newlines = pos + char_size * np.flatnonzero(chars == ord("\n"))
+        del chars  # release the view of the buffer before yielding
+
+        if len(newlines) == 0:
+            if pos + count * char_size >= len(data):
+                yield data[pos:].decode(encoding, errors="replace")
+                return
+            window *= 2  # a line longer than the window
+            continue
+
+        for end in newlines:
+            yield data[pos:end].decode(encoding).rstrip("\r")
+            pos = int(end) + char_size
+
+
+def _skip_to_table(f, txt_file):
+    """helper to advance f past the column headers of the vertex table, so
+    that the next line read is the first data row"""
+    for line in f:
+        fields = line.split()
+        if fields and fields[0] == "Surf":
+            break
+    else:
+        raise ValueError(f"No vertex table header found in {txt_file}")
+
+    # the column header is three rows, then a blank row
+    for line in f:
+        if line.strip() == "":
+            return
+    raise ValueError(f"Vertex table in {txt_file} has no data")
+
+
+def _iter_vertex_records(f):
+    """helper to group the rows of the vertex table into the three rows
+    belonging to each surface, stopping at the end of the table"""
+    rows = []
+    n_blank = 0
+    for line in f:
+        if line.strip() == "":
+            n_blank += 1
+            if n_blank == 2:
+                break
+            continue
+        n_blank = 0
+
+        # a new surface row starts with the surface number
+        if not rows and not line.split()[0].isdigit():
+            break
+
+        rows.append(line)
+        if len(rows) == 3:
+            yield rows
+            rows = []
+
+
+def _surface_from_rows(rows):
+    """from three rows make a surface"""
+    first_row = rows[0].split()
+
+    coords = np.zeros(3)
+    tilts = np.zeros(3)
+    rotation = np.zeros((3, 3))
+
+    surf_idx = first_row[PrescCols.SURF.value]
+    rotation[0] = first_row[PrescCols.Rx1.value : PrescCols.POS.value]
+    coords[0] = first_row[PrescCols.POS.value]
+    tilts[0] = first_row[PrescCols.TILT.value]
+
+    if len(first_row) == PrescCols.NAME.value:
+        name = None
+    elif len(first_row) > PrescCols.NAME.value:
+        name = " ".join(first_row[PrescCols.NAME.value :])
+    else:
+        raise ValueError(f"{first_row}")
+
+    # now read other rows
+    for i in range(1, 3):
+        row_split = rows[i].split()
+        row_split.insert(
+            0, ""
+        )  # sneak in extra to account for lack of surf_idx
+
+        rotation[i] = row_split[PrescCols.Rx1.value : PrescCols.POS.value]
+        coords[i] = row_split[PrescCols.POS.value]
+        tilts[i] = row_split[PrescCols.TILT.value]
+
+    return Surface(surf_idx, coords, tilts, name=name, rotation=rotation)
@@ -0,0 +1,491 @@
+from typing import Sequence
+
+import numpy as np
+
+from zemax_to_cad.surface_table import SurfaceTable
+from zemax_to_cad.prescription import (
+    PrescriptionIndex,
+    MULTI_CONFIG_SECTION,
+    SOLVE_SECTION,
+    VERTEX_SECTION,
+    read_header_config,
+    read_multi_config,
+    read_solves,
+    read_surface_details,
+    read_surface_summary,
+    read_vertex_table,
+    MultiConfigData,
+)
+
+__all__ = ["FramePropagator"]
+
+# the parameters of a coordinate break, Param 1 to Param 6
+BREAK_PARAMS = [
+    "Decenter X",
+    "Decenter Y",
+    "Tilt About X",
+    "Tilt About Y",
+    "Tilt About Z",
+    "Order",
+]
+# the order of a coordinate break or surface tilt/decenter, as written in
+# SURFACE DATA DETAIL -> the value of its order flag
+ORDERS = {
+    "Decenter then tilt": 0.0,
+    "Tilt then decenter": 1.0,
+    "Decenter, Tilt": 0.0,
+    "Tilt, Decenter": 1.0,
+}
+
+# the columns of a decenter and tilt
+N_DECENTER_TILT = len(BREAK_PARAMS)
+
+DEFAULT_ATOL = 1e-3
+
+
+class FramePropagator:
+    """Rebuilds the global vertex frame of every surface in every
+    configuration from a single prescription export.
+
+    Each surface's frame is propagated from the one before it, following
+    Zemax's sequential model: coordinate breaks decenter then tilt (or tilt,
+    in the order z, y, x, then decenter), other surfaces apply their own
+    tilt/decenter before and after the surface, and the thickness moves
+    along the new z axis. The thicknesses and coordinate break parameters
+    of each configuration are those of the export, with the operands of the
+    MULTI-CONFIGURATION DATA and then the pickup solves applied, and all
+    configurations are propagated together as arrays.
+
+    Solves that need a ray trace (e.g. chief ray following) can't be
+    repeated without Zemax, so those values are kept from the export for
+    every configuration: they are listed in ray_solves, and surfaces after
+    them may differ from a full export of the other configurations.
+
+    The tables of every configuration share the SURFACE DATA SUMMARY of
+    the export (see SurfaceTable.summary).
+    """
+
+    def __init__(
+        self,
+        indices,
+        names,
+        is_break,
+        thicknesses,
+        decenter_tilts,
+        after_tilts,
+        reference: int,
+        active_config: int,
+        multi_config: MultiConfigData,
+        solves,
+        summary: dict = None,
+    ):
+        self.indices = np.asarray(indices, dtype=int)
+        self.names = names
+        self.is_break = np.asarray(is_break, dtype=bool)
+        self.thicknesses = np.asarray(thicknesses, dtype=float)
+        self.decenter_tilts = np.asarray(decenter_tilts, dtype=float)
+        self.after_tilts = np.asarray(after_tilts, dtype=float)
+        self.reference = reference
+        self.active_config = active_config
+        self.multi_config = multi_config
+        self.pickups = [solve for solve in solves if solve.is_pickup]
+        self.ray_solves = [solve for solve in solves if not solve.is_pickup]
+        self.summary = summary
+        self._rows = {index: row for row, index in enumerate(indices)}
+
+    @property
+    def config_numbers(self) -> list:
+        """The numbers of all configurations"""
+        if not self.multi_config.config_numbers:
+            return [self.active_config]
+        return list(self.multi_config.config_numbers)
+
+    @property
+    def available_configs(self) -> list:
+        """The numbers of the configurations that can be rebuilt, i.e. that
+        don't use surfaces left out of the export (as they were ignored in
+        the active configuration)"""
+        missing = [
+            o
+            for o, (operand, surface) in enumerate(self.multi_config.operands)
+            if operand == "Ignore" and surface not in self._rows
+        ]
+        uses_missing = (self.multi_config.values[:, missing] == 0).any(axis=1)
+        return [
+            number
+            for number in self.config_numbers
+            if number == self.active_config
+            or not uses_missing[self._config_position(number)]
+        ]
+
+    def parameters(self, config_numbers: Sequence[int] = None):
+        """The thicknesses, decenters and tilts and ignored surfaces of
+        configurations
+
+        Args:
+            config_numbers (Sequence[int], optional): The configurations.
+                Defaults to available_configs.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray, np.ndarray]: CxN thicknesses,
+                CxNx6 decenter/tilts (x, y, tilt x, y, z and the order flag,
+                of coordinate breaks or before other surfaces) and CxN
+                booleans, True for ignored surfaces
+        """
+        if config_numbers is None:
+            config_numbers = self.available_configs
+        n_configs = len(config_numbers)
+        thicknesses = np.tile(self.thicknesses, (n_configs, 1))
+        decenter_tilts = np.tile(self.decenter_tilts, (n_configs, 1, 1))
+        ignored = np.zeros(thicknesses.shape, dtype=bool)
+
+        # the export already holds the values of the active configuration,
+        # to more digits than the multi-configuration data
+        configs = [self._config_position(number) for number in config_numbers]
+        changed = np.array(
+            [number != self.active_config for number in config_numbers]
+        )
+        values = self.multi_config.values
+        for o, (operand, surface) in enumerate(self.multi_config.operands):
+            column = self._column(operand)
+            if column is None:
+                continue
+            config_values = values[configs, o]
+            row = self._rows.get(surface)
+            if row is None:
+                if column == "Ignore" and np.any(config_values[changed] == 0):
+                    raise ValueError(
+                        f"Surface {surface} is ignored in the export, so "
+                        "configurations that use it can't be rebuilt"
+                    )
+                continue
+
+            update = changed & ~np.isnan(config_values)
+            if column == "Ignore":
+                ignored[update, row] = config_values[update] != 0
+            elif column == "Thickness":
+                thicknesses[update, row] = config_values[update]
+            elif self.is_break[row]:
+                decenter_tilts[update, row, column] = config_values[update]
+
+        self._apply_pickups(thicknesses, decenter_tilts, changed)
+        return thicknesses, decenter_tilts, ignored
+
+    @property
+    def first_ray_solved(self) -> int:
+        """The first surface number whose frame may depend on a ray solve:
+        the surface after a solved thickness, or a coordinate break with a
+        solved decenter or tilt. In configurations other than the active
+        one, the surfaces from this one on may differ from a full export.
+        None if no ray solve moves a surface."""
+        starts = []
+        for solve in self.ray_solves:
+            row = self._rows.get(solve.surface)
+            if row is None:
+                continue
+            if solve.column == "Thickness":
+                starts.append(solve.surface + 1)
+            elif self._column(solve.column) is not None and self.is_break[row]:
+                starts.append(solve.surface)
+        return min(starts, default=None)
+
+    def propagate(
+        self, config_numbers: Sequence[int] = None, drop_ray_solved=False
+    ) -> list:
+        """The global vertex frames of the surfaces of configurations
+
+        Args:
+            config_numbers (Sequence[int], optional): The configurations.
+                Defaults to available_configs.
+            drop_ray_solved (bool, optional): Whether to leave out the
+                surfaces from first_ray_solved on in configurations other
+                than the active one. Defaults to False.
+
+        Returns:
+            list[SurfaceTable]: the surfaces of each configuration, leaving
+                out ignored surfaces, relative to the global reference
+                surface
+        """
+        if config_numbers is None:
+            config_numbers = self.available_configs
+        thicknesses, decenter_tilts, ignored = self.parameters(config_numbers)
+        n_configs, n_surfs = thicknesses.shape
+        # e.g. the object at infinity, or the image surface
+        thicknesses[~np.isfinite(thicknesses)] = 0.0
+
+        # the frame of each surface, and the current frame after it
+        rotations = np.empty((n_configs, n_surfs, 3, 3))
+        coords = np.empty((n_configs, n_surfs, 3))
+        R = np.tile(np.eye(3), (n_configs, 1, 1))
+        p = np.zeros((n_configs, 3))
+        for row in range(n_surfs):
+            R_vertex, p_vertex = _decenter_tilt(R, p, decenter_tilts[:, row])
+            R_after, p_after = _decenter_tilt(
+                R_vertex,
+                p_vertex,
+                np.broadcast_to(self.after_tilts[row], (n_configs, 6)),
+            )
+            p_after = p_after + R_after[:, :, 2] * thicknesses[:, row, None]
+
+            rotations[:, row] = R_vertex
+            coords[:, row] = p_vertex
+            # ignored surfaces leave the frame as it was
+            keep = ignored[:, row]
+            R = np.where(keep[:, None, None], R, R_after)
+            p = np.where(keep[:, None], p, p_after)
+
+        reference = self._rows.get(self.reference)
+        if reference is None or ignored[:, reference].any():
+            raise ValueError(
+                f"The reference surface {self.reference} is not in every "
+                "configuration"
+            )
+        R_ref = rotations[:, reference].transpose(0, 2, 1)
+        rotations = R_ref[:, None] @ rotations
+        coords = np.einsum(
+            "cij,cnj->cni", R_ref, coords - coords[:, reference, None]
+        )
+
+        # the object is only placed if it is a finite distance away
+        shown = np.ones(n_surfs, dtype=bool)
+        shown[self.indices == 0] = np.isfinite(self.thicknesses[0])
+
+        first_ray_solved = self.first_ray_solved
+        tables = []
+        for c, number in enumerate(config_numbers):
+            kept = shown & ~ignored[c]
+            if (
+                drop_ray_solved
+                and first_ray_solved is not None
+                and number != self.active_config
+            ):
+                kept &= self.indices < first_ray_solved
+            rows = np.flatnonzero(kept)
+            table = SurfaceTable(
+                self.indices[rows],
+                coords[c, rows],
+                names=[self.names[row] for row in rows],
+                rotations=rotations[c, rows],
+            )
+            table.set_summary(self.summary)
+            tables.append(table)
+        return tables
+
+    def check(
+        self,
+        vertex_table: SurfaceTable,
+        config_number: int = None,
+        atol=DEFAULT_ATOL,
+    ) -> float:
+        """Check the propagated frames of a configuration against its
+        exported GLOBAL VERTEX table
+
+        Args:
+            vertex_table (SurfaceTable): The exported table
+            config_number (int, optional): The configuration it is from.
+                Defaults to the active configuration of the export.
+            atol (float, optional): The largest difference allowed in the
+                positions (lens units) and rotation matrices. Defaults to
+                DEFAULT_ATOL.
+
+        Returns:
+            float: the largest difference
+        """
+        if config_number is None:
+            config_number = self.active_config
+        (table,) = self.propagate([config_number])
+
+        if not np.array_equal(table.indices, vertex_table.indices):
+            raise ValueError(
+                f"Configuration {config_number} has surfaces "
+                f"{table.indices.tolist()}, but the vertex table has "
+                f"{vertex_table.indices.tolist()}"
+            )
+        error = max(
+            np.abs(table.coords - vertex_table.coords).max(initial=0.0),
+            np.abs(table.rotations - vertex_table.rotations).max(initial=0.0),
+        )
+        if error > atol:
+            raise ValueError(
+                f"Configuration {config_number} differs from its vertex "
+                f"table by {error}"
+            )
+        return error
+
+    def _config_position(self, config_number):
+        """helper to find the row of a configuration in the
+        multi-configuration data"""
+        try:
+            return self.multi_config.config_numbers.index(config_number)
+        except ValueError:
+            if config_number == self.active_config:
+                return 0
+            raise ValueError(f"No configuration {config_number}") from None
+
+    def _column(self, operand):
+        """helper to map a multi-configuration operand to "Ignore",
+        "Thickness", a column of the decenter/tilts or None"""
+        if operand in ("Ignore", "Thickness"):
+            return operand
+        if operand.startswith("Param "):
+            param = int(operand.split()[1])
+            if 1 <= param <= N_DECENTER_TILT:
+                return param - 1
+        return None
+
+    def _apply_pickups(self, thicknesses, decenter_tilts, changed):
+        """helper to apply the pickup solves, in surface order so that
+        pickups of pickups see the value they pick up, for the configurations
+        that were changed"""
+        pickups = sorted(self.pickups, key=lambda solve: solve.surface)
+        for solve in pickups:
+            row = self._rows.get(solve.surface)
+            source = self._rows.get(solve.source)
+            if row is None or source is None:
+                continue
+            if solve.column == "Thickness":
+                values = thicknesses
+            else:
+                param = self._column(solve.column)
+                if param is None or not self.is_break[row]:
+                    continue
+                values = decenter_tilts[..., param]
+            values[changed, row] = (
+                solve.scale * values[changed, source] + solve.offset
+            )
+
+    @staticmethod
+    def from_prescription(
+        txt_file: str, index: PrescriptionIndex = None, check=True
+    ):
+        """Read the surfaces, multi-configuration data and solves of a
+        prescription export
+
+        Args:
+            txt_file (str): A location for the file to be read
+            index (PrescriptionIndex, optional): An index of the file.
+                Defaults to building one.
+            check (bool, optional): Whether to check the propagated frames
+                of the active configuration against the vertex table of the
+                export (if it has one). Defaults to True.
+
+        Returns:
+            FramePropagator: the propagator
+        """
+        if index is None:
+            index = PrescriptionIndex.build(txt_file)
+
+        summary = read_surface_summary(txt_file, index)
+        details = read_surface_details(txt_file, index)
+        indices = summary["index"]
+
+        is_break = summary["type"] == "COORDBRK"
+        decenter_tilts = np.zeros((len(indices), N_DECENTER_TILT))
+        after_tilts = np.zeros((len(indices), N_DECENTER_TILT))
+        for row, surface in enumerate(indices.tolist()):
+            fields = details[surface].fields if surface in details else {}
+            if is_break[row]:
+                decenter_tilts[row] = [
+                    _detail_value(fields.get(param, "0"))
+                    for param in BREAK_PARAMS
+                ]
+            else:
+                decenter_tilts[row] = _surface_tilt(
+                    fields.get("Before surface")
+                )
+                after_tilts[row] = _surface_tilt(fields.get("After surface"))
+
+        names = [
+            " ".join(comment.split()) or None
+            for comment in summary["comment"].tolist()
+        ]
+        if MULTI_CONFIG_SECTION in index:
+            multi_config = read_multi_config(txt_file, index)
+        else:
+            multi_config = MultiConfigData([], [], np.zeros((0, 0)))
+        solves = []
+        if SOLVE_SECTION in index:
+            solves = read_solves(txt_file, index)
+
+        vertex_table = None
+        reference = int(indices[0])
+        if VERTEX_SECTION in index:
+            vertex_table = read_vertex_table(txt_file, index)
+            lines = index.read_section(VERTEX_SECTION)
+            for line in lines[1:]:
+                if line.startswith("Reference Surface"):
+                    reference = int(line.split(":")[1])
+                    break
+
+        active_config = read_header_config(txt_file, index)
+        propagator = FramePropagator(
+            indices,
+            names,
+            is_break,
+            summary["thickness"],
+            decenter_tilts,
+            after_tilts,
+            reference,
+            1 if active_config is None else active_config,
+            multi_config,
+            solves,
+            summary,
+        )
+        if check and vertex_table is not None:
+            propagator.check(vertex_table)
+        return propagator
+
+
+def _decenter_tilt(R, p, decenter_tilts):
+    """helper to decenter and tilt C frames (Cx3x3 rotations R and Cx3
+    origins p) by Cx6 decenter/tilts, as in Zemax: order flag 0 decenters
+    then tilts about x, y then z, otherwise it tilts about z, y then x and
+    then decenters"""
+    decenter = np.zeros((len(R), 3))
+    decenter[:, :2] = decenter_tilts[:, :2]
+    tilts = np.deg2rad(decenter_tilts[:, 2:5])
+    first = decenter_tilts[:, 5] == 0
+
+    R_x, R_y, R_z = (
+        _axis_rotations(tilts[:, axis], axis) for axis in range(3)
+    )
+    tilt = np.where(first[:, None, None], R_x @ R_y @ R_z, R_z @ R_y @ R_x)
+    R_new = R @ tilt
+
+    # decentered along the axes from before (order 0) or after the tilt
+    R_decenter = np.where(first[:, None, None], R, R_new)
+    return R_new, p + np.einsum("cij,cj->ci", R_decenter, decenter)
+
+
+def _axis_rotations(angles, axis):
+    """helper giving Cx3x3 rotations by C angles (radians) about an axis"""
+    cos = np.cos(angles)
+    sin = np.sin(angles)
+    rotations = np.zeros((len(angles), 3, 3))
+    i, j = [k for k in range(3) if k != axis]
+    rotations[:, axis, axis] = 1.0
+    rotations[:, i, i] = cos
+    rotations[:, j, j] = cos
+    # the sign of the sine terms alternates with the axis, as for R_y
+    sign = -1.0 if axis == 1 else 1.0
+    rotations[:, i, j] = -sign * sin
+    rotations[:, j, i] = sign * sin
+    return rotations
+
+
+def _detail_value(value):
+    """helper to read a number or order from SURFACE DATA DETAIL"""
+    if value in ORDERS:
+        return ORDERS[value]
+    return float(value)
+
+
+def _surface_tilt(value):
+    """helper to read the "Before surface" or "After surface" decenters,
+    tilts and order of a surface, all zero if there are none"""
+    if value is None:
+        return np.zeros(N_DECENTER_TILT)
+    fields = value.split(None, N_DECENTER_TILT - 1)
+    return np.array(
+        [float(field) for field in fields[:-1]] + [ORDERS[fields[-1]]]
+    )
@@ -0,0 +1,383 @@
+import abc
+import re
+import weakref
+from typing import Sequence
+
+import numpy as np
+
+from zemax_to_cad.surface import StateSubset
+from zemax_to_cad.surface_table import SurfaceTable
+
+__all__ = [
+    "Selector",
+    "AllSurfaces",
+    "Names",
+    "NamePattern",
+    "Indices",
+    "IndexRange",
+    "Where",
+    "SurfaceTypes",
+    "CoordinateBreaks",
+    "DummySurfaces",
+    "OpticalSurfaces",
+    "Components",
+    "as_selector",
+]
+
+
+class Selector(abc.ABC):
+    """A choice of surfaces, worked out for a whole table at once.
+
+    mask() gives a boolean mask of the rows of a table. Selectors that only
+    look at surface names, numbers and summary compute it once per table
+    and reuse it until the names, numbers or summary of the table change.
+    Selectors combine with & (both), | (either) and ~ (not), and can also
+    be called on a single surface, so they can be passed anywhere a
+    surface -> bool filter is expected.
+    """
+
+    # whether masks depend only on the names, numbers and summary of the
+    # surfaces
+    cacheable = True
+    # whether masks depend on the summary of the surfaces
+    uses_summary = False
+
+    def __init__(self):
+        self._masks = weakref.WeakKeyDictionary()
+
+    def mask(self, table: SurfaceTable) -> np.ndarray:
+        """The surfaces of a table that are selected
+
+        Args:
+            table (SurfaceTable): The surfaces to select from
+
+        Returns:
+            np.ndarray: N booleans, True for selected surfaces (read only)
+        """
+        if not self.cacheable:
+            return self._compute(table)
+
+        key = (
+            table.names,
+            table.indices,
+            table.summary if self.uses_summary else None,
+        )
+        cached = self._masks.get(table)
+        if cached is not None and all(
+            old is new for old, new in zip(cached[0], key)
+        ):
+            return cached[1]
+
+        mask = np.asarray(self._compute(table), dtype=bool)
+        mask.flags.writeable = False
+        self._masks[table] = (key, mask)
+        return mask
+
+    @abc.abstractmethod
+    def _compute(self, table) -> np.ndarray:
+        """The N booleans of mask(), worked out afresh"""
+
+    def __call__(self, surface) -> bool:
+        return bool(self.mask(surface._table)[surface._row])
+
+    def __and__(self, other):
+        return _Combined(np.logical_and, self, as_selector(other))
+
+    def __or__(self, other):
+        return _Combined(np.logical_or, self, as_selector(other))
+
+    def __invert__(self):
+        return _Not(self)
+
+
+class AllSurfaces(Selector):
+    """Every surface"""
+
+    def _compute(self, table):
+        return np.ones(len(table), dtype=bool)
+
+
+class Names(Selector):
+    """The surfaces with any of the given names
+
+    Args:
+        names (str): The surface names, or None for unnamed surfaces
+    """
+
+    def __init__(self, *names):
+        super().__init__()
+        self.names = names
+
+    def _compute(self, table):
+        mask = np.zeros(len(table), dtype=bool)
+        for name in self.names:
+            mask[table.rows_of_name(name)] = True
+        return mask
+
+
+class NamePattern(Selector):
+    """The named surfaces whose names match a regular expression, anywhere
+    in the name (as re.search)
+
+    Args:
+        pattern (str): The regular expression
+        flags (int, optional): re flags. Defaults to 0.
+    """
+
+    def __init__(self, pattern: str, flags: int = 0):
+        super().__init__()
+        self.pattern = re.compile(pattern, flags)
+
+    def _compute(self, table):
+        # match each distinct name once
+        mask = np.zeros(len(table), dtype=bool)
+        for name, rows in table._get_name_rows().items():
+            if name is not None and self.pattern.search(name):
+                mask[rows] = True
+        return mask
+
+
+class Indices(Selector):
+    """The surfaces with any of the given Zemax surface numbers
+
+    Args:
+        indices (int): The surface numbers
+    """
+
+    def __init__(self, *indices):
+        super().__init__()
+        self.indices = np.array(indices, dtype=int)
+
+    def _compute(self, table):
+        return np.isin(table.indices, self.indices)
+
+
+class IndexRange(Selector):
+    """The surfaces with Zemax surface numbers from first to last, inclusive
+
+    Args:
+        first (int, optional): The first surface number. Defaults to None,
+            from the first surface.
+        last (int, optional): The last surface number. Defaults to None, up
+            to the last surface.
+    """
+
+    def __init__(self, first: int = None, last: int = None):
+        super().__init__()
+        self.first = first
+        self.last = last
+
+    def _compute(self, table):
+        mask = np.ones(len(table), dtype=bool)
+        if self.first is not None:
+            mask &= table.indices >= self.first
+        if self.last is not None:
+            mask &= table.indices <= self.last
+        return mask
+
+
+class Where(Selector):
+    """The surfaces for which a function surface -> bool is True
+
+    The function is called on every surface each time a mask is needed, as
+    it may depend on where the surfaces are.
+
+    Args:
+        filter_fn (callable): The function
+    """
+
+    cacheable = False
+
+    def __init__(self, filter_fn: callable):
+        super().__init__()
+        self.filter_fn = filter_fn
+
+    def _compute(self, table):
+        return np.fromiter(
+            (self._check(surf) for surf in table),
+            dtype=bool,
+            count=len(table),
+        )
+
+    def _check(self, surf):
+        rval = self.filter_fn(surf)
+        if isinstance(rval, bool):
+            return rval
+        raise ValueError(
+            f"{rval}={self.filter_fn}({surf}) is a {type(rval)}, not a bool"
+        )
+
+
+class SurfaceTypes(Selector):
+    """The surfaces of any of the given Zemax surface types, from the
+    summary of the table (see SurfaceTable.summary). Selects nothing in a
+    table without a summary.
+
+    Args:
+        types (str): The surface types, e.g. "COORDBRK" or "EVENASPH"
+    """
+
+    uses_summary = True
+
+    def __init__(self, *types):
+        super().__init__()
+        self.types = types
+
+    def _compute(self, table):
+        surface_types = table.summary.get("type")
+        if surface_types is None:
+            return np.zeros(len(table), dtype=bool)
+        return np.isin(surface_types, self.types)
+
+
+class CoordinateBreaks(SurfaceTypes):
+    """The coordinate break surfaces"""
+
+    def __init__(self):
+        super().__init__("COORDBRK")
+
+
+class DummySurfaces(Selector):
+    """The unnamed dummy surfaces: flat STANDARD surfaces, without a
+    comment, with air on both sides. Surfaces given a comment (e.g. an
+    alignment target or the image plane) are not dummies. Selects nothing
+    in a table without a summary."""
+
+    uses_summary = True
+
+    def _compute(self, table):
+        summary = table.summary
+        if not {"type", "radius", "glass"} <= set(summary):
+            return np.zeros(len(table), dtype=bool)
+
+        # the medium before each surface, which a mirror doesn't change
+        medium_before = []
+        medium = ""
+        for glass in summary["glass"].tolist():
+            medium_before.append(medium)
+            if glass != "MIRROR":
+                medium = glass
+
+        dummies = (
+            (summary["type"] == "STANDARD")
+            & np.isinf(summary["radius"])
+            & (summary["glass"] == "")
+            & (np.array(medium_before) == "")
+        )
+        return dummies & np.array([name is None for name in table.names])
+
+
+class OpticalSurfaces(Selector):
+    """The surfaces that are neither coordinate breaks nor dummy surfaces,
+    i.e. every surface of a table without a summary"""
+
+    uses_summary = True
+
+    def _compute(self, table):
+        return ~(CoordinateBreaks().mask(table) | DummySurfaces().mask(table))
+
+
+class _Combined(Selector):
+    """helper selector, combining the masks of two selectors"""
+
+    def __init__(self, op, left, right):
+        super().__init__()
+        self.op = op
+        self.left = left
+        self.right = right
+        self.cacheable = left.cacheable and right.cacheable
+        self.uses_summary = left.uses_summary or right.uses_summary
+
+    def _compute(self, table):
+        return self.op(self.left.mask(table), self.right.mask(table))
+
+
+class _Not(Selector):
+    """helper selector, the surfaces another selector does not select"""
+
+    def __init__(self, selector):
+        super().__init__()
+        self.selector = selector
+        self.cacheable = selector.cacheable
+        self.uses_summary = selector.uses_summary
+
+    def _compute(self, table):
+        return ~self.selector.mask(table)
+
+
+def as_selector(filter_fn) -> Selector:
+    """A selector for a filter, which may already be one
+
+    Args:
+        filter_fn (Union[Selector, callable, str]): A selector, a function
+            surface -> bool, or a surface name
+
+    Returns:
+        Selector: the selector
+    """
+    if isinstance(filter_fn, Selector):
+        return filter_fn
+    if isinstance(filter_fn, str):
+        return Names(filter_fn)
+    return Where(filter_fn)
+
+
+class Components:
+    """Which components (StateSubset) of each surface to write, worked out
+    for a whole table at once.
+
+    Given as a mapping of selectors (or surface names) to the components of
+    the surfaces they select. The first selector that selects a surface
+    gives its components, and surfaces that none select get default. Can
+    be passed anywhere a surface -> list[StateSubset] function is expected.
+
+    Args:
+        mapping (dict): selector or surface name -> list[StateSubset]
+        default (Sequence[StateSubset], optional): The components of every
+            other surface. Defaults to all of them.
+    """
+
+    def __init__(self, mapping: dict, default: Sequence = None):
+        if default is None:
+            default = StateSubset.ALL()
+        self.selectors = [as_selector(key) for key in mapping]
+        self.subsets = [list(subsets) for subsets in mapping.values()]
+        self.default = list(default)
+
+        # the columns of the Nx6 state of each entry, -1 padded, with the
+        # default last
+        entries = self.subsets + [self.default]
+        self._lengths = np.array([len(subsets) for subsets in entries])
+        self._cols = np.full(
+            (len(entries), max(self._lengths.max(), 1)), -1, dtype=int
+        )
+        for e, subsets in enumerate(entries):
+            self._cols[e, : len(subsets)] = [sub.value for sub in subsets]
+
+    def __call__(self, surface) -> list:
+        for selector, subsets in zip(self.selectors, self.subsets):
+            if selector(surface):
+                return list(subsets)
+        return list(self.default)
+
+    def rows_cols(self, table: SurfaceTable, rows) -> tuple:
+        """The row and column of the Nx6 state (coords, tilts) of every
+        component to write
+
+        Args:
+            table (SurfaceTable): The surfaces
+            rows (np.ndarray): The rows of the surfaces to write
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: the rows and columns, surface by
+                surface in the order of rows
+        """
+        rows = np.asarray(rows, dtype=int)
+        entry = np.full(len(table), len(self.selectors))
+        # earlier selectors take precedence, so assign them last
+        for e in range(len(self.selectors) - 1, -1, -1):
+            entry[self.selectors[e].mask(table)] = e
+        entry = entry[rows]
+
+        cols = self._cols[entry]
+        return np.repeat(rows, self._lengths[entry]), cols[cols >= 0]
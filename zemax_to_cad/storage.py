@@ -0,0 +1,154 @@
+import json
+import struct
+from typing import Sequence
+
+import numpy as np
+
+from zemax_to_cad.surface_table import SurfaceTable
+
+__all__ = ["write_tables", "read_tables"]
+
+MAGIC = b"ZEMAXCAD"
+VERSION = 1
+
+# columns are aligned so that memory-mapped arrays start on cache lines
+ALIGNMENT = 64
+
+# name -> (dtype on disk, shape of one row)
+COLUMNS = {
+    "indices": ("<i8", ()),
+    "coords": ("<f8", (3,)),
+    "rotations": ("<f8", (3, 3)),
+    "tilts": ("<f8", (3,)),
+}
+
+
+def write_tables(
+    file_name: str,
+    tables: Sequence[SurfaceTable],
+    config_numbers: Sequence[int],
+):
+    """Write the surface tables of one or more configurations to a single
+    binary file.
+
+    The file holds a JSON header (the configuration numbers, surface counts
+    and names, and the dtype, shape and offset of each column) followed by
+    each column of every configuration as one aligned, raw little-endian
+    array, so the values are stored exactly and can be memory mapped by
+    read_tables. Any pending transforms are applied first.
+
+    Args:
+        file_name (str): The location to write the file to
+        tables (Sequence[SurfaceTable]): The table of each configuration
+        config_numbers (Sequence[int]): The number of each configuration
+    """
+    if len(tables) != len(config_numbers):
+        raise ValueError(
+            f"Got {len(config_numbers)} config numbers for "
+            f"{len(tables)} tables"
+        )
+
+    arrays = {
+        "indices": [table.indices for table in tables],
+        "coords": [table.coords for table in tables],
+        "rotations": [table.rotations for table in tables],
+        "tilts": [table.tilts for table in tables],
+    }
+    n_surfs = sum(len(table) for table in tables)
+
+    # column offsets are from the start of the data, which is the first
+    # aligned position after the header
+    columns = {}
+    offset = 0
+    for name, (dtype, row_shape) in COLUMNS.items():
+        offset = _align(offset)
+        shape = (n_surfs,) + row_shape
+        columns[name] = {"dtype": dtype, "shape": shape, "offset": offset}
+        offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+    header = {
+        "version": VERSION,
+        "configs": [
+            {"config_number": int(number), "n_surfaces": len(table)}
+            for table, number in zip(tables, config_numbers)
+        ],
+        "names": [name for table in tables for name in table.names],
+        "columns": columns,
+    }
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(file_name, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, (dtype, _) in COLUMNS.items():
+            f.write(b"\0" * (data_start + columns[name]["offset"] - f.tell()))
+            column = np.concatenate(arrays[name]) if tables else []
+            f.write(np.ascontiguousarray(column, dtype=dtype).tobytes())
+
+
+def read_tables(file_name: str, mmap=False):
+    """Read the surface tables written by write_tables
+
+    Args:
+        file_name (str): A location for the file to be read
+        mmap (bool, optional): Whether to memory map the columns instead of
+            reading them. The mapping is copy-on-write, so changes to the
+            tables are never written back to the file. Defaults to False.
+
+    Returns:
+        list[tuple[int, SurfaceTable]]: The number and table of each
+            configuration, in the order they were written
+    """
+    with open(file_name, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{file_name} is not a saved system")
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len).decode("utf-8"))
+        if header["version"] != VERSION:
+            raise ValueError(
+                f"{file_name} has format version {header['version']}, "
+                f"but only version {VERSION} can be read"
+            )
+
+        data_start = _align(len(MAGIC) + 8 + header_len)
+        columns = {}
+        for name, column in header["columns"].items():
+            dtype = np.dtype(column["dtype"])
+            shape = tuple(column["shape"])
+            if mmap and shape[0] > 0:
+                array = np.memmap(
+                    file_name,
+                    dtype=dtype,
+                    mode="c",
+                    offset=data_start + column["offset"],
+                    shape=shape,
+                )
+            else:
+                f.seek(data_start + column["offset"])
+                array = np.fromfile(
+                    f, dtype=dtype, count=int(np.prod(shape))
+                ).reshape(shape)
+            native = int if name == "indices" else float
+            columns[name] = array.astype(native, copy=False)
+
+    configs = []
+    start = 0
+    for config in header["configs"]:
+        end = start + config["n_surfaces"]
+        table = SurfaceTable._from_columns(
+            columns["indices"][start:end],
+            columns["coords"][start:end],
+            columns["rotations"][start:end],
+            columns["tilts"][start:end],
+            header["names"][start:end],
+        )
+        configs.append((config["config_number"], table))
+        start = end
+    return configs
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -2,7 +2,8 @@ from copy import deepcopy
 from enum import Enum
 from typing import Sequence, Union
 import numpy as np
-import scipy.spatial.transform
+
+from zemax_to_cad.surface_table import SurfaceTable
 
 __all__ = ["Surface", "StateSubset"]
 
@@ -44,27 +45,79 @@ class StateSubset(Enum):
 
 
 class Surface:
-    def __init__(self, surf_idx, coords, tilts, name=None):
-        self._surf_idx = surf_idx
-        self._coords = coords
-        self._tilts = tilts
-        self._name = name
+    """A single surface, viewed as one row of a SurfaceTable.
+
+    A surface created directly gets a table of its own. Surfaces read from an
+    OpticalConfiguration share the configuration's table, so reading and
+    writing their attributes reads and writes that table.
+    """
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, surf_idx, coords, tilts=None, name=None, rotation=None):
+        self._table = SurfaceTable(
+            [surf_idx],
+            [coords],
+            None if tilts is None else [tilts],
+            [name],
+            rotations=None if rotation is None else [rotation],
+        )
+        self._row = 0
+
+    @classmethod
+    def _view(cls, table, row):
+        """Create a surface that views the given row of a table"""
+        surf = cls.__new__(cls)
+        surf._table = table
+        surf._row = row
+        return surf
 
     @property
     def index(self):
-        return self._surf_idx
+        return int(self._table.indices[self._row])
 
     @property
     def coords(self):
-        return self._coords
+        """Vertex coordinates (read only, assign to this to move the
+        surface)"""
+        return self._table.coords[self._row]
+
+    @coords.setter
+    def coords(self, value):
+        self._table.flush()
+        self._table._set_rows([self._row], value)
 
     @property
     def tilts(self):
-        return self._tilts
+        """Tilts in degrees, derived from the rotation matrix (read only,
+        assign to this to change the orientation)"""
+        return self._table.tilts[self._row]
+
+    @tilts.setter
+    def tilts(self, value):
+        self._table._set_tilt_rows([self._row], value)
+
+    @property
+    def rotation(self):
+        """3x3 orientation matrix of the surface (read only)"""
+        return self._table.rotations[self._row]
+
+    @property
+    def type(self):
+        """The Zemax surface type, e.g. "COORDBRK", or None if the surface
+        has no SURFACE DATA SUMMARY"""
+        surface_types = self._table.summary.get("type")
+        if surface_types is None or not surface_types[self._row]:
+            return None
+        return str(surface_types[self._row])
 
     @property
     def name(self):
-        return self._name
+        return self._table.names[self._row]
+
+    @name.setter
+    def name(self, value):
+        self._table._set_name(self._row, value)
 
     def transform(
         self, R: np.ndarray = np.eye(3), T: np.ndarray = np.zeros(3)
@@ -77,24 +130,17 @@ class Surface:
             T (np.ndarray, optional): Translation 3-vector. Defaults to
                 np.zeros(3), corresponding to no translation.
         """
-        self._coords = R @ self._coords + T
-
-        # convert tilt to rotm and then back
-        R_tilts = scipy.spatial.transform.Rotation.from_rotvec(
-            np.deg2rad(self._tilts)
-        ).as_matrix()
-        overall_rotvec = scipy.spatial.transform.Rotation.from_matrix(
-            R @ R_tilts
-        ).as_rotvec()
-        self._tilts = np.rad2deg(overall_rotvec)
+        self._table.transform(R, T, [self._row])
 
     def __str__(self):
         s = ""
 
-        if self._name is not None:
-            s += f"Surf {self._surf_idx} ({self._name}): coords {self._coords}, tilts: {self._tilts}"
+        if self.name is not None:
+            s += f"Surf {self.index} ({self.name}): coords {self.coords}, tilts: {self.tilts}"
         else:
-            s += f"Surf {self._surf_idx}: coords {self._coords}, tilts: {self._tilts}"
+            s += (
+                f"Surf {self.index}: coords {self.coords}, tilts: {self.tilts}"
+            )
         return s
 
     def to_cad_string(
@@ -129,12 +175,12 @@ class Surface:
 
     def to_csv_line(self):
         """Write a surface to a CSV line"""
-        s = f"{self._surf_idx},"
-        s += ",".join([str(x) for x in self._coords])
+        s = f"{self.index},"
+        s += ",".join([str(x) for x in self.coords])
         s += ","
-        s += ",".join([str(x) for x in self._tilts])
-        if self._name is not None:
-            s += f",{self._name}"
+        s += ",".join([str(x) for x in self.tilts])
+        if self.name is not None:
+            s += f",{self.name}"
         return s
 
     @staticmethod
@@ -149,21 +195,14 @@ class Surface:
         return Surface(surf_idx, coords, tilts, name)
 
     def _cad_identifier(self):
-        if self._name is not None:
-            return str(self._name)
-        return self._surf_idx
+        if self.name is not None:
+            return str(self.name)
+        return self.index
 
     def _get_state_value(self, subset: StateSubset):
-        val = None
-        if subset in StateSubset.LINEAR():
-            val = self._coords[subset.value]
-        if subset in StateSubset.ANGULAR():
-            val = self._tilts[subset.value - StateSubset.angular_start().value]
-
-        if val is None:
-            raise ValueError(f"{subset} not found")
-
-        return val
+        if subset.value < StateSubset.angular_start().value:
+            return self.coords[subset.value]
+        return self.tilts[subset.value - StateSubset.angular_start().value]
 
 
 if __name__ == "__main__":
@@ -0,0 +1,721 @@
+import sys
+from typing import Sequence
+
+import numpy as np
+
+# module reference rather than name, as surface.py imports this module
+from zemax_to_cad import surface
+
+__all__ = ["SurfaceTable"]
+
+
+class SurfaceTable:
+    """Columnar storage for the surfaces of a configuration.
+
+    Each column holds every surface at once (N surface indices, Nx3 coords,
+    Nx3x3 orientation matrices, Nx3 tilts and N names), so bulk operations
+    work on whole arrays. Indexing the table gives Surface objects that are
+    lightweight views onto a row.
+
+    The orientation matrices (the R11...R33 block of the prescription) are
+    the source of truth for the orientation of each surface. Transforms are
+    applied to them as matrix products, and the tilts (in degrees, using the
+    Zemax convention R = Rx(tilt_x) @ Ry(tilt_y) @ Rz(tilt_z)) are only
+    derived again from the matrices when they are next read, as the triple
+    closest to the previous tilts of the surface.
+
+    Operations that change a column (such as transform) replace the column
+    array rather than writing into it, so arrays previously read from a
+    surface keep their old values. The coords and orientation columns are
+    read only, so writing into them (e.g. `surf.tilts[1] = 12`) raises
+    rather than leaving the tilts or path lengths out of date: assign a
+    whole row or column instead.
+
+    When `deferred` is True, transforms are only recorded as 4x4 affine
+    matrices on a pending stack, with consecutive transforms of the same
+    surfaces fused into one matrix. The stack is applied by flush(), which
+    happens automatically the next time the coords, rotations or tilts are
+    read.
+    """
+
+    def __init__(
+        self, indices, coords, tilts=None, names=None, rotations=None
+    ):
+        self._deferred = False
+        self._pending = []
+        self._path_lengths = None
+        self._summary_source = None
+
+        self.indices = np.array(indices, dtype=int)
+        n_surfs = len(self.indices)
+        self.coords = np.array(coords, dtype=float).reshape(n_surfs, 3)
+
+        if tilts is None and rotations is None:
+            raise ValueError("Need at least one of tilts and rotations")
+        if rotations is None:
+            self.tilts = tilts
+        else:
+            self.rotations = rotations
+            if tilts is None:
+                # no previous tilts to keep the derived ones close to
+                self._tilts = _read_only(np.full((n_surfs, 3), np.nan))
+                self._stale_tilts = np.ones(n_surfs, dtype=bool)
+            else:
+                # keep the given tilts as is, rather than re-deriving them
+                self._tilts = _read_only(
+                    np.array(tilts, dtype=float).reshape(n_surfs, 3)
+                )
+                self._stale_tilts = np.zeros(n_surfs, dtype=bool)
+
+        if names is None:
+            names = [None] * n_surfs
+        if len(names) != n_surfs:
+            raise ValueError(f"Got {len(names)} names for {n_surfs} surfaces")
+        self.names = names
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return [self[row] for row in range(*key.indices(len(self)))]
+
+        row = int(key)
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError(f"Surface {key} out of range")
+        return surface.Surface._view(self, row)
+
+    def __iter__(self):
+        for row in range(len(self)):
+            yield surface.Surface._view(self, row)
+
+    def __setstate__(self, state):
+        # tables sent back from worker processes arrive as plain (writeable)
+        # arrays, so intern the names again in this process and make the
+        # read only columns read only again
+        self.__dict__.update(state)
+        self.names = self._names
+        self.indices = self._indices
+        _read_only(self._coords)
+        _read_only(self._rotations)
+        _read_only(self._tilts)
+
+    @property
+    def indices(self) -> np.ndarray:
+        """N Zemax surface numbers (read only, assign a new column to
+        change them)"""
+        return self._indices
+
+    @indices.setter
+    def indices(self, indices):
+        indices = np.array(indices, dtype=int).reshape(-1)
+        indices.flags.writeable = False
+        self._indices = indices
+        self._index_rows = None
+        self._summary = None
+
+    @property
+    def names(self) -> np.ndarray:
+        """N surface names, None where a surface has no name (read only,
+        assign a new column or set Surface.name to change them)"""
+        return self._names
+
+    @names.setter
+    def names(self, names):
+        column = np.empty(len(names), dtype=object)
+        column[:] = [SurfaceTable._intern(name) for name in names]
+        column.flags.writeable = False
+        self._names = column
+        self._name_rows = None
+
+    @property
+    def summary(self) -> dict:
+        """The SURFACE DATA SUMMARY columns of the surfaces (e.g. "type",
+        "radius", "thickness", "glass" or "conic", see
+        prescription.read_surface_summary), joined by surface number so each
+        column has a (read only) row per surface, with NaN or "" for
+        surfaces missing from the summary. Empty if the table has no
+        summary. Only parsed the first time it is used, see set_summary"""
+        if self._summary is None:
+            source = self._summary_source
+            if callable(source):
+                source = self._summary_source = source()
+            if source is None:
+                self._summary = {}
+            else:
+                self._summary = SurfaceTable._join_summary(
+                    source, self._indices
+                )
+        return self._summary
+
+    def set_summary(self, summary):
+        """Set the SURFACE DATA SUMMARY of the surfaces
+
+        Args:
+            summary (Union[dict, callable]): The columns, with an "index"
+                column of surface numbers, as given by
+                prescription.read_surface_summary, or a function giving them
+                (or None if there is no summary), called when the summary is
+                first used
+        """
+        self._summary_source = summary
+        self._summary = None
+
+    def rows_of_name(self, name) -> list:
+        """The rows of the surfaces with a name, in order
+
+        Args:
+            name (str): The surface name, or None for unnamed surfaces
+
+        Returns:
+            list[int]: the rows, empty if no surface has that name
+        """
+        return list(self._get_name_rows().get(name, ()))
+
+    def row_of_index(self, surf_idx: int):
+        """The row of the surface with a Zemax surface number
+
+        Args:
+            surf_idx (int): The Zemax surface number
+
+        Returns:
+            int: the row, or None if no surface has that number
+        """
+        if self._index_rows is None:
+            index_rows = {}
+            for row, index in enumerate(self._indices.tolist()):
+                index_rows.setdefault(index, row)
+            self._index_rows = index_rows
+        return self._index_rows.get(surf_idx)
+
+    def duplicate_names(self) -> dict:
+        """The names shared by more than one surface, ignoring unnamed
+        surfaces
+
+        Returns:
+            dict[str, list[int]]: the rows of each duplicated name
+        """
+        return {
+            name: list(rows)
+            for name, rows in self._get_name_rows().items()
+            if name is not None and len(rows) > 1
+        }
+
+    @property
+    def coords(self) -> np.ndarray:
+        """Nx3 vertex coordinates (read only, assign a new column or set
+        Surface.coords to change them)"""
+        self.flush()
+        return self._coords
+
+    @coords.setter
+    def coords(self, coords):
+        self.flush()
+        self._coords = _read_only(
+            np.array(coords, dtype=float).reshape(len(self), 3)
+        )
+        self._path_lengths = None
+
+    @property
+    def path_lengths(self) -> np.ndarray:
+        """N distances along the beam path from the first surface, i.e. the
+        running sum of the lengths of the segments between consecutive
+        surfaces. Computed once, and again only after the coords change"""
+        coords = self.coords
+        if self._path_lengths is None or self._path_coords is not coords:
+            lengths = np.zeros(len(self))
+            segments = np.linalg.norm(np.diff(coords, axis=0), axis=1)
+            np.cumsum(segments, out=lengths[1:])
+            self._path_lengths = _read_only(lengths)
+            self._path_coords = coords
+        return self._path_lengths
+
+    def path_distances(self, starts, ends) -> np.ndarray:
+        """Distances along the beam path between pairs of rows
+
+        Args:
+            starts (np.ndarray): The rows to measure from
+            ends (np.ndarray): The rows to measure to, broadcast with starts
+
+        Returns:
+            np.ndarray: the distance of each pair, 0 where the end row is
+                not after the start row
+        """
+        lengths = self.path_lengths
+        return np.maximum(lengths[ends] - lengths[starts], 0.0)
+
+    def locate_path_distances(self, starts, distances):
+        """Find the points a distance along the beam path from given rows,
+        by binary search of the path lengths
+
+        Args:
+            starts (np.ndarray): The rows to measure from
+            distances (np.ndarray): The distances along the path, broadcast
+                with starts
+
+        Returns:
+            tuple: the rows of the surface before and after each point, the
+                remaining distance from the surface before to the point, and
+                the interpolated Kx3 points
+        """
+        lengths = self.path_lengths
+        starts, distances = np.broadcast_arrays(
+            np.asarray(starts), np.asarray(distances, dtype=float)
+        )
+        if len(self) < 2:
+            raise ValueError("Need at least two surfaces to follow a path")
+        if np.any(distances < 0):
+            raise ValueError("Distances along the path must not be negative")
+
+        targets = lengths[starts] + distances
+        if np.any(targets > lengths[-1]):
+            raise ValueError("Distance goes beyond the last surface")
+
+        before = np.searchsorted(lengths, targets, side="right") - 1
+        before = np.clip(before, 0, len(self) - 2)
+        after = before + 1
+        residual = targets - lengths[before]
+
+        segments = lengths[after] - lengths[before]
+        fraction = np.divide(
+            residual,
+            segments,
+            out=np.zeros_like(residual),
+            where=segments > 0,
+        )
+        coords = self.coords
+        points = coords[before] + fraction[..., np.newaxis] * (
+            coords[after] - coords[before]
+        )
+        return before, after, residual, points
+
+    def path_distance_matrix(self) -> np.ndarray:
+        """NxN distances along the beam path from each row (first axis) to
+        each row (second axis), 0 where the second is not after the first"""
+        lengths = self.path_lengths
+        return np.maximum(lengths[np.newaxis, :] - lengths[:, np.newaxis], 0.0)
+
+    @property
+    def rotations(self) -> np.ndarray:
+        """Nx3x3 orientation matrices (read only, assign a new column to
+        change them)"""
+        self.flush()
+        return self._rotations
+
+    @rotations.setter
+    def rotations(self, rotations):
+        self.flush()
+        self._rotations = _read_only(
+            np.array(rotations, dtype=float).reshape(len(self), 3, 3)
+        )
+
+    @property
+    def tilts(self) -> np.ndarray:
+        """Nx3 tilts in degrees, derived from the rotations where needed
+        (read only, assign a new column or set Surface.tilts to change
+        them)"""
+        self.flush()
+        if self._stale_tilts.any():
+            tilts = self._tilts.copy()
+            tilts[self._stale_tilts] = SurfaceTable.rotations_to_tilts(
+                self.rotations[self._stale_tilts],
+                tilts[self._stale_tilts],
+            )
+            self._tilts = _read_only(tilts)
+            self._stale_tilts = np.zeros(len(self), dtype=bool)
+        return self._tilts
+
+    @tilts.setter
+    def tilts(self, tilts):
+        self.flush()
+        self._tilts = _read_only(
+            np.array(tilts, dtype=float).reshape(len(self), 3)
+        )
+        self._stale_tilts = np.zeros(len(self), dtype=bool)
+        self.rotations = SurfaceTable.tilts_to_rotations(self._tilts)
+
+    @property
+    def deferred(self) -> bool:
+        """Whether transforms are recorded and applied later by flush()"""
+        return self._deferred
+
+    @deferred.setter
+    def deferred(self, deferred: bool):
+        if not deferred:
+            self.flush()
+        self._deferred = deferred
+
+    @property
+    def pending_transforms(self):
+        """The recorded transforms that have not yet been applied, as a list
+        of (4x4 affine matrix, boolean surface mask) tuples in the order they
+        will be applied. Consecutive transforms of the same surfaces are
+        already fused into a single matrix."""
+        return [(affine.copy(), mask.copy()) for affine, mask in self._pending]
+
+    def flush(self):
+        """Apply all pending transforms"""
+        if self._pending:
+            SurfaceTable.flush_many([self])
+
+    def copy(self):
+        """A deep copy of the table, with no shared arrays"""
+        table = SurfaceTable(
+            self.indices,
+            self.coords,
+            self.tilts,
+            list(self.names),
+            rotations=self.rotations,
+        )
+        table.set_summary(self._summary_source)
+        return table
+
+    def transform(
+        self,
+        R: np.ndarray = np.eye(3),
+        T: np.ndarray = np.zeros(3),
+        mask: np.ndarray = None,
+    ):
+        """Transform the coordinates of the selected surfaces
+
+        Args:
+            R (np.ndarray, optional): 3x3 Rotation matrix. Defaults to
+                np.eye(3), corresponding to no rotation.
+            T (np.ndarray, optional): Translation 3-vector. Defaults to
+                np.zeros(3), corresponding to no translation.
+            mask (np.ndarray, optional): boolean array (or array of rows)
+                selecting the surfaces to transform. Defaults to all surfaces.
+        """
+        SurfaceTable.transform_many([self], [mask], R, T)
+
+    @staticmethod
+    def transform_many(
+        tables: Sequence["SurfaceTable"],
+        masks: Sequence[np.ndarray],
+        R: np.ndarray = np.eye(3),
+        T: np.ndarray = np.zeros(3),
+    ):
+        """Transform the selected surfaces of several tables at once.
+
+        The selected rows of every table are stacked so that the coordinates
+        and orientation matrices are rotated in a single batched matrix
+        product.
+
+        Args:
+            tables (Sequence[SurfaceTable]): The tables to transform
+            masks (Sequence[np.ndarray]): A mask per table, see transform
+            R (np.ndarray, optional): See transform.
+            T (np.ndarray, optional): See transform.
+        """
+        R = np.asarray(R, dtype=float)
+        T = np.asarray(T, dtype=float)
+
+        tables_rows = []
+        for table, mask in zip(tables, masks):
+            if table.deferred:
+                table._queue_transform(R, T, mask)
+            else:
+                table.flush()
+                tables_rows.append((table, table._rows(mask)))
+
+        SurfaceTable._apply_many(tables_rows, R, T)
+
+    @staticmethod
+    def flush_many(tables: Sequence["SurfaceTable"]):
+        """Apply the pending transforms of several tables.
+
+        The n-th pending transform of every table is applied in the same step,
+        with tables that share the same affine matrix batched together.
+        """
+        pending = [table._pending for table in tables]
+        for table in tables:
+            table._pending = []
+
+        n_steps = max((len(p) for p in pending), default=0)
+        for step in range(n_steps):
+            groups = {}
+            for table, table_pending in zip(tables, pending):
+                if step >= len(table_pending):
+                    continue
+                affine, mask = table_pending[step]
+                _, tables_rows = groups.setdefault(
+                    affine.tobytes(), (affine, [])
+                )
+                tables_rows.append((table, np.flatnonzero(mask)))
+
+            for affine, tables_rows in groups.values():
+                SurfaceTable._apply_many(
+                    tables_rows, affine[:3, :3], affine[:3, 3]
+                )
+
+    @staticmethod
+    def _apply_many(tables_rows, R, T):
+        """helper to transform (table, rows) pairs in one batch, ignoring
+        any pending transforms"""
+        if len(tables_rows) == 0:
+            return
+
+        coords = np.concatenate(
+            [table._coords[rows] for table, rows in tables_rows]
+        )
+        rotations = np.concatenate(
+            [table._rotations[rows] for table, rows in tables_rows]
+        )
+        if len(coords) == 0:
+            return
+
+        coords = coords @ R.T + T
+        if np.array_equal(R, np.eye(3)):
+            # a pure translation keeps the orientations, and so the tilts
+            rotations = None
+        else:
+            rotations = R @ rotations
+
+        start = 0
+        for table, rows in tables_rows:
+            stop = start + len(rows)
+            table._set_rows(
+                rows,
+                coords[start:stop],
+                None if rotations is None else rotations[start:stop],
+            )
+            start = stop
+
+    def _queue_transform(self, R, T, mask):
+        """helper to record a transform, fusing it with the previous one if
+        both select the same surfaces"""
+        affine = np.eye(4)
+        affine[:3, :3] = R
+        affine[:3, 3] = T
+
+        rows = self._rows(mask)
+        mask = np.zeros(len(self), dtype=bool)
+        mask[rows] = True
+
+        if self._pending and np.array_equal(self._pending[-1][1], mask):
+            self._pending[-1] = (affine @ self._pending[-1][0], mask)
+        else:
+            self._pending.append((affine, mask))
+
+    @staticmethod
+    def tilts_to_rotations(tilts: np.ndarray) -> np.ndarray:
+        """Convert Nx3 Zemax tilts (degrees) to Nx3x3 rotation matrices"""
+        tilts = np.deg2rad(np.asarray(tilts, dtype=float).reshape(-1, 3))
+        cos = np.cos(tilts)
+        sin = np.sin(tilts)
+        zeros = np.zeros(len(tilts))
+        ones = np.ones(len(tilts))
+
+        def stack(rows):
+            return np.stack([np.stack(row, axis=-1) for row in rows], axis=1)
+
+        R_x = stack(
+            [
+                [ones, zeros, zeros],
+                [zeros, cos[:, 0], -sin[:, 0]],
+                [zeros, sin[:, 0], cos[:, 0]],
+            ]
+        )
+        R_y = stack(
+            [
+                [cos[:, 1], zeros, sin[:, 1]],
+                [zeros, ones, zeros],
+                [-sin[:, 1], zeros, cos[:, 1]],
+            ]
+        )
+        R_z = stack(
+            [
+                [cos[:, 2], -sin[:, 2], zeros],
+                [sin[:, 2], cos[:, 2], zeros],
+                [zeros, zeros, ones],
+            ]
+        )
+        return R_x @ R_y @ R_z
+
+    @staticmethod
+    def rotations_to_tilts(
+        rotations: np.ndarray, previous: np.ndarray = None
+    ) -> np.ndarray:
+        """Convert Nx3x3 rotation matrices to Nx3 Zemax tilts (degrees)
+
+        Each matrix has two tilt triples, (x, y, z) with y in [-90, 90] and
+        (x + 180, 180 - y, z + 180). Without previous tilts the first (the
+        form Zemax prints) is returned. With them, the triple closest to the
+        previous tilts of each row is, so the tilts of a surface stay
+        continuous as it is transformed (e.g. rotated past 90 degrees).
+
+        Args:
+            rotations (np.ndarray): The Nx3x3 rotation matrices
+            previous (np.ndarray, optional): The Nx3 tilts of each row before
+                it was transformed, NaN for rows without any. Defaults to
+                None, for no previous tilts.
+
+        Returns:
+            np.ndarray: the Nx3 tilts, each in (-180, 180]
+        """
+        rotations = np.asarray(rotations, dtype=float).reshape(-1, 3, 3)
+
+        tilt_x = np.arctan2(-rotations[:, 1, 2], rotations[:, 2, 2])
+        tilt_y = np.arcsin(np.clip(rotations[:, 0, 2], -1.0, 1.0))
+        tilt_z = np.arctan2(-rotations[:, 0, 1], rotations[:, 0, 0])
+
+        # at tilt_y = +-90 only tilt_x +- tilt_z is defined, put it all in x
+        locked = np.abs(rotations[:, 0, 2]) > 1.0 - 1e-12
+        tilt_x[locked] = np.arctan2(
+            rotations[locked, 2, 1], rotations[locked, 1, 1]
+        )
+        tilt_z[locked] = 0.0
+        tilts = np.rad2deg(np.stack([tilt_x, tilt_y, tilt_z], axis=-1))
+        if previous is None:
+            return tilts
+
+        previous = np.asarray(previous, dtype=float).reshape(-1, 3)
+        known = np.isfinite(previous).all(axis=1)
+
+        # keep the previous split of tilt_x +- tilt_z of locked rows
+        split = locked & known
+        sign = np.sign(tilts[split, 1])
+        tilts[split, 2] = previous[split, 2]
+        tilts[split, 0] += -sign * previous[split, 2]
+
+        other = tilts + [180.0, 0.0, 180.0]
+        other[:, 1] = 180.0 - tilts[:, 1]
+        tilts = _wrap_degrees(tilts)
+        other = _wrap_degrees(other)
+
+        def distance(candidate):
+            return np.sum(_wrap_degrees(candidate - previous) ** 2, axis=1)
+
+        flip = known & ~locked & (distance(other) < distance(tilts))
+        tilts[flip] = other[flip]
+        # -180 and 180 are the same tilt, keep the previous sign
+        half_turn = known[:, np.newaxis] & np.isclose(np.abs(tilts), 180.0)
+        tilts[half_turn] = np.copysign(tilts[half_turn], previous[half_turn])
+        return tilts
+
+    @staticmethod
+    def _from_columns(indices, coords, rotations, tilts, names):
+        """helper to wrap existing column arrays (e.g. memory-mapped ones)
+        as a table without copying them"""
+        table = SurfaceTable.__new__(SurfaceTable)
+        table._deferred = False
+        table._pending = []
+        table._path_lengths = None
+        table._summary_source = None
+        table.indices = indices
+        table._coords = _read_only(coords)
+        table._rotations = _read_only(rotations)
+        table._tilts = _read_only(tilts)
+        table._stale_tilts = np.zeros(len(indices), dtype=bool)
+        table.names = names
+        return table
+
+    @staticmethod
+    def from_surfaces(surfaces: Sequence["surface.Surface"]):
+        """Gather a sequence of surfaces into a new table"""
+        surfaces = list(surfaces)
+        return SurfaceTable(
+            [surf.index for surf in surfaces],
+            np.array([surf.coords for surf in surfaces]).reshape(-1, 3),
+            np.array([surf.tilts for surf in surfaces]).reshape(-1, 3),
+            [surf.name for surf in surfaces],
+            rotations=np.array([surf.rotation for surf in surfaces]),
+        )
+
+    def _set_rows(self, rows, coords, rotations=None):
+        """helper to replace rows of the coords and rotations columns,
+        marking the tilts of those rows to be derived again. The rotations
+        (and tilts) are kept if rotations is None"""
+        new_coords = self._coords.copy()
+        new_coords[rows] = coords
+        self._coords = _read_only(new_coords)
+        self._path_lengths = None
+        if rotations is None:
+            return
+
+        new_rotations = self._rotations.copy()
+        stale_tilts = self._stale_tilts.copy()
+        new_rotations[rows] = rotations
+        stale_tilts[rows] = True
+        self._rotations = _read_only(new_rotations)
+        self._stale_tilts = stale_tilts
+
+    def _set_tilt_rows(self, rows, tilts):
+        """helper to set the tilts of some rows, and their rotations,
+        replacing both columns"""
+        # apply pending transforms and derive stale tilts first
+        new_tilts = self.tilts.copy()
+        new_tilts[rows] = tilts
+        new_rotations = self._rotations.copy()
+        new_rotations[rows] = SurfaceTable.tilts_to_rotations(new_tilts[rows])
+        self._tilts = _read_only(new_tilts)
+        self._rotations = _read_only(new_rotations)
+
+    def _set_name(self, row, name):
+        """helper to rename one surface, replacing the names column"""
+        names = self._names.copy()
+        names[row] = SurfaceTable._intern(name)
+        self.names = names
+
+    def _get_name_rows(self):
+        """helper to build (once) the map of each name to its rows"""
+        if self._name_rows is None:
+            name_rows = {}
+            for row, name in enumerate(self._names):
+                name_rows.setdefault(name, []).append(row)
+            self._name_rows = name_rows
+        return self._name_rows
+
+    @staticmethod
+    def _join_summary(summary, indices):
+        """helper to give each surface the row of the summary with its
+        surface number"""
+        summary_rows = {}
+        for row, index in enumerate(summary["index"].tolist()):
+            summary_rows.setdefault(index, row)
+        rows = np.array(
+            [summary_rows.get(index, -1) for index in indices.tolist()],
+            dtype=int,
+        )
+        found = rows >= 0
+
+        columns = {}
+        for name, column in summary.items():
+            if name == "index":
+                continue
+            if column.dtype.kind == "f":
+                joined = np.full(len(indices), np.nan)
+            else:
+                joined = np.full(len(indices), "", dtype=column.dtype)
+            joined[found] = column[rows[found]]
+            joined.flags.writeable = False
+            columns[name] = joined
+        return columns
+
+    def _rows(self, mask):
+        """helper to turn a mask (or None for all) into row numbers"""
+        if mask is None:
+            return np.arange(len(self))
+        mask = np.asarray(mask)
+        if mask.dtype == bool:
+            return np.flatnonzero(mask)
+        return mask.reshape(-1)
+
+    @staticmethod
+    def _intern(name):
+        if name is None:
+            return None
+        return sys.intern(str(name))
+
+
+def _wrap_degrees(angles: np.ndarray) -> np.ndarray:
+    """helper to wrap angles in degrees to (-180, 180]"""
+    return 180.0 - np.mod(180.0 - angles, 360.0)
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """helper to mark a column array read only, returning it"""
+    array.flags.writeable = False
+    return array
@@ -0,0 +1,178 @@
+from typing import Sequence
+
+import numpy as np
+
+from zemax_to_cad.surface_table import SurfaceTable
+
+__all__ = ["SystemArray"]
+
+
+class SystemArray:
+    """The surfaces of several configurations aligned into one array.
+
+    Surfaces are matched across configurations by name or by Zemax surface
+    number (the keys), giving a CxNx6 array of x, y, z, tilt_x, tilt_y and
+    tilt_z for C configurations and N keys. Keys missing from a
+    configuration are NaN in values, -1 in rows (the row of each surface in
+    its configuration's table) and False in mask, so questions across
+    configurations (e.g. how far a mirror moves) are single array
+    operations.
+
+    The array is an analysis view of a snapshot of the configurations: the
+    CAD exports work on the table of each configuration rather than on this
+    array. To see the effect of a transform, transform the
+    MultiConfigSystem and build its array again with as_array().
+    """
+
+    MATCH_TYPES = ("name", "index")
+
+    def __init__(
+        self,
+        keys,
+        config_numbers,
+        values,
+        rotations,
+        rows,
+        path_lengths,
+    ):
+        self.keys = keys
+        self.config_numbers = config_numbers
+        self.values = values
+        self.rotations = rotations
+        self.rows = rows
+        self.path_lengths = path_lengths
+        self._key_positions = {key: i for i, key in enumerate(keys.tolist())}
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def mask(self) -> np.ndarray:
+        """CxN booleans, True where a configuration has the surface"""
+        return self.rows >= 0
+
+    @property
+    def coords(self) -> np.ndarray:
+        """CxNx3 coordinates, a view of values"""
+        return self.values[:, :, :3]
+
+    @property
+    def tilts(self) -> np.ndarray:
+        """CxNx3 tilts in degrees, a view of values"""
+        return self.values[:, :, 3:]
+
+    def position(self, key) -> int:
+        """The position of a key (surface name or number) along the second
+        axis of the arrays"""
+        try:
+            return self._key_positions[key]
+        except KeyError:
+            raise ValueError(f"No surface {key} in the array") from None
+
+    def distances(self, start, end) -> np.ndarray:
+        """Distances along the path of the beam between two surfaces in every
+        configuration, following every surface of each configuration (not
+        only the matched ones)
+
+        Args:
+            start: The key of the surface to measure from
+            end: The key of the surface to measure to
+
+        Returns:
+            np.ndarray: C distances, 0 where end is not after start and NaN
+                where either surface is missing
+        """
+        lengths = self.path_lengths
+        return np.fmax(
+            lengths[:, self.position(end)] - lengths[:, self.position(start)],
+            0.0,
+        )
+
+    @staticmethod
+    def from_tables(
+        tables: Sequence[SurfaceTable],
+        config_numbers: Sequence[int],
+        match="name",
+        policy="first",
+    ):
+        """Align the surfaces of several tables
+
+        Args:
+            tables (Sequence[SurfaceTable]): The table of each configuration
+            config_numbers (Sequence[int]): The number of each configuration
+            match (str, optional): "name" to match surfaces by name, skipping
+                unnamed surfaces, or "index" to match them by Zemax surface
+                number. Defaults to "name".
+            policy (str, optional): Which surface to use when several in a
+                configuration share a name: "first", "last", or "raise" to
+                raise a ValueError. Defaults to "first".
+
+        Returns:
+            SystemArray: the aligned surfaces, with keys in the order they
+                first appear in the tables
+        """
+        if match not in SystemArray.MATCH_TYPES:
+            raise ValueError(
+                f"Unknown match {match}, expected one of "
+                f"{SystemArray.MATCH_TYPES}"
+            )
+        if policy not in ("first", "last", "raise"):
+            raise ValueError(f"Unknown policy {policy}")
+
+        # the row of each key in each table
+        table_rows = [
+            SystemArray._key_rows(table, match, policy) for table in tables
+        ]
+        key_positions = {}
+        for key_rows in table_rows:
+            for key in key_rows:
+                key_positions.setdefault(key, len(key_positions))
+
+        n_configs = len(tables)
+        n_keys = len(key_positions)
+        rows = np.full((n_configs, n_keys), -1)
+        for c, key_rows in enumerate(table_rows):
+            positions = [key_positions[key] for key in key_rows]
+            rows[c, positions] = list(key_rows.values())
+        mask = rows >= 0
+
+        values = np.full((n_configs, n_keys, 6), np.nan)
+        rotations = np.full((n_configs, n_keys, 3, 3), np.nan)
+        path_lengths = np.full((n_configs, n_keys), np.nan)
+        for c, table in enumerate(tables):
+            present = mask[c]
+            selected = rows[c, present]
+            values[c, present, :3] = table.coords[selected]
+            values[c, present, 3:] = table.tilts[selected]
+            rotations[c, present] = table.rotations[selected]
+            path_lengths[c, present] = table.path_lengths[selected]
+
+        keys = np.empty(n_keys, dtype=object)
+        keys[:] = list(key_positions)
+        return SystemArray(
+            keys,
+            np.array(config_numbers),
+            values,
+            rotations,
+            rows,
+            path_lengths,
+        )
+
+    @staticmethod
+    def _key_rows(table, match, policy):
+        """helper to map each key of a table to its row"""
+        if match == "index":
+            key_rows = {}
+            for row, index in enumerate(table.indices.tolist()):
+                key_rows.setdefault(index, row)
+            return key_rows
+
+        key_rows = {}
+        for name, rows in table._get_name_rows().items():
+            if name is None:
+                continue
+            if policy == "raise" and len(rows) > 1:
+                raise ValueError(f"{len(rows)} surfaces are named {name}")
+            key_rows[name] = rows[-1] if policy == "last" else rows[0]
+        # keep the order of the surfaces in the table
+        return dict(sorted(key_rows.items(), key=lambda item: item[1]))
@@ -0,0 +1,409 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import time
+from typing import Sequence
+
+import numpy as np
+
+from zemax_to_cad.surface import StateSubset
+from zemax_to_cad.equations import EquationChanges
+from zemax_to_cad.optical_system import (
+    MultiConfigSystem,
+    OpticalConfiguration,
+)
+
+__all__ = ["EquationsWatcher"]
+
+logger = logging.getLogger(__name__)
+
+
+class EquationsWatcher:
+    """Keep a CAD equations file up to date with a set of prescription
+    files, one per configuration.
+
+    The transforms given to transform() are recorded, along with their
+    filters. When files change, only the changed files are parsed again,
+    the recorded transforms are applied to them, and the equations file is
+    merged with MultiConfigSystem.update_equations_file, so only the
+    equations whose values changed are rewritten.
+
+    Changes are found with inotify where available (Linux), and otherwise
+    by polling the size and modification time of each file. Bursts of
+    writes (OpticStudio writes a prescription in many chunks, and often
+    several configurations at once) are collected until no file has changed
+    for debounce seconds, then handled together. The time from the first
+    change of a burst to the equations being written is logged.
+
+    Args:
+        txt_files (Sequence[str]): The prescription of each configuration
+        equations_file (str): The equations file to keep up to date
+        config_numbers (Sequence[int], optional): The configuration number
+            of each file. Defaults to 1, 2, ...
+        include_filter (callable, optional): See
+            MultiConfigSystem.update_equations_file
+        format_filter_function (callable, optional): See
+            MultiConfigSystem.update_equations_file
+        delta (bool, optional): See MultiConfigSystem.file_write
+        atol (float, optional): See MultiConfigSystem.update_equations_file
+        precision (int, optional): See MultiConfigSystem.file_write
+        debounce (float, optional): Seconds without a change before a burst
+            of changes is handled. Defaults to DEFAULT_DEBOUNCE.
+        poll_interval (float, optional): Seconds between checks when
+            polling. Defaults to DEFAULT_POLL_INTERVAL.
+        use_inotify (bool, optional): Whether to use inotify. Defaults to
+            None, using it where available.
+    """
+
+    DEFAULT_DEBOUNCE = 0.5
+    DEFAULT_POLL_INTERVAL = 0.5
+
+    def __init__(
+        self,
+        txt_files: Sequence[str],
+        equations_file: str,
+        config_numbers: Sequence[int] = None,
+        include_filter: callable = lambda x: True,
+        format_filter_function: callable = lambda x: StateSubset.ALL(),
+        delta=False,
+        atol=MultiConfigSystem.DEFAULT_ATOL,
+        precision: int = None,
+        debounce: float = DEFAULT_DEBOUNCE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        use_inotify: bool = None,
+    ):
+        if config_numbers is None:
+            config_numbers = list(range(1, 1 + len(txt_files)))
+        if len(config_numbers) != len(txt_files):
+            raise ValueError(
+                f"{len(txt_files)} files but {len(config_numbers)} "
+                "configuration numbers"
+            )
+
+        self.txt_files = list(txt_files)
+        self.config_numbers = list(config_numbers)
+        self.equations_file = equations_file
+        self.include_filter = include_filter
+        self.format_filter_function = format_filter_function
+        self.delta = delta
+        self.atol = atol
+        self.precision = precision
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+
+        self.system = None
+        self._transforms = []
+        self._rows = {
+            os.path.abspath(file): i for i, file in enumerate(self.txt_files)
+        }
+
+    def transform(
+        self,
+        R: np.ndarray = np.eye(3),
+        T: np.ndarray = np.zeros(3),
+        filter_fn: callable = lambda x: True,
+    ):
+        """Record a transform, applied to every configuration after it is
+        parsed, in the order they were recorded. See
+        OpticalConfiguration.transform for argument details
+        """
+        self._transforms.append((R, T, filter_fn))
+        if self.system is not None:
+            self.system.transform(R, T, filter_fn)
+
+    def load(self, workers: int = None) -> EquationChanges:
+        """Parse every file, apply the recorded transforms and update the
+        equations file
+
+        Args:
+            workers (int, optional): See
+                MultiConfigSystem.load_from_multiple_configs
+
+        Returns:
+            EquationChanges: the changes made to the equations file
+        """
+        start = time.time()
+        self.system = MultiConfigSystem.load_from_multiple_configs(
+            self.txt_files, self.config_numbers, workers
+        )
+        self._apply_transforms(self.system)
+        return self._write(start, self.txt_files)
+
+    def update(self, changed_files, changed_at: float = None):
+        """Parse the changed files again, apply the recorded transforms to
+        them and update the equations file
+
+        Files that can't be parsed (e.g. as they are still being written)
+        keep their previous surfaces.
+
+        Args:
+            changed_files (Sequence[str]): The files that changed. Files
+                that are not watched are ignored.
+            changed_at (float, optional): The time.time() of the first
+                change, to log the latency from. Defaults to now.
+
+        Returns:
+            EquationChanges: the changes made to the equations file, or None
+                if none of the files could be parsed
+        """
+        if changed_at is None:
+            changed_at = time.time()
+        if self.system is None:
+            return self.load()
+
+        rows = sorted(
+            {
+                self._rows[os.path.abspath(file)]
+                for file in changed_files
+                if os.path.abspath(file) in self._rows
+            }
+        )
+        parsed = []
+        for row in rows:
+            try:
+                config = OpticalConfiguration.load_from_prescription_text(
+                    self.txt_files[row], self.config_numbers[row]
+                )
+            except (ValueError, OSError) as error:
+                logger.warning(
+                    "Keeping the previous surfaces of %s: %s",
+                    self.txt_files[row],
+                    error,
+                )
+                continue
+            parsed.append((row, config))
+        if not parsed:
+            return None
+
+        configs = [config for _, config in parsed]
+        self._apply_transforms(MultiConfigSystem(configs))
+        for row, config in parsed:
+            self.system.configs[row] = config
+        return self._write(
+            changed_at, [self.txt_files[row] for row, _ in parsed]
+        )
+
+    def run(self, max_updates: int = None):
+        """Watch the files and update the equations file whenever they
+        change, until interrupted
+
+        The files are parsed first if load() has not been called.
+
+        Args:
+            max_updates (int, optional): Return after this many updates.
+                Defaults to None, watching until interrupted.
+        """
+        if self.system is None:
+            self.load()
+
+        events = self._open_events()
+        logger.info(
+            "Watching %d files with %s",
+            len(self.txt_files),
+            type(events).__name__,
+        )
+        updates = 0
+        # the file -> time.time() of the first change and time.monotonic()
+        # of the last change of each file changed in the current burst
+        burst = {}
+        try:
+            while max_updates is None or updates < max_updates:
+                timeout = self.poll_interval
+                if burst:
+                    last = max(seen for _, seen in burst.values())
+                    timeout = max(0.0, last + self.debounce - time.monotonic())
+
+                for file, changed_at in events.wait(timeout).items():
+                    first = burst.get(file, (changed_at, None))[0]
+                    burst[file] = (first, time.monotonic())
+
+                if burst and all(
+                    time.monotonic() - seen >= self.debounce
+                    for _, seen in burst.values()
+                ):
+                    first = min(changed_at for changed_at, _ in burst.values())
+                    self.update(list(burst), first)
+                    burst = {}
+                    updates += 1
+        finally:
+            events.close()
+
+    def _apply_transforms(self, system):
+        """helper to apply the recorded transforms to newly parsed
+        configurations"""
+        for R, T, filter_fn in self._transforms:
+            system.transform(R, T, filter_fn)
+
+    def _write(self, changed_at, parsed_files):
+        """helper to update the equations file and log the latency"""
+        changes = self.system.update_equations_file(
+            self.equations_file,
+            self.include_filter,
+            self.format_filter_function,
+            self.delta,
+            self.atol,
+            self.precision,
+        )
+        logger.info(
+            "Updated %s from %s in %.1f ms (%d added, %d updated)",
+            self.equations_file,
+            ", ".join(parsed_files),
+            1e3 * (time.time() - changed_at),
+            len(changes.added),
+            len(changes.updated),
+        )
+        return changes
+
+    def _open_events(self):
+        """helper to start watching the files, with inotify if possible"""
+        use_inotify = self.use_inotify
+        if use_inotify is None:
+            use_inotify = _InotifyEvents.available()
+        if use_inotify:
+            try:
+                return _InotifyEvents(self.txt_files)
+            except OSError as error:
+                if self.use_inotify:
+                    raise
+                logger.warning("Polling, as inotify failed: %s", error)
+        return _PollingEvents(self.txt_files, self.poll_interval)
+
+
+class _PollingEvents:
+    """helper to find changed files by checking their size and modification
+    time"""
+
+    def __init__(self, txt_files, interval):
+        self.interval = interval
+        self._stamps = {
+            file: _PollingEvents._stamp(file) for file in txt_files
+        }
+
+    def wait(self, timeout) -> dict:
+        """The files that changed, waiting up to timeout seconds, as
+        file -> time.time() of the change"""
+        time.sleep(min(timeout, self.interval))
+        changed = {}
+        for file, stamp in self._stamps.items():
+            new_stamp = _PollingEvents._stamp(file)
+            if new_stamp != stamp:
+                self._stamps[file] = new_stamp
+                # a file mid-replace may be missing for a moment
+                changed[file] = (
+                    time.time()
+                    if new_stamp is None
+                    else min(time.time(), new_stamp[1] / 1e9)
+                )
+        return changed
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _stamp(txt_file):
+        try:
+            stat = os.stat(txt_file)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+
+class _InotifyEvents:
+    """helper to find changed files with inotify, watching the directories
+    of the files so that files replaced by a rename are still seen"""
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    # struct inotify_event: int wd, uint32 mask, cookie, len, then the name
+    EVENT = struct.Struct("iIII")
+
+    def __init__(self, txt_files):
+        libc = _InotifyEvents._libc()
+        if libc is None:
+            raise OSError("inotify is not available")
+
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        # (watch descriptor, file name) -> file
+        self._files = {}
+        watches = {}
+        try:
+            for file in txt_files:
+                directory, name = os.path.split(os.path.abspath(file))
+                if directory not in watches:
+                    wd = libc.inotify_add_watch(
+                        self._fd, os.fsencode(directory), self.MASK
+                    )
+                    if wd < 0:
+                        errno = ctypes.get_errno()
+                        raise OSError(errno, os.strerror(errno), directory)
+                    watches[directory] = wd
+                self._files[(watches[directory], os.fsencode(name))] = file
+        except OSError:
+            self.close()
+            raise
+
+    @staticmethod
+    def available() -> bool:
+        """Whether inotify can be used here"""
+        return _InotifyEvents._libc() is not None
+
+    @staticmethod
+    def _libc():
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            libc.inotify_init1
+            libc.inotify_add_watch
+        except (OSError, AttributeError):
+            return None
+        return libc
+
+    def wait(self, timeout) -> dict:
+        """The files that changed, waiting up to timeout seconds, as
+        file -> time.time() of the change"""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return {}
+
+        now = time.time()
+        changed = {}
+        data = self._read()
+        offset = 0
+        while offset + self.EVENT.size <= len(data):
+            wd, _, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            file = self._files.get((wd, name))
+            if file is not None:
+                changed[file] = now
+        return changed
+
+    def _read(self):
+        chunks = []
+        while True:
+            try:
+                chunk = os.read(self._fd, 1 << 16)
+            except BlockingIOError:
+                break
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1